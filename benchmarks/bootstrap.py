@@ -0,0 +1,193 @@
+# The MIT License (MIT)
+# Copyright (c) 2014-2017 University of Bristol
+# 
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+# 
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+# 
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT.
+# IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM,
+# DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR
+# OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE
+# OR OTHER DEALINGS IN THE SOFTWARE.
+"""
+Benchmark of the HyperStream bootstrap, i.e. the construction of the HyperStream object. Reports the wall time and
+object counts of each phase (see HyperStream.bootstrap_profile), together with the import time of the package.
+
+By default the configured database is profiled. With --seed, an in-memory mongomock database (requires the mongomock
+package) is first seeded with the given number of streams, plates and workflows. With --scaling, each size is run in a
+fresh process and the phase timings are tabulated.
+
+Usage: python benchmarks/bootstrap.py [--config hyperstream_config.json] [--seed N] [--scaling N [N ...]] [--json]
+"""
+
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+start = time.time()
+import hyperstream
+IMPORT_TIME = time.time() - start
+
+from hyperstream import HyperStream, StreamId
+
+
+MOCK_CONFIG = {
+    "mongo": {
+        "host": "mongomock://localhost",
+        "port": 27017,
+        "tz_aware": True,
+        "db": "hyperstream_benchmark"
+    },
+    "history_channel": "memory",
+    "plugins": [],
+    "online_engine": {
+        "interval": {
+            "start": -60,
+            "end": -10
+        }
+    }
+}
+
+
+def write_mock_config():
+    """
+    Write the configuration for the in-memory database to a temporary file
+
+    :return: The filename
+    """
+    fd, filename = tempfile.mkstemp(suffix=".json", prefix="hyperstream_benchmark_")
+    with os.fdopen(fd, "w") as f:
+        json.dump(MOCK_CONFIG, f)
+    return filename
+
+
+def seed(hs, n):
+    """
+    Seed the database with n streams, n plates (over n meta data values) and n workflows
+
+    :param hs: The HyperStream instance
+    :param n: The number of each type of object
+    :return: None
+    """
+    mongo = hs.channel_manager.mongo
+    meta_data_manager = hs.plate_manager.meta_data_manager
+
+    for i in range(n):
+        mongo.create_stream(StreamId("benchmark_stream_{}".format(i))).save()
+
+    for i in range(n):
+        meta_data_manager.insert(
+            tag="benchmark", identifier="benchmark_{}".format(i), parent="root", data=str(i))
+    for i in range(n):
+        hs.plate_manager.create_plate(
+            plate_id="B{}".format(i), description="Benchmark plate", meta_data_id="benchmark",
+            values=[str(i)], complement=False, parent_plate=None)
+
+    for i in range(n):
+        workflow_id = "benchmark_workflow_{}".format(i)
+        plate = hs.plate_manager.plates["B{}".format(i)]
+        with hs.create_workflow(workflow_id=workflow_id, name=workflow_id, owner="benchmark",
+                                description="Benchmark workflow") as w:
+            ticker = w.create_node(stream_name="benchmark_ticker_{}".format(i), channel=mongo, plates=[])
+            ticks = w.create_node(stream_name="benchmark_ticks_{}".format(i), channel=mongo, plates=[plate])
+            ticker[None] = hs.factors.clock(sources=[])
+            for p in plate:
+                ticks[p] = hs.factors.clock(sources=[])
+        hs.workflow_manager.commit_workflow(workflow_id)
+
+
+def profile(config_filename, n=0):
+    """
+    Profile the bootstrap. If n > 0 the database is seeded first, and HyperStream is then constructed again, so that the
+    bootstrap loads the seeded objects.
+
+    :param config_filename: The configuration file
+    :param n: The number of objects of each type to seed
+    :return: The profile as a dictionary
+    """
+    kwargs = dict(file_logger=False, console_logger=False, mqtt_logger=None, config_filename=config_filename)
+    if n > 0:
+        seed(HyperStream(**kwargs), n)
+        # HyperStream is a singleton, so it needs to be reset to repeat the bootstrap. The in-memory database persists.
+        HyperStream._instance = None
+
+    hs = HyperStream(**kwargs)
+    result = hs.bootstrap_profile.to_dict()
+    result["import_time"] = IMPORT_TIME
+    result["n"] = n
+    return result
+
+
+def print_profile(result):
+    print("HyperStream bootstrap (n={}), import time {:.1f} ms".format(result["n"], result["import_time"] * 1000))
+    for phase in result["phases"]:
+        print("  {:<12} {:10.1f} ms  {}".format(phase["name"], phase["wall_time"] * 1000, ", ".join(
+            "{}={}".format(k, v) for k, v in sorted(phase["counts"].items()))))
+    print("  {:<12} {:10.1f} ms".format("total", result["wall_time"] * 1000))
+
+
+def scaling(sizes):
+    """
+    Profile the bootstrap for each size in a fresh process, and print a table of the phase timings (ms)
+
+    :param sizes: The numbers of objects of each type
+    :return: None
+    """
+    results = []
+    for n in sizes:
+        output = subprocess.check_output([sys.executable, os.path.abspath(__file__), "--seed", str(n), "--json"])
+        results.append(json.loads(output.decode("utf-8").strip().splitlines()[-1]))
+
+    names = [phase["name"] for phase in results[0]["phases"]]
+    print("HyperStream bootstrap scaling (ms)")
+    print("{:>8} {:>8}".format("n", "import") + "".join(" {:>10}".format(name) for name in names) + " {:>10}".format(
+        "total"))
+    for result in results:
+        print("{:>8} {:>8.1f}".format(result["n"], result["import_time"] * 1000) + "".join(
+            " {:>10.1f}".format(phase["wall_time"] * 1000) for phase in result["phases"]) + " {:>10.1f}".format(
+            result["wall_time"] * 1000))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="HyperStream bootstrap benchmark")
+    parser.add_argument("--config", default="hyperstream_config.json", help="The configuration file")
+    parser.add_argument("--seed", type=int, default=0,
+                        help="Seed an in-memory database with this many streams, plates and workflows")
+    parser.add_argument("--scaling", type=int, nargs="+", help="Run each of these sizes in a fresh process")
+    parser.add_argument("--json", action="store_true", help="Output the profile as json")
+    args = parser.parse_args()
+
+    if args.scaling:
+        scaling(args.scaling)
+        return
+
+    config_filename = write_mock_config() if args.seed else args.config
+    try:
+        result = profile(config_filename, args.seed)
+    finally:
+        if args.seed:
+            os.remove(config_filename)
+
+    if args.json:
+        print(json.dumps(result))
+    else:
+        print_profile(result)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,72 @@
+# The MIT License (MIT)
+# Copyright (c) 2014-2017 University of Bristol
+# 
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+# 
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+# 
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT.
+# IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM,
+# DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR
+# OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE
+# OR OTHER DEALINGS IN THE SOFTWARE.
+"""
+Microbenchmark for the TimeIntervals set operations on heavily fragmented interval sets, such as the calculated
+intervals of a stream that has been computed in many small pieces.
+
+Usage: python benchmarks/time_intervals.py [number of fragments]
+"""
+
+import os
+import sys
+import timeit
+from datetime import datetime, timedelta
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from hyperstream import TimeInterval, TimeIntervals
+from hyperstream.utils import UTC
+
+
+def fragmented(n, offset=timedelta(0)):
+    """
+    Create n disjoint one minute intervals separated by one minute gaps
+
+    :param n: The number of fragments
+    :param offset: Offset applied to all intervals
+    :return: The time intervals
+    """
+    start = datetime(2016, 1, 1, tzinfo=UTC) + offset
+    minute = timedelta(minutes=1)
+    return TimeIntervals([TimeInterval(start + 2 * i * minute, start + (2 * i + 1) * minute) for i in range(n)])
+
+
+def run(n=10000, repeat=5):
+    a = fragmented(n)
+    b = fragmented(n, offset=timedelta(seconds=30))
+    last = a.end
+    benchmarks = [
+        ("construction", lambda: fragmented(n)),
+        ("union", lambda: a + b),
+        ("difference", lambda: a - b),
+        ("intersection", lambda: a & b),
+        ("append interval", lambda: a + TimeInterval(last, last + timedelta(minutes=1))),
+        ("required intervals", lambda: TimeIntervals([a.span]) - a),
+    ]
+
+    print("TimeIntervals benchmark with {} fragments (best of {})".format(n, repeat))
+    for name, func in benchmarks:
+        best = min(timeit.repeat(func, number=1, repeat=repeat))
+        print("  {:<20} {:10.3f} ms".format(name, best * 1000))
+
+
+if __name__ == '__main__':
+    run(int(sys.argv[1]) if len(sys.argv) > 1 else 10000)
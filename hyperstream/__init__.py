@@ -25,10 +25,10 @@ from .workflow import Workflow, WorkflowManager
 from .channels import ChannelManager
 from .hyperstream import HyperStream
 from .online_engine import OnlineEngine
-from .stream import StreamId, Stream, StreamInstance, StreamMetaInstance, DatabaseStream, StreamDict, \
-    StreamInstanceCollection, StreamView
+from .stream import StreamId, Stream, StreamInstance, StreamMetaInstance, StreamInstanceBatch, DatabaseStream, \
+    StreamDict, StreamInstanceCollection, StreamView
 from .time_interval import TimeInterval, TimeIntervals, RelativeTimeInterval
-from .tool import Tool, MultiOutputTool, AggregateTool, SelectorTool, PlateCreationTool
+from .tool import Tool, IncrementalTool, MultiOutputTool, AggregateTool, SelectorTool, PlateCreationTool
 from .utils import MIN_DATE, UTC, StreamNotAvailableError, StreamAlreadyExistsError, StreamDataNotAvailableError, \
     StreamNotFoundError, IncompatiblePlatesError, ToolNotFoundError, ChannelNotFoundError, ToolExecutionError, \
     ChannelAlreadyExistsError, FactorAlreadyExistsError, FactorDefinitionError, LinkageError, \
@@ -17,12 +17,16 @@
 #  DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR
 #  OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE
 #  OR OTHER DEALINGS IN THE SOFTWARE.
+from .read_cache import ReadCache
 from .base_channel import BaseChannel
 from .memory_channel import MemoryChannel, ReadOnlyMemoryChannel
 from .tool_channel import ToolChannel
 from .file_channel import FileChannel
 from .module_channel import ModuleChannel
 from .database_channel import DatabaseChannel
+from .bucketed_database_channel import BucketedDatabaseChannel
 from .assets_channel import AssetsChannel
 from .assets_file_channel import AssetsFileChannel
+from .columnar_file_channel import ColumnarFileChannel
+from .log_file_channel import LogFileChannel
 from .channel_manager import ChannelManager
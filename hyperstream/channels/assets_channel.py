@@ -29,13 +29,16 @@ class AssetsChannel(DatabaseChannel):
     """
     Assets Channel. Special kind of database channel for static assets and user input data (workflow parameters etc)
     """
-    def __init__(self, channel_id):
+    stream_type = AssetStream
+
+    def __init__(self, channel_id, keyed=True):
         """
         Initialise this channel
 
         :param channel_id: The channel identifier
+        :param keyed: Whether stream instances are queried by their stream key (see DatabaseChannel)
         """
-        super(AssetsChannel, self).__init__(channel_id=channel_id)
+        super(AssetsChannel, self).__init__(channel_id=channel_id, keyed=keyed)
         # self.update_streams(utcnow())
 
     def update_streams(self, up_to_timestamp):
@@ -96,7 +99,7 @@ class AssetsChannel(DatabaseChannel):
         if stream_id not in self.streams:
             raise StreamNotFoundError("Stream with id '{}' does not exist".format(stream_id))
 
-        writer = self.get_stream_writer(self.streams[stream_id])
+        writer = self.get_cached_stream_writer(self.streams[stream_id])
 
         if isinstance(data, StreamInstance):
             data = [data]
@@ -144,7 +144,7 @@ class AssetsFileChannel(FileChannel):
         if stream_id not in self.streams:
             raise StreamNotFoundError("Stream with id '{}' does not exist".format(stream_id))
 
-        writer = self.get_stream_writer(self.streams[stream_id])
+        writer = self.get_cached_stream_writer(self.streams[stream_id])
 
         if isinstance(data, StreamInstance):
             data = [data]
@@ -18,9 +18,9 @@
 #  OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE
 #  OR OTHER DEALINGS IN THE SOFTWARE.
 
-from ..stream import StreamDict, get_stream_id
+from ..stream import StreamDict, StreamInstance, StreamInstanceBatch, get_stream_id
 from ..time_interval import TimeIntervals
-from ..utils import Printable, MAX_DATE, StreamNotFoundError, MultipleStreamsFoundError
+from ..utils import Printable, MAX_DATE, StreamNotFoundError, MultipleStreamsFoundError, metrics
 
 import logging
 
@@ -29,6 +29,9 @@ class BaseChannel(Printable):
     """
     Abstract base class for channels
     """
+    # Whether reads from this channel are worth holding in the read cache (if the channel manager has one)
+    cache_reads = False
+
     def __init__(self, channel_id, can_calc=False, can_create=False, calc_agent=None):
         self.channel_id = channel_id
         self.streams = StreamDict()
@@ -36,6 +39,8 @@ class BaseChannel(Printable):
         self.can_create = can_create
         self.calc_agent = calc_agent
         self.up_to_timestamp = MAX_DATE
+        self.write_batch_size = 1
+        self.read_cache = None
 
     def update_streams(self, up_to_timestamp):
         """
@@ -73,6 +78,83 @@ class BaseChannel(Printable):
         """
         raise NotImplementedError
 
+    def get_cached_results(self, stream, time_interval):
+        """
+        Gets the results for the stream and time interval, through the read cache if this channel has one
+
+        :param stream: The stream reference
+        :param time_interval: The time interval
+        :return: An iterable over the stream instances
+        """
+        if self.read_cache is None:
+            return self.get_results(stream, time_interval)
+        return self.read_cache.read((self.channel_id, stream.stream_id), time_interval,
+                                    self.get_results(stream, time_interval))
+
+    def get_projected_results(self, stream, time_interval, columns):
+        """
+        Gets the results for the stream and time interval, keeping only the given keys of dictionary values. Deriving
+        classes that store the keys separately (e.g. in columns) can override this to only read the keys that are
+        needed.
+
+        :param stream: The stream reference
+        :param time_interval: The time interval
+        :param columns: The keys to keep
+        :return: An iterable over the stream instances
+        """
+        for timestamp, value in self.get_cached_results(stream, time_interval):
+            if isinstance(value, dict):
+                value = dict((key, value[key]) for key in columns if key in value)
+            yield StreamInstance.trusted(timestamp, value)
+
+    def get_batch(self, stream, time_interval):
+        """
+        Gets the results for the stream and time interval as a batch, through the read cache if this channel has one
+
+        :param stream: The stream reference
+        :param time_interval: The time interval
+        :return: The results
+        :rtype: StreamInstanceBatch
+        """
+        if self.read_cache is None:
+            return self.get_results_batch(stream, time_interval)
+        return StreamInstanceBatch.from_instances(self.get_cached_results(stream, time_interval))
+
+    def get_results_batch(self, stream, time_interval):
+        """
+        Gets the results for the stream and time interval as a batch. Deriving classes can override this to build the
+        batch directly from storage.
+
+        :param stream: The stream reference
+        :param time_interval: The time interval
+        :return: The results
+        :rtype: StreamInstanceBatch
+        """
+        return StreamInstanceBatch.from_instances(self.get_results(stream, time_interval))
+
+    def get_timestamps(self, stream, time_interval):
+        """
+        Gets the timestamps of the stream over the time interval. Deriving classes can override this to avoid reading
+        the values.
+
+        :param stream: The stream reference
+        :param time_interval: The time interval
+        :return: The timestamps, in time order
+        """
+        return [t for t, _ in self.get_cached_results(stream, time_interval)]
+
+    def invalidate_cache(self, stream_id, start=None, end=None):
+        """
+        Removes any cached reads of the stream that contain timestamps in [start, end]
+
+        :param stream_id: The stream id
+        :param start: The first timestamp (None for no lower bound)
+        :param end: The last timestamp (None for no upper bound)
+        :return: None
+        """
+        if self.read_cache is not None:
+            self.read_cache.invalidate((self.channel_id, stream_id), start, end)
+
     def get_or_create_stream(self, stream_id, try_create=True):
         """
         Helper function to get a stream or create one if it's not already defined
@@ -158,6 +240,15 @@ class BaseChannel(Printable):
         """
         raise NotImplementedError
 
+    def flush_calculated_intervals(self):
+        """
+        Writes any deferred updates to the calculated intervals of this channel's streams. Only channels that defer
+        these updates need to override this
+
+        :return: None
+        """
+        pass
+
     def get_stream_writer(self, stream):
         """
         Must be overridden by deriving classes, must return a function(document_collection) which writes all the
@@ -178,6 +269,63 @@ class BaseChannel(Printable):
         """
         raise NotImplementedError
 
+    def get_cached_stream_writer(self, stream):
+        """
+        Gets the stream writer. If this channel has a read cache, the writer also invalidates the cached reads of the
+        range of timestamps that are written.
+
+        :param stream: The stream
+        :return: The stream writer function
+        """
+        writer = metrics.timed_writer(self.get_stream_writer(stream))
+        if self.read_cache is None:
+            return writer
+
+        def cached_writer(document_collection):
+            if isinstance(document_collection, StreamInstance):
+                timestamps = [document_collection.timestamp]
+            else:
+                document_collection = list(document_collection)
+                timestamps = [t for t, _ in document_collection]
+            try:
+                writer(document_collection)
+            finally:
+                if timestamps:
+                    self.invalidate_cache(stream.stream_id, min(timestamps), max(timestamps))
+        return cached_writer
+
+    def write_in_batches(self, stream, stream_instances):
+        """
+        Writes the stream instances to the stream using the stream writer. If the channel's write_batch_size is greater
+        than one, the instances are buffered and passed to the writer as lists of (up to) that size, so that channels
+        that support bulk writes can make a single round-trip per batch. Otherwise each instance is written
+        individually.
+
+        :param stream: The stream
+        :param stream_instances: The stream instances (e.g. the generator returned by a tool's _execute)
+        :return: The number of instances written
+        """
+        writer = self.get_cached_stream_writer(stream)
+        count = 0
+
+        if self.write_batch_size <= 1:
+            for stream_instance in stream_instances:
+                writer(stream_instance)
+                count += 1
+            return count
+
+        batch = []
+        for stream_instance in stream_instances:
+            batch.append(stream_instance)
+            if len(batch) >= self.write_batch_size:
+                writer(batch)
+                count += len(batch)
+                batch = []
+        if batch:
+            writer(batch)
+            count += len(batch)
+        return count
+
     def __str__(self):
         s = self.__class__.__name__ + ' with ID: ' + str(self.channel_id)
         s += ' and containing {} streams:'.format(len(self.streams))
@@ -0,0 +1,300 @@
+# The MIT License (MIT) # Copyright (c) 2014-2017 University of Bristol
+#
+#  Permission is hereby granted, free of charge, to any person obtaining a copy
+#  of this software and associated documentation files (the "Software"), to deal
+#  in the Software without restriction, including without limitation the rights
+#  to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+#  copies of the Software, and to permit persons to whom the Software is
+#  furnished to do so, subject to the following conditions:
+#
+#  The above copyright notice and this permission notice shall be included in all
+#  copies or substantial portions of the Software.
+#
+#  THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+#  EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+#  MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT.
+#  IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM,
+#  DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR
+#  OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE
+#  OR OTHER DEALINGS IN THE SOFTWARE.
+"""
+Bucketed database channel module.
+"""
+from bisect import bisect_right
+from collections import OrderedDict
+from datetime import timedelta
+import logging
+
+from mongoengine import NotUniqueError
+from mongoengine.context_managers import switch_db
+from pymongo import ASCENDING, UpdateOne
+
+from .database_channel import DatabaseChannel
+from ..models import StreamBucketModel, StreamDefinitionModel
+from ..stream import StreamInstance, StreamInstanceBatch
+from ..time_interval import TimeIntervals
+from ..utils import StreamNotFoundError, UTC, is_naive, datetime2ms, ms2datetime
+
+
+class BucketedDatabaseChannel(DatabaseChannel):
+    """
+    Database channel that stores the instances of each stream in fixed time buckets (by default one hour), with one
+    document per stream per bucket rather than one per instance. Each bucket holds parallel arrays of the timestamps and
+    values, together with the minimum and maximum timestamps. Writes append to the buckets with one upsert per bucket,
+    and window queries only fetch and unpack the buckets that overlap the window. The stream definitions and calculated
+    intervals are held as for the database channel.
+
+    As for the database channel, writing a timestamp again is fine if the value is the same, and raises NotUniqueError
+    otherwise. The bucket size should be chosen so that a bucket stays well within the maximum document size of
+    mongodb (16MB), e.g. one hour for streams at 1Hz.
+    """
+    def __init__(self, channel_id, bucket_size=timedelta(hours=1), write_batch_size=10000, **kwargs):
+        """
+        Initialise this channel
+
+        :param channel_id: The channel identifier
+        :param bucket_size: The time span of each bucket
+        :param write_batch_size: The maximum number of instances appended in a single bulk write
+        :param kwargs: Other arguments passed to the database channel
+        """
+        super(BucketedDatabaseChannel, self).__init__(
+            channel_id=channel_id, write_batch_size=write_batch_size, **kwargs)
+        self.bucket_size = bucket_size
+        self.bucket_ms = int(bucket_size.total_seconds() * 1000)
+
+    def bucket_start(self, timestamp):
+        """
+        The start of the bucket holding the given timestamp
+
+        :param timestamp: The timestamp
+        :return: The bucket start
+        """
+        ms = datetime2ms(timestamp)
+        return ms2datetime(ms - ms % self.bucket_ms)
+
+    def bucket_query(self, stream_id, time_interval=None):
+        """
+        Get the raw query for the buckets of a stream
+
+        :param stream_id: The stream id
+        :param time_interval: The time interval (start exclusive, end inclusive) that the buckets should overlap
+        :return: The query
+        """
+        query = {'stream_key': stream_id.key}
+        if time_interval is not None:
+            query['start'] = {'$gt': time_interval.start - self.bucket_size, '$lte': time_interval.end}
+        return query
+
+    def _find_buckets(self, query, fields=('timestamps', 'values')):
+        """
+        Queries the buckets collection, sorted by bucket start. Must be called within the switch_db context.
+
+        :param query: The raw query
+        :param fields: The fields that are returned
+        :return: The pymongo cursor
+        """
+        projection = dict((field, True) for field in fields)
+        projection.update(_id=False, start=True)
+        cursor = StreamBucketModel._get_collection().find(query, projection=projection).sort('start', ASCENDING)
+        if self.read_batch_size:
+            cursor = cursor.batch_size(self.read_batch_size)
+        return cursor
+
+    @staticmethod
+    def _unpack(bucket, time_interval, tz_aware):
+        """
+        Get the timestamps and values of a bucket that lie within the time interval, in time order
+
+        :param bucket: The bucket document
+        :param time_interval: The time interval
+        :param tz_aware: Whether the client decodes dates as timezone aware
+        :return: The timestamps and values
+        """
+        timestamps = bucket['timestamps']
+        values = bucket.get('values')
+        if not tz_aware:
+            timestamps = [t.replace(tzinfo=UTC) for t in timestamps]
+
+        if any(a > b for a, b in zip(timestamps, timestamps[1:])):
+            # Written out of time order
+            order = sorted(range(len(timestamps)), key=timestamps.__getitem__)
+            timestamps = [timestamps[i] for i in order]
+            if values is not None:
+                values = [values[i] for i in order]
+
+        lo = bisect_right(timestamps, time_interval.start)
+        hi = bisect_right(timestamps, time_interval.end, lo=lo)
+        if lo == 0 and hi == len(timestamps):
+            return timestamps, values
+        return timestamps[lo:hi], values[lo:hi] if values is not None else None
+
+    def _read(self, stream, time_interval, fields=('timestamps', 'values')):
+        """
+        Generator over the unpacked buckets of the stream that overlap the time interval
+
+        :return: The timestamps and values of each bucket
+        """
+        with switch_db(StreamBucketModel, 'hyperstream'):
+            cursor = self._find_buckets(self.bucket_query(stream.stream_id, time_interval), fields)
+            tz_aware = cursor.collection.codec_options.tz_aware
+            for bucket in cursor:
+                yield self._unpack(bucket, time_interval, tz_aware)
+
+    def get_results(self, stream, time_interval):
+        """
+        Get the results for a given stream
+
+        :param stream: The stream object
+        :param time_interval: The time interval
+        :return: A generator over stream instances, in time order
+        """
+        make = StreamInstance.trusted
+        for timestamps, values in self._read(stream, time_interval):
+            for t, v in zip(timestamps, values):
+                yield make(t, v)
+
+    def get_results_batch(self, stream, time_interval):
+        timestamps = []
+        values = []
+        for bucket_timestamps, bucket_values in self._read(stream, time_interval):
+            timestamps.extend(bucket_timestamps)
+            values.extend(bucket_values)
+        return StreamInstanceBatch(timestamps, values)
+
+    def get_timestamps(self, stream, time_interval):
+        if self.read_cache is not None:
+            cached = self.read_cache.get((self.channel_id, stream.stream_id), time_interval)
+            if cached is not None:
+                return [t for t, _ in cached]
+        timestamps = []
+        for bucket_timestamps, _ in self._read(stream, time_interval, fields=('timestamps',)):
+            timestamps.extend(bucket_timestamps)
+        return timestamps
+
+    def explain(self, stream, time_interval, fields=('timestamps', 'values')):
+        with switch_db(StreamBucketModel, 'hyperstream'):
+            return self._find_buckets(self.bucket_query(stream.stream_id, time_interval), fields).explain()
+
+    def get_stream_writer(self, stream):
+        """
+        Gets the bucketed database writer, which appends the instances to their buckets in bulk writes of up to
+        write_batch_size instances
+
+        :param stream: The stream
+        :return: The stream writer function
+        """
+        def writer(document_collection):
+            if isinstance(document_collection, StreamInstance):
+                document_collection = [document_collection]
+            document_collection = list(document_collection)
+            with switch_db(StreamBucketModel, 'hyperstream'):
+                for i in range(0, len(document_collection), self.write_batch_size):
+                    self._append(stream, document_collection[i:i + self.write_batch_size])
+        return writer
+
+    def _append(self, stream, stream_instances):
+        """
+        Append a batch of stream instances to their buckets. Must be called within the switch_db context.
+
+        :param stream: The stream
+        :param stream_instances: The stream instances
+        :return: None
+        """
+        buckets = OrderedDict()
+        for t, value in stream_instances:
+            buckets.setdefault(self.bucket_start(t), OrderedDict())[t] = value
+        if not buckets:
+            return
+
+        key = stream.stream_id.key
+        collection = StreamBucketModel._get_collection()
+        self._remove_duplicates(collection, stream, buckets)
+
+        requests = []
+        for start, instances in buckets.items():
+            if not instances:
+                continue
+            timestamps = list(instances.keys())
+            requests.append(UpdateOne(
+                {'stream_key': key, 'start': start},
+                {'$push': {'timestamps': {'$each': timestamps}, 'values': {'$each': list(instances.values())}},
+                 '$min': {'min_datetime': min(timestamps)},
+                 '$max': {'max_datetime': max(timestamps)},
+                 '$inc': {'count': len(timestamps)},
+                 '$setOnInsert': {'stream_id': stream.stream_id.as_dict()}},
+                upsert=True))
+        if requests:
+            collection.bulk_write(requests)
+
+    @staticmethod
+    def _remove_duplicates(collection, stream, buckets):
+        """
+        Remove the instances that are already in the database from the buckets to be written. Only the existing buckets
+        whose range of timestamps overlaps the new instances are fetched, so appending in time order (the common case)
+        costs a single query that does not return any timestamps.
+
+        :param collection: The buckets collection
+        :param stream: The stream
+        :param buckets: The instances to be written, keyed by bucket start and then timestamp
+        :return: None
+        :raises: NotUniqueError if an instance is already in the database with a different value
+        """
+        def aware(dt):
+            return dt.replace(tzinfo=UTC) if is_naive(dt) else dt
+
+        key = stream.stream_id.key
+        overlapping = []
+        for bucket in collection.find({'stream_key': key, 'start': {'$in': list(buckets)}},
+                                      projection={'_id': False, 'start': True, 'min_datetime': True,
+                                                  'max_datetime': True}):
+            instances = buckets[aware(bucket['start'])]
+            lo, hi = aware(bucket['min_datetime']), aware(bucket['max_datetime'])
+            if any(lo <= t <= hi for t in instances):
+                overlapping.append(bucket['start'])
+        if not overlapping:
+            return
+
+        duplicates = 0
+        for bucket in collection.find({'stream_key': key, 'start': {'$in': overlapping}},
+                                      projection={'_id': False, 'start': True, 'timestamps': True, 'values': True}):
+            instances = buckets[aware(bucket['start'])]
+            for t, value in zip(bucket['timestamps'], bucket['values']):
+                t = aware(t)
+                if t in instances:
+                    if instances[t] != value:
+                        raise NotUniqueError("Document with timestamp {} already exists in stream {} with a different "
+                                             "value".format(t, stream.stream_id))
+                    del instances[t]
+                    duplicates += 1
+        if duplicates:
+            logging.warn("Found {} duplicate documents in stream {}".format(duplicates, stream.stream_id))
+
+    def purge_stream(self, stream_id, remove_definition=False, sandbox=None):
+        """
+        Purge the stream
+
+        :param stream_id: The stream identifier
+        :param remove_definition: Whether to remove the stream definition as well
+        :param sandbox: The sandbox for this stream
+        :return: None
+        :raises: NotImplementedError
+        """
+        if sandbox is not None:
+            raise NotImplementedError
+
+        if stream_id not in self.streams:
+            raise StreamNotFoundError("Stream with id '{}' not found".format(stream_id))
+
+        stream = self.streams[stream_id]
+        with switch_db(StreamBucketModel, 'hyperstream'):
+            StreamBucketModel._get_collection().delete_many(self.bucket_query(stream_id))
+        self.invalidate_cache(stream_id)
+
+        stream.calculated_intervals = TimeIntervals([])
+        self.flush_calculated_intervals()
+
+        if remove_definition:
+            with switch_db(StreamDefinitionModel, 'hyperstream'):
+                StreamDefinitionModel.objects(__raw__=stream_id.as_raw()).delete()
+
+        logging.info("Purged stream {}".format(stream_id))
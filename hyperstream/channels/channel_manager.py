@@ -22,6 +22,7 @@ Channel manager module. Defines the ChannelManager - a container for channels, t
 """
 
 
+from datetime import timedelta
 import inspect
 import logging
 # from mongoengine import DoesNotExist, MultipleObjectsReturned
@@ -30,17 +31,36 @@ import os
 from six import string_types
 
 from hyperstream.models import StreamDefinitionModel
-from hyperstream.stream import StreamId, DatabaseStream, AssetStream
+from hyperstream.stream import StreamId, LazyStreamDict
 from hyperstream.utils import Printable, utcnow, MIN_DATE, StreamAlreadyExistsError, ChannelNotFoundError, \
     ToolNotFoundError, ChannelAlreadyExistsError, ToolInitialisationError
-from hyperstream.channels import ToolChannel, MemoryChannel, DatabaseChannel, AssetsChannel, AssetsFileChannel
+from hyperstream.channels import ToolChannel, MemoryChannel, DatabaseChannel, AssetsChannel, AssetsFileChannel, \
+    LogFileChannel, BucketedDatabaseChannel
+from hyperstream.channels.read_cache import ReadCache
 
 
 class ChannelManager(dict, Printable):
     """
     Container for channels.
     """
-    def __init__(self, plugins, **kwargs):
+    def __init__(self, plugins, stream_cache_size=None, read_cache_size=None, local_path=None, bucket_size=None,
+                 stream_keys="auto", **kwargs):
+        """
+        Initialise the channel manager
+
+        :param plugins: The plugins
+        :param stream_cache_size: The maximum number of streams of the main database channel to hold in memory (None for
+        no limit)
+        :param read_cache_size: The maximum number of stream instances held in the read cache that is shared by the
+        channels that support it (None to disable the cache)
+        :param local_path: The directory of the local log file channel (None to disable the channel)
+        :param bucket_size: The time span of the buckets of the bucketed database channel (seconds, None to disable the
+        channel)
+        :param stream_keys: Whether the database channels query stream instances by their stream key. If "auto", keys
+        are used unless the database holds instances written before stream keys were introduced, in which case the
+        channels fall back to querying on the full stream id until hyperstream.migrations has been run. The check is
+        only made until the migration (or a check that finds no such instances) has been recorded in the database
+        """
         super(ChannelManager, self).__init__(**kwargs)
 
         # See this answer http://stackoverflow.com/a/14620633 for why we do the following:
@@ -50,8 +70,24 @@ class ChannelManager(dict, Printable):
 
         self.tools = ToolChannel("tools", tool_path, up_to_timestamp=utcnow())
         self.memory = MemoryChannel("memory")
-        self.mongo = DatabaseChannel("mongo")
-        self.assets = AssetsChannel("assets")
+        if stream_keys == "auto":
+            if DatabaseChannel.stream_keys_migrated():
+                stream_keys = True
+            else:
+                stream_keys = not DatabaseChannel.has_unkeyed_instances()
+                if stream_keys:
+                    DatabaseChannel.mark_stream_keys_migrated()
+            if not stream_keys:
+                logging.warn("The database holds stream instances without stream keys, so streams are queried on the "
+                             "full stream id. Run python -m hyperstream.migrations to add the keys")
+
+        self.mongo = DatabaseChannel("mongo", max_streams=stream_cache_size, keyed=stream_keys)
+        self.assets = AssetsChannel("assets", keyed=stream_keys)
+        if local_path:
+            self.local = LogFileChannel("local", local_path)
+        if bucket_size:
+            self.buckets = BucketedDatabaseChannel(
+                "buckets", bucket_size=timedelta(seconds=bucket_size), max_streams=stream_cache_size)
 
         for plugin in plugins:
             for channel in plugin.load_channels():
@@ -59,6 +95,12 @@ class ChannelManager(dict, Printable):
                     raise ChannelAlreadyExistsError(channel.channel_id)
                 self[channel.channel_id] = channel
 
+        if read_cache_size:
+            read_cache = ReadCache(read_cache_size)
+            for channel in self.values():
+                if channel.cache_reads:
+                    channel.read_cache = read_cache
+
         self.update_channels()
 
     @property
@@ -82,6 +124,15 @@ class ChannelManager(dict, Printable):
         """
         return [c for c in self.values() if isinstance(c, DatabaseChannel)]
 
+    def flush_calculated_intervals(self):
+        """
+        Flushes any deferred calculated interval updates in all channels
+
+        :return: None
+        """
+        for channel in self.values():
+            channel.flush_calculated_intervals()
+
     def get_channel(self, channel_id):
         """
         Get the channel by id
@@ -96,11 +147,14 @@ class ChannelManager(dict, Printable):
 
     def update_channels(self):
         """
-        Pulls out all of the stream definitions from the database, and populates the channels with stream references
+        Pulls out the stream definitions from the database, and populates the channels with stream references. Channels
+        that fetch their streams on demand (i.e. lazy database channels) are skipped, so that the startup cost does not
+        depend on the number of streams that they hold.
         """
         logging.info("Updating channels")
+        lazy_channel_ids = [c.channel_id for c in self.values() if isinstance(c.streams, LazyStreamDict)]
         with switch_db(StreamDefinitionModel, 'hyperstream'):
-            for s in StreamDefinitionModel.objects():
+            for s in StreamDefinitionModel.objects(channel_id__nin=lazy_channel_ids):
                 try:
                     stream_id = StreamId(name=s.stream_id.name, meta_data=s.stream_id.meta_data)
                 except AttributeError as e:
@@ -115,10 +169,6 @@ class ChannelManager(dict, Printable):
                     logging.warn(e)
                     continue
 
-                # calculated_intervals = TimeIntervals(map(lambda x: (x.start, x.end), s.calculated_intervals))
-                last_accessed = utcnow()
-                last_updated = s.last_updated if s.last_updated else utcnow()
-
                 if stream_id in channel.streams:
                     if isinstance(channel, (AssetsChannel, AssetsFileChannel)):
                         continue
@@ -128,20 +178,7 @@ class ChannelManager(dict, Printable):
                 if isinstance(channel, MemoryChannel):
                     channel.create_stream(stream_id)
                 elif isinstance(channel, DatabaseChannel):
-                    if channel == self.assets:
-                        stream_type = AssetStream
-                    else:
-                        stream_type = DatabaseStream
-
-                    channel.streams[stream_id] = stream_type(
-                        channel=channel,
-                        stream_id=stream_id,
-                        calculated_intervals=None,  # Not required since it's initialised from mongo_model in __init__
-                        last_accessed=last_accessed,
-                        last_updated=last_updated,
-                        sandbox=s.sandbox,
-                        mongo_model=s
-                    )
+                    channel.streams[stream_id] = channel.stream_from_definition(s, stream_id)
                 else:
                     logging.warn("Unable to parse stream {}".format(stream_id))
 
@@ -0,0 +1,460 @@
+# The MIT License (MIT) # Copyright (c) 2014-2017 University of Bristol
+#
+#  Permission is hereby granted, free of charge, to any person obtaining a copy
+#  of this software and associated documentation files (the "Software"), to deal
+#  in the Software without restriction, including without limitation the rights
+#  to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+#  copies of the Software, and to permit persons to whom the Software is
+#  furnished to do so, subject to the following conditions:
+#
+#  The above copyright notice and this permission notice shall be included in all
+#  copies or substantial portions of the Software.
+#
+#  THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+#  EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+#  MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT.
+#  IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM,
+#  DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR
+#  OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE
+#  OR OTHER DEALINGS IN THE SOFTWARE.
+"""
+Columnar file channel module. Stores streams as time partitioned Parquet files, which suits high volume numeric
+streams far better than one document (or file) per instance.
+"""
+
+from datetime import timedelta
+import logging
+import os
+import shutil
+import threading
+import time
+import uuid
+
+from mongoengine.context_managers import switch_db
+from six import string_types, integer_types
+
+from .database_channel import DatabaseChannel
+from .file_channel import get_stream_path
+from ..models import StreamDefinitionModel
+from ..stream import StreamInstance, StreamInstanceBatch, merge_streams
+from ..time_interval import TimeIntervals
+from ..utils import StreamNotFoundError, datetime2ms, ms2datetime, metrics, value_to_json, value_from_json
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+    pq = None
+
+
+# The name of the timestamp column (milliseconds since the epoch)
+TIMESTAMP_COLUMN = '__timestamp'
+
+# Schema metadata key holding the encoding of the values in a file
+VALUE_TYPE_KEY = b'hyperstream.value_type'
+
+SCALAR_TYPES = (bool, float) + integer_types + string_types
+
+_sequence_lock = threading.Lock()
+_sequence_state = {'ms': 0, 'count': 0}
+
+
+def next_sequence():
+    """
+    Get the sequence of the next data file, which orders the files of a stream by when they were written. This is the
+    time in milliseconds followed by a counter, so the files written by this process are ordered even when several are
+    written within the same millisecond (or the clock goes backwards), and then a random suffix so that the names of
+    files written by different processes do not clash.
+
+    :return: The sequence
+    """
+    with _sequence_lock:
+        ms = max(int(time.time() * 1000), _sequence_state['ms'])
+        count = _sequence_state['count'] + 1 if ms == _sequence_state['ms'] else 0
+        _sequence_state.update(ms=ms, count=count)
+    return "{:013d}{:06d}{}".format(ms, count, uuid.uuid4().hex[:8])
+
+
+class ColumnarFileChannel(DatabaseChannel):
+    """
+    Columnar file channel. The stream definitions and calculated intervals are held in the database as for the database
+    channel, but the data are written to Parquet files below the given path, with one directory per stream and one
+    sub-directory per time partition (by default one per day). Each write creates a file per partition that it touches,
+    whose name holds the minimum and maximum timestamps that it contains, and the files are split into row groups with
+    timestamp statistics. Window queries therefore only open the files that overlap the window, only read the row
+    groups that overlap it, and only decode the requested columns.
+
+    Numeric (or other scalar) values are stored in a single column. Dictionaries of scalars are stored with one column
+    per key, and any other values are stored as JSON. Views created with Stream.window(..., columns=[...]) only decode
+    the columns of the given keys. If the same timestamp is written more than once, the most recent write wins.
+    Requires pyarrow.
+    """
+    cache_reads = True
+
+    def __init__(self, channel_id, path, partition_size=timedelta(days=1), row_group_size=65536,
+                 write_batch_size=100000, **kwargs):
+        """
+        Initialise this channel
+
+        :param channel_id: The channel identifier
+        :param path: The root directory for the data
+        :param partition_size: The time span of each partition
+        :param row_group_size: The maximum number of rows in each row group
+        :param write_batch_size: The maximum number of instances written to a single file
+        :param kwargs: Other arguments passed to the database channel
+        """
+        if pq is None:
+            raise ImportError("pyarrow is required for the columnar file channel")
+        super(ColumnarFileChannel, self).__init__(channel_id=channel_id, write_batch_size=write_batch_size, **kwargs)
+        self.path = os.path.abspath(path)
+        self.partition_ms = int(partition_size.total_seconds() * 1000)
+        self.row_group_size = row_group_size
+        if not os.path.exists(self.path):
+            os.makedirs(self.path)
+
+    def stream_path(self, stream_id):
+        """
+        The directory holding the data of the stream
+
+        :param stream_id: The stream id
+        :return: The path
+        """
+        return get_stream_path(self.path, stream_id)
+
+    def partition_name(self, ms):
+        """
+        The name of the partition holding the given timestamp
+
+        :param ms: The timestamp (milliseconds since the epoch)
+        :return: The partition name
+        """
+        return ms2datetime(ms - ms % self.partition_ms).strftime("%Y%m%dT%H%M%S")
+
+    def get_files(self, stream_id, start_ms=None, end_ms=None):
+        """
+        Get the data files of the stream that may hold timestamps in (start, end], in the order that they were written.
+        Partitions and files outside of the range are skipped without being opened.
+
+        :param stream_id: The stream id
+        :param start_ms: The start of the range, exclusive (milliseconds since the epoch, None for no lower bound)
+        :param end_ms: The end of the range, inclusive (milliseconds since the epoch, None for no upper bound)
+        :return: List of (sequence, file name, min timestamp, max timestamp) tuples
+        """
+        stream_path = self.stream_path(stream_id)
+        if not os.path.isdir(stream_path):
+            return []
+
+        first = None if start_ms is None else self.partition_name(start_ms + 1)
+        last = None if end_ms is None else self.partition_name(end_ms)
+
+        files = []
+        for partition in os.listdir(stream_path):
+            partition_path = os.path.join(stream_path, partition)
+            if not partition.startswith('p') or not os.path.isdir(partition_path):
+                continue
+            if (first is not None and partition[1:] < first) or (last is not None and partition[1:] > last):
+                continue
+            for file_name in os.listdir(partition_path):
+                if not file_name.endswith('.parquet'):
+                    continue
+                min_ms, max_ms, sequence = file_name[:-len('.parquet')].split('_', 2)
+                min_ms, max_ms = int(min_ms), int(max_ms)
+                if (start_ms is not None and max_ms <= start_ms) or (end_ms is not None and min_ms > end_ms):
+                    continue
+                files.append((sequence, os.path.join(partition_path, file_name), min_ms, max_ms))
+        return sorted(files)
+
+    def get_results(self, stream, time_interval, columns=None):
+        """
+        Get the results for a given stream
+
+        :param stream: The stream object
+        :param time_interval: The time interval
+        :param columns: For streams of dictionaries, the keys to read (None for all)
+        :return: A generator over stream instances, in time order
+        """
+        make = StreamInstance.trusted
+        for ms, value in self._read_rows(stream, time_interval, columns):
+            yield make(ms2datetime(ms), value)
+
+    def get_projected_results(self, stream, time_interval, columns):
+        """
+        Get the results for a given stream, only reading the columns of the given keys
+
+        :param stream: The stream object
+        :param time_interval: The time interval
+        :param columns: The keys to read
+        :return: A generator over stream instances, in time order
+        """
+        return self.get_results(stream, time_interval, columns=columns)
+
+    def get_results_batch(self, stream, time_interval, columns=None):
+        """
+        Get the results for a given stream as a batch
+
+        :param stream: The stream object
+        :param time_interval: The time interval
+        :param columns: For streams of dictionaries, the keys to read (None for all)
+        :return: The results
+        :rtype: StreamInstanceBatch
+        """
+        timestamps = []
+        values = []
+        for ms, value in self._read_rows(stream, time_interval, columns):
+            timestamps.append(ms2datetime(ms))
+            values.append(value)
+        return StreamInstanceBatch(timestamps, values)
+
+    def get_timestamps(self, stream, time_interval):
+        """
+        Get the timestamps of a given stream, only reading the timestamp column of the data files
+
+        :param stream: The stream object
+        :param time_interval: The time interval
+        :return: The timestamps, in time order
+        """
+        if self.read_cache is not None:
+            cached = self.read_cache.get((self.channel_id, stream.stream_id), time_interval)
+            if cached is not None:
+                return [t for t, _ in cached]
+        start_ms, end_ms = datetime2ms(time_interval.start), datetime2ms(time_interval.end)
+
+        timestamps = set()
+        for _, file_name, _, _ in self.get_files(stream.stream_id, start_ms, end_ms):
+            parquet_file = pq.ParquetFile(file_name)
+            for i in self._row_groups(parquet_file, start_ms, end_ms):
+                data = parquet_file.read_row_group(i, columns=[TIMESTAMP_COLUMN]).to_pydict()
+                timestamps.update(ms for ms in data[TIMESTAMP_COLUMN] if start_ms < ms <= end_ms)
+        return [ms2datetime(ms) for ms in sorted(timestamps)]
+
+    def _read_rows(self, stream, time_interval, columns):
+        """
+        Read the rows of the stream with timestamps in the time interval, where later writes take precedence
+
+        :return: Generator of (timestamp, value) tuples, with timestamps in milliseconds, in time order
+        """
+        start_ms, end_ms = datetime2ms(time_interval.start), datetime2ms(time_interval.end)
+        file_names = [file_name for _, file_name, _, _ in self.get_files(stream.stream_id, start_ms, end_ms)]
+        return self._merge_files(file_names, start_ms, end_ms, columns)
+
+    @classmethod
+    def _merge_files(cls, file_names, start_ms, end_ms, columns=None):
+        """
+        Merge the rows of the given data files with timestamps in (start, end]. Each file is sorted by time, so the
+        files are merged lazily rather than being read into memory. Where a timestamp is in more than one file, the
+        value from the last of the files (i.e. the most recent write) is taken.
+
+        :param file_names: The file names, in the order that they were written
+        :param start_ms: The start of the range, exclusive
+        :param end_ms: The end of the range, inclusive
+        :param columns: For dictionaries, the keys to read (None for all)
+        :return: Generator of (timestamp, value) tuples, in time order
+        """
+        readers = [cls._read_file(file_name, start_ms, end_ms, columns) for file_name in file_names]
+        if len(readers) == 1:
+            for row in readers[0]:
+                yield row
+            return
+
+        # Instances with equal timestamps are merged in the order of the files, so the last one is the most recent
+        make = StreamInstance.trusted
+        pending = None
+        for ms, _, value in merge_streams([(make(ms, v) for ms, v in reader) for reader in readers]):
+            if pending is not None and pending[0] != ms:
+                yield pending
+            pending = (ms, value)
+        if pending is not None:
+            yield pending
+
+    @staticmethod
+    def _read_file(file_name, start_ms, end_ms, columns=None):
+        """
+        Read the rows of a data file with timestamps in (start, end], skipping row groups outside of this range
+
+        :param file_name: The file name
+        :param start_ms: The start of the range, exclusive
+        :param end_ms: The end of the range, inclusive
+        :param columns: For dictionaries, the keys to read (None for all)
+        :return: Generator of (timestamp, value) tuples
+        """
+        parquet_file = pq.ParquetFile(file_name)
+        schema = parquet_file.schema.to_arrow_schema()
+        value_type = (schema.metadata or {}).get(VALUE_TYPE_KEY, b'scalar').decode('utf-8')
+        names = [name for name in schema.names if name != TIMESTAMP_COLUMN]
+        if value_type == 'dict' and columns is not None:
+            names = [name for name in names if name in columns]
+
+        for i in ColumnarFileChannel._row_groups(parquet_file, start_ms, end_ms):
+            data = parquet_file.read_row_group(i, columns=[TIMESTAMP_COLUMN] + names).to_pydict()
+            for j, ms in enumerate(data[TIMESTAMP_COLUMN]):
+                if not start_ms < ms <= end_ms:
+                    continue
+                if value_type == 'dict':
+                    value = dict((name, data[name][j]) for name in names if data[name][j] is not None)
+                elif value_type == 'json':
+                    value = value_from_json(data['value'][j])
+                else:
+                    value = data['value'][j]
+                yield ms, value
+
+    @staticmethod
+    def _row_groups(parquet_file, start_ms, end_ms):
+        """
+        The indices of the row groups of a data file that may hold timestamps in (start, end], according to the
+        timestamp statistics
+
+        :param parquet_file: The parquet file
+        :param start_ms: The start of the range, exclusive
+        :param end_ms: The end of the range, inclusive
+        :return: Generator over the row group indices
+        """
+        timestamp_index = parquet_file.schema.to_arrow_schema().get_field_index(TIMESTAMP_COLUMN)
+        metadata = parquet_file.metadata
+        for i in range(metadata.num_row_groups):
+            statistics = metadata.row_group(i).column(timestamp_index).statistics
+            if statistics is not None and statistics.has_min_max:
+                if statistics.max <= start_ms or statistics.min > end_ms:
+                    continue
+            yield i
+
+    @staticmethod
+    def value_type(values):
+        """
+        Determine how a batch of values should be stored. Dictionaries of scalars are stored with a column for each
+        key, unless a key clashes with the timestamp column. Other values, such as lists, tuples and datetimes, are
+        stored as json (see value_to_json).
+
+        :param values: The values
+        :return: 'scalar', 'dict' or 'json'
+        """
+        if all(v is None or isinstance(v, SCALAR_TYPES) for v in values):
+            return 'scalar'
+        if all(isinstance(v, dict) and TIMESTAMP_COLUMN not in v
+               and all(isinstance(k, string_types) and (x is None or isinstance(x, SCALAR_TYPES)) for k, x in v.items())
+               for v in values):
+            return 'dict'
+        return 'json'
+
+    def _write_file(self, partition_path, rows):
+        """
+        Write the rows of a single partition to a new data file
+
+        :param partition_path: The partition directory
+        :param rows: The time ordered (timestamp, value) tuples
+        :return: The file name
+        """
+        timestamps = [ms for ms, _ in rows]
+        values = [v for _, v in rows]
+        value_type = self.value_type(values)
+
+        names = [TIMESTAMP_COLUMN]
+        arrays = [pa.array(timestamps, type=pa.int64())]
+        try:
+            if value_type == 'dict':
+                for key in sorted(set(k for v in values for k in v)):
+                    names.append(key)
+                    arrays.append(pa.array([v.get(key) for v in values]))
+            elif value_type == 'scalar':
+                names.append('value')
+                arrays.append(pa.array(values))
+        except (pa.ArrowInvalid, pa.ArrowTypeError) as e:
+            # Mixed types that do not fit in a single column
+            logging.debug("Storing values as JSON: {}".format(e))
+            value_type = 'json'
+            names, arrays = names[:1], arrays[:1]
+        if value_type == 'json':
+            names.append('value')
+            arrays.append(pa.array([value_to_json(v) for v in values], type=pa.string()))
+
+        table = pa.Table.from_arrays(arrays, names=names)
+        table = table.replace_schema_metadata({VALUE_TYPE_KEY: value_type.encode('utf-8')})
+
+        if not os.path.exists(partition_path):
+            os.makedirs(partition_path)
+        sequence = next_sequence()
+        file_name = os.path.join(partition_path, "{}_{}_{}.parquet".format(timestamps[0], timestamps[-1], sequence))
+
+        # Write to a temporary file and rename, so that readers never see a partial file
+        temp_name = os.path.join(partition_path, "." + os.path.basename(file_name) + ".tmp")
+        pq.write_table(table, temp_name, row_group_size=self.row_group_size)
+        os.rename(temp_name, file_name)
+        metrics.record_bytes_written(os.path.getsize(file_name))
+        return file_name
+
+    def get_stream_writer(self, stream):
+        """
+        Gets the columnar file writer. Each call writes one new file for each partition touched by the instances.
+
+        :param stream: The stream
+        :return: The stream writer function
+        """
+        stream_path = self.stream_path(stream.stream_id)
+
+        def writer(document_collection):
+            if isinstance(document_collection, StreamInstance):
+                document_collection = [document_collection]
+
+            partitions = {}
+            for t, doc in document_collection:
+                ms = datetime2ms(t)
+                partitions.setdefault(self.partition_name(ms), []).append((ms, doc))
+
+            for partition, rows in partitions.items():
+                rows.sort(key=lambda x: x[0])
+                for i in range(0, len(rows), self.write_batch_size):
+                    self._write_file(os.path.join(stream_path, 'p' + partition), rows[i:i + self.write_batch_size])
+        return writer
+
+    def compact_stream(self, stream_id):
+        """
+        Rewrite each partition of the stream as a single file. This is worthwhile after many small writes, since each
+        write creates a new file.
+
+        :param stream_id: The stream id
+        :return: None
+        """
+        by_partition = {}
+        for _, file_name, _, _ in self.get_files(stream_id):
+            by_partition.setdefault(os.path.dirname(file_name), []).append(file_name)
+
+        for partition_path, file_names in by_partition.items():
+            if len(file_names) < 2:
+                continue
+            self._write_file(partition_path, list(self._merge_files(file_names, -1 << 62, 1 << 62)))
+            for file_name in file_names:
+                os.remove(file_name)
+        logging.info("Compacted stream {}".format(stream_id))
+
+    def purge_stream(self, stream_id, remove_definition=False, sandbox=None):
+        """
+        Purge the stream
+
+        :param stream_id: The stream identifier
+        :param remove_definition: Whether to remove the stream definition as well
+        :param sandbox: The sandbox for this stream
+        :return: None
+        :raises: NotImplementedError
+        """
+        if sandbox is not None:
+            raise NotImplementedError
+
+        if stream_id not in self.streams:
+            raise StreamNotFoundError("Stream with id '{}' not found".format(stream_id))
+
+        stream = self.streams[stream_id]
+        stream_path = self.stream_path(stream_id)
+        if os.path.isdir(stream_path):
+            for partition in os.listdir(stream_path):
+                if partition.startswith('p'):
+                    shutil.rmtree(os.path.join(stream_path, partition))
+        self.invalidate_cache(stream_id)
+
+        stream.calculated_intervals = TimeIntervals([])
+        self.flush_calculated_intervals()
+
+        if remove_definition:
+            with switch_db(StreamDefinitionModel, 'hyperstream'):
+                StreamDefinitionModel.objects(__raw__=stream_id.as_raw()).delete()
+
+        logging.info("Purged stream {}".format(stream_id))
@@ -22,27 +22,68 @@ Database channel module.
 """
 from mongoengine import NotUniqueError, InvalidDocumentError
 from mongoengine.context_managers import switch_db
-from pymongo.errors import InvalidDocument
+from pymongo import ASCENDING, UpdateOne
+from bson.codec_options import CodecOptions
+from bson.raw_bson import RawBSONDocument
+from pymongo.errors import InvalidDocument, BulkWriteError, DuplicateKeyError
 import logging
+import threading
 
 from .base_channel import BaseChannel
 from ..time_interval import TimeIntervals
-from ..models import StreamInstanceModel, StreamDefinitionModel
-from ..stream import StreamInstance, DatabaseStream
-from ..utils import utcnow, StreamNotFoundError, StreamAlreadyExistsError
+from ..models import StreamInstanceModel, StreamDefinitionModel, TimeIntervalModel, MigrationModel
+from ..stream import StreamInstance, StreamId, DatabaseStream, LazyStreamDict
+from ..utils import utcnow, is_naive, UTC, StreamNotFoundError, StreamAlreadyExistsError
+
+
+# Error code returned by mongodb for duplicate keys
+DUPLICATE_KEY_ERROR = 11000
+
+# The name of the migration that adds stream keys to the stream instances (see hyperstream.migrations)
+STREAM_KEYS_MIGRATION = 'stream_keys'
 
 
 class DatabaseChannel(BaseChannel):
     """
     Database Channel. Data stored and retrieved in mongodb using mongoengine.
     """
-    def __init__(self, channel_id):
+    stream_type = DatabaseStream
+    cache_reads = True
+
+    def __init__(self, channel_id, write_batch_size=1000, raw_reads=True, read_batch_size=None, raw_bson=False,
+                 write_behind=False, lazy=True, max_streams=None, keyed=True):
         """
         Initialise this channel
 
         :param channel_id: The channel identifier
+        :param write_batch_size: The number of documents sent to the database in a single bulk insert. Setting this to
+        1 reverts to saving documents one at a time
+        :param raw_reads: Whether to read instances directly through pymongo rather than hydrating mongoengine documents
+        :param read_batch_size: The cursor batch size for raw reads (None uses the server default)
+        :param raw_bson: Whether raw reads should return values as lazily decoded RawBSONDocument objects
+        :param write_behind: Whether updates to the calculated intervals of streams are held in memory until
+        flush_calculated_intervals is called (see the docstring of that method)
+        :param lazy: Whether the streams are fetched from the stream definitions in the database when they are first
+        requested, rather than all being loaded by the channel manager on startup
+        :param max_streams: The maximum number of streams to hold in memory when lazy (None for no limit)
+        :param keyed: Whether stream instances are queried by their stream key (see StreamId.key), so that window
+        queries are range scans of the (stream_key, datetime) index. Databases with instances written before stream keys
+        were introduced should be migrated with hyperstream.migrations.migrate_stream_keys, or use keyed=False to query
+        on the full stream id (see the stream_keys setting of the configuration)
         """
         super(DatabaseChannel, self).__init__(channel_id=channel_id, can_calc=True, can_create=False)
+        self.write_batch_size = write_batch_size
+        self.raw_reads = raw_reads
+        self.read_batch_size = read_batch_size
+        self.raw_bson = raw_bson
+        self.write_behind = write_behind
+        self.keyed = keyed
+        self.pending_streams = {}
+        self._pending_lock = threading.RLock()
+        if lazy:
+            self.streams = LazyStreamDict(loader=self.load_stream, load_all=self.load_streams,
+                                          load_ids=self.load_stream_ids, max_size=max_streams,
+                                          can_evict=self.can_evict)
         # self.update_streams(utcnow())
 
     def update_streams(self, up_to_timestamp):
@@ -54,6 +95,125 @@ class DatabaseChannel(BaseChannel):
         """
         raise NotImplementedError
 
+    def stream_from_definition(self, definition, stream_id=None):
+        """
+        Create the stream object from its definition in the database
+
+        :param definition: The stream definition
+        :param stream_id: The stream id (if not given, it is taken from the definition)
+        :type definition: StreamDefinitionModel
+        :return: The stream
+        """
+        if stream_id is None:
+            stream_id = StreamId(name=definition.stream_id.name, meta_data=definition.stream_id.meta_data)
+        return self.stream_type(
+            channel=self,
+            stream_id=stream_id,
+            calculated_intervals=None,  # Not required since it's initialised from mongo_model in __init__
+            last_accessed=utcnow(),
+            last_updated=definition.last_updated if definition.last_updated else utcnow(),
+            sandbox=definition.sandbox,
+            mongo_model=definition
+        )
+
+    def load_stream(self, stream_id):
+        """
+        Fetch a single stream from the stream definitions in the database
+
+        :param stream_id: The stream id
+        :return: The stream, or None if it is not defined in this channel
+        """
+        with self._pending_lock:
+            if stream_id in self.pending_streams:
+                return self.pending_streams[stream_id]
+        query = stream_id.as_raw()
+        query['channel_id'] = self.channel_id
+        with switch_db(StreamDefinitionModel, 'hyperstream'):
+            definition = StreamDefinitionModel.objects(__raw__=query).first()
+        if definition is None:
+            return None
+        logging.debug("Loaded stream definition {}".format(stream_id))
+        return self.stream_from_definition(definition, stream_id)
+
+    def load_streams(self):
+        """
+        Fetch all of the streams defined in this channel from the database
+
+        :return: The streams
+        """
+        with switch_db(StreamDefinitionModel, 'hyperstream'):
+            definitions = list(StreamDefinitionModel.objects(channel_id=self.channel_id))
+        return [self.stream_from_definition(definition) for definition in definitions]
+
+    def load_stream_ids(self):
+        """
+        Fetch the ids of all of the streams defined in this channel from the database, without the rest of their
+        definitions
+
+        :return: The stream ids
+        """
+        with switch_db(StreamDefinitionModel, 'hyperstream'):
+            definitions = StreamDefinitionModel.objects(channel_id=self.channel_id).only('stream_id')
+            return [StreamId(name=d.stream_id.name, meta_data=d.stream_id.meta_data) for d in definitions]
+
+    @staticmethod
+    def has_unkeyed_instances():
+        """
+        Whether the database holds stream instances that were written before stream keys were introduced, and so are
+        not found by keyed channels until migrate_stream_keys has been run. Note that this is a collection scan when
+        all of the instances have keys.
+
+        :return: True if there are instances without a stream key
+        """
+        with switch_db(StreamInstanceModel, 'hyperstream'):
+            collection = StreamInstanceModel._get_collection()
+            return collection.find_one({'stream_key': {'$exists': False}}, projection={'_id': True}) is not None
+
+    @staticmethod
+    def stream_keys_migrated():
+        """
+        Whether the stream keys migration has been recorded as applied, which (unlike has_unkeyed_instances) is a
+        single document lookup
+
+        :return: True if the migration has been applied
+        """
+        with switch_db(MigrationModel, 'hyperstream'):
+            return MigrationModel.objects(name=STREAM_KEYS_MIGRATION).first() is not None
+
+    @staticmethod
+    def mark_stream_keys_migrated():
+        """
+        Record that all of the stream instances have stream keys
+
+        :return: None
+        """
+        with switch_db(MigrationModel, 'hyperstream'):
+            MigrationModel.objects(name=STREAM_KEYS_MIGRATION).update_one(set__applied=utcnow(), upsert=True)
+
+    def can_evict(self, stream):
+        """
+        Whether the stream can be evicted from memory. Streams with deferred updates to their calculated intervals must
+        be kept until they are flushed, and none can be evicted while a flush is in progress.
+
+        :param stream: The stream
+        :return: True if the stream can be evicted
+        """
+        with self._pending_lock:
+            return stream.stream_id not in self.pending_streams
+
+    def instance_query(self, stream_id, time_interval=None):
+        """
+        Get the raw query for the instances of a stream
+
+        :param stream_id: The stream id
+        :param time_interval: The time interval (start exclusive, end inclusive) to restrict the query to
+        :return: The query
+        """
+        query = {'stream_key': stream_id.key} if self.keyed else stream_id.as_raw()
+        if time_interval is not None:
+            query['datetime'] = {'$gt': time_interval.start, '$lte': time_interval.end}
+        return query
+
     def get_results(self, stream, time_interval):
         """
         Get the results for a given stream
@@ -62,11 +222,76 @@ class DatabaseChannel(BaseChannel):
         :param stream: The stream object
         :return: A generator over stream instances
         """
-        query = stream.stream_id.as_raw()
-        query['datetime'] = {'$gt': time_interval.start, '$lte': time_interval.end}
+        query = self.instance_query(stream.stream_id, time_interval)
+        with switch_db(StreamInstanceModel, 'hyperstream'):
+            if not self.raw_reads:
+                for instance in StreamInstanceModel.objects(__raw__=query):
+                    yield StreamInstance(timestamp=instance.datetime, value=instance.value)
+                return
+
+            # Bypass the mongoengine document hydration and only fetch the fields that are needed. Stored dates are
+            # already at millisecond precision, so they only need validating if the client decodes them as naive
+            cursor = self._find(query)
+            make = StreamInstance.trusted if cursor.collection.codec_options.tz_aware else StreamInstance
+            for document in cursor:
+                yield make(document['datetime'], document['value'])
+
+    def get_timestamps(self, stream, time_interval):
+        """
+        Get the timestamps of a given stream. When the channel is keyed, this is a covered query: it is answered from
+        the (stream_key, datetime) index without fetching the documents.
+
+        :param stream: The stream object
+        :param time_interval: The time interval
+        :return: The timestamps, in time order
+        """
+        if self.read_cache is not None:
+            cached = self.read_cache.get((self.channel_id, stream.stream_id), time_interval)
+            if cached is not None:
+                return [t for t, _ in cached]
         with switch_db(StreamInstanceModel, 'hyperstream'):
-            for instance in StreamInstanceModel.objects(__raw__=query):
-                yield StreamInstance(timestamp=instance.datetime, value=instance.value)
+            cursor = self._find(self.instance_query(stream.stream_id, time_interval), fields=('datetime',))
+            if cursor.collection.codec_options.tz_aware:
+                return [document['datetime'] for document in cursor]
+            return [document['datetime'].replace(tzinfo=UTC) for document in cursor]
+
+    def explain(self, stream, time_interval, fields=('datetime', 'value')):
+        """
+        Get the query plan of a window query, e.g. to check that it is an index range scan
+
+        :param stream: The stream object
+        :param time_interval: The time interval
+        :param fields: The fields that are returned
+        :return: The output of the explain command
+        """
+        with switch_db(StreamInstanceModel, 'hyperstream'):
+            return self._find(self.instance_query(stream.stream_id, time_interval), fields=fields).explain()
+
+    def _find(self, query, fields=('datetime', 'value')):
+        """
+        Queries the streams collection directly through pymongo, sorted by datetime (as for the mongoengine model).
+        Must be called within the switch_db context.
+
+        :param query: The raw query
+        :param fields: The fields that are returned
+        :return: The pymongo cursor
+        """
+        collection = StreamInstanceModel._get_collection()
+        if self.raw_bson:
+            options = collection.codec_options
+            collection = collection.with_options(codec_options=CodecOptions(
+                document_class=RawBSONDocument,
+                tz_aware=options.tz_aware,
+                uuid_representation=options.uuid_representation,
+                tzinfo=options.tzinfo))
+
+        projection = dict((field, True) for field in fields)
+        projection['_id'] = False
+        cursor = collection.find(query, projection=projection)
+        cursor = cursor.sort('datetime', ASCENDING)
+        if self.read_batch_size:
+            cursor = cursor.batch_size(self.read_batch_size)
+        return cursor
 
     def create_stream(self, stream_id, sandbox=None):
         """
@@ -107,25 +332,80 @@ class DatabaseChannel(BaseChannel):
             raise StreamNotFoundError("Stream with id '{}' not found".format(stream_id))
 
         stream = self.streams[stream_id]
-        query = stream_id.as_raw()
         with switch_db(StreamInstanceModel, 'hyperstream'):
-            StreamInstanceModel.objects(__raw__=query).delete()
+            StreamInstanceModel.objects(__raw__=self.instance_query(stream_id)).delete()
+        self.invalidate_cache(stream_id)
 
         # Also update the stream status
         stream.calculated_intervals = TimeIntervals([])
+        self.flush_calculated_intervals()
 
         if remove_definition:
             with switch_db(StreamDefinitionModel, 'hyperstream'):
-                StreamDefinitionModel.objects(__raw__=query).delete()
+                StreamDefinitionModel.objects(__raw__=stream_id.as_raw()).delete()
 
         logging.info("Purged stream {}".format(stream_id))
 
+    def defer_calculated_intervals(self, stream):
+        """
+        Mark the calculated intervals of the stream as needing to be written on the next flush
+
+        :param stream: The stream
+        :type stream: DatabaseStream
+        :return: None
+        """
+        with self._pending_lock:
+            self.pending_streams[stream.stream_id] = stream
+
+    def flush_calculated_intervals(self):
+        """
+        Writes the calculated intervals of all streams that have been updated since the last flush, using a single bulk
+        update. This is called at the end of each factor execution and when the session is closed, and can also be
+        called explicitly.
+
+        Note on crash safety: stream data is always written before the calculated intervals are updated in memory, so
+        the intervals stored in the database can lag behind the data but never run ahead of it. If the process dies
+        before a flush, the intervals computed since the last flush will be recomputed on the next run, and the
+        rewritten documents will be accepted as duplicates provided the tool produces the same values.
+
+        The pending streams are guarded by a lock, since factors executed on different threads defer and flush
+        concurrently. If the write fails, the streams are marked as pending again.
+
+        :return: None
+        """
+        with self._pending_lock:
+            pending, self.pending_streams = self.pending_streams, {}
+            if not pending:
+                return
+
+            try:
+                requests = []
+                for stream in pending.values():
+                    stream.mongo_model.set_calculated_intervals(stream.calculated_intervals)
+                    calculated_intervals = [TimeIntervalModel(start=x.start, end=x.end).to_mongo()
+                                            for x in stream.calculated_intervals]
+                    requests.append(UpdateOne({'_id': stream.mongo_model.pk},
+                                              {'$set': {'calculated_intervals': calculated_intervals}}))
+
+                with switch_db(StreamDefinitionModel, 'hyperstream'):
+                    StreamDefinitionModel._get_collection().bulk_write(requests, ordered=False)
+            except Exception:
+                for stream_id, stream in pending.items():
+                    self.pending_streams.setdefault(stream_id, stream)
+                raise
+
+        logging.debug("Flushed calculated intervals for {} streams".format(len(requests)))
+
     def get_stream_writer(self, stream):
         """
         Gets the database channel writer
         The mongoengine model checks whether a stream_id/datetime pair already exists in the DB (unique pairs)
         Should be overridden by users' personal channels - allows for non-mongo outputs.
 
+        If the writer is given a list of instances and write_batch_size is greater than 1, the instances are written
+        using unordered bulk inserts of up to write_batch_size documents, and any duplicate key conflicts are resolved
+        with a single query per batch.
+
         :param stream: The stream
         :return: The stream writer function
         """
@@ -135,9 +415,16 @@ class DatabaseChannel(BaseChannel):
                 if isinstance(document_collection, StreamInstance):
                     document_collection = [document_collection]
 
+                if self.write_batch_size > 1:
+                    document_collection = list(document_collection)
+                    for i in range(0, len(document_collection), self.write_batch_size):
+                        self._insert_many(stream, document_collection[i:i + self.write_batch_size])
+                    return
+
                 for t, doc in document_collection:
                     instance = StreamInstanceModel(
                         stream_id=stream.stream_id.as_dict(),
+                        stream_key=stream.stream_id.key,
                         datetime=t,
                         value=doc)
                     try:
@@ -145,11 +432,108 @@ class DatabaseChannel(BaseChannel):
                     except NotUniqueError as e:
                         # Implies that this has already been written to the database
                         # Raise an error if the value differs from that in the database
-                        logging.warn("Found duplicate document: {}".format(e.message))
-                        existing = StreamInstanceModel.objects(stream_id=stream.stream_id.as_dict(), datetime=t)[0]
-                        if existing.value != doc:
-                            raise e
+                        logging.warn("Found duplicate document: {}".format(e))
+                        self._check_duplicates(stream, [instance.to_mongo()])
                     except (InvalidDocumentError, InvalidDocument) as e:
                         # Something wrong with the document - log the error
                         logging.error(e)
         return writer
+
+    def _insert_many(self, stream, stream_instances):
+        """
+        Writes a batch of stream instances using an unordered bulk insert.
+        Duplicates are fine as long as the value matches the one already in the database, otherwise NotUniqueError is
+        raised (as for single writes). Must be called within the switch_db context.
+
+        :param stream: The stream
+        :param stream_instances: The stream instances
+        :type stream_instances: list[StreamInstance]
+        :return: None
+        """
+        documents = []
+        for t, doc in stream_instances:
+            instance = StreamInstanceModel(
+                stream_id=stream.stream_id.as_dict(), stream_key=stream.stream_id.key, datetime=t, value=doc)
+            instance.validate()
+            documents.append(instance.to_mongo())
+
+        if not documents:
+            return
+
+        collection = StreamInstanceModel._get_collection()
+
+        try:
+            collection.insert_many(documents, ordered=False)
+        except InvalidDocument:
+            # The encoding of one of the documents failed, so none of the batch was sent. Fall back to inserting the
+            # documents one at a time so that the offending document(s) can be logged and the rest written
+            for document in documents:
+                try:
+                    collection.insert_one(document)
+                except DuplicateKeyError:
+                    self._check_duplicates(stream, [document])
+                except InvalidDocument as e:
+                    logging.error(e)
+        except BulkWriteError as e:
+            duplicates = []
+            for error in e.details.get('writeErrors', []):
+                if error.get('code') == DUPLICATE_KEY_ERROR:
+                    duplicates.append(documents[error['index']])
+                else:
+                    # Something wrong with the document - log the error
+                    logging.error(error.get('errmsg'))
+            if duplicates:
+                logging.warn("Found {} duplicate documents in stream {}".format(len(duplicates), stream.stream_id))
+                self._check_duplicates(stream, duplicates)
+
+    def _check_duplicates(self, stream, documents):
+        """
+        Checks that documents which failed to insert due to duplicate keys have the same values as those already in the
+        database. Must be called within the switch_db context.
+
+        When the channel is keyed, the conflicting document may be one that was written without a stream key, which
+        clashes through the legacy (stream_id, datetime) index if that still exists. Such documents are looked up by
+        the full stream id, and given their stream key if the values match so that keyed reads find them.
+
+        :param stream: The stream
+        :param documents: The documents that could not be inserted
+        :return: None
+        :raises: NotUniqueError if any of the values differ, or if the conflicting document cannot be found
+        """
+        def normalise(dt):
+            # Compare at millisecond precision with UTC timezone, regardless of how the client decodes dates
+            dt = dt.replace(microsecond=int(dt.microsecond / 1000) * 1000)
+            return dt.replace(tzinfo=UTC) if is_naive(dt) else dt
+
+        def find_existing(query, timestamps):
+            query['datetime'] = {'$in': timestamps}
+            return dict((normalise(instance.datetime), instance.value)
+                        for instance in StreamInstanceModel.objects(__raw__=query))
+
+        existing = find_existing(self.instance_query(stream.stream_id), [d['datetime'] for d in documents])
+
+        legacy = {}
+        missing = [d['datetime'] for d in documents if normalise(d['datetime']) not in existing]
+        if missing and self.keyed:
+            legacy_query = stream.stream_id.as_raw()
+            legacy_query['stream_key'] = {'$exists': False}
+            legacy = find_existing(legacy_query, missing)
+            if legacy:
+                logging.warn("Found {} instances without a stream key in stream {}, run migrate_stream_keys"
+                             .format(len(legacy), stream.stream_id))
+            existing.update(legacy)
+
+        for document in documents:
+            t = normalise(document['datetime'])
+            if t not in existing:
+                raise NotUniqueError("Document with timestamp {} in stream {} could not be written, and no conflicting "
+                                     "document was found".format(t, stream.stream_id))
+            if existing[t] != document['value']:
+                raise NotUniqueError("Document with timestamp {} already exists in stream {} with a different value"
+                                     .format(t, stream.stream_id))
+
+        if legacy:
+            query = stream.stream_id.as_raw()
+            query['stream_key'] = {'$exists': False}
+            query['datetime'] = {'$in': [d['datetime'] for d in documents if normalise(d['datetime']) in legacy]}
+            StreamInstanceModel._get_collection().update_many(query, {'$set': {'stream_key': stream.stream_id.key}})
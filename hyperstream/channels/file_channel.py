@@ -23,9 +23,27 @@ from ..stream import StreamId, Stream, StreamInstance
 from ..utils import Printable, MIN_DATE, UTC
 
 import ciso8601
+import hashlib
+import json
 import os
 from semantic_version import Version
 import logging
+import tempfile
+
+
+def get_stream_path(path, stream_id):
+    """
+    Get the directory holding the files of a stream. Streams without meta data live in a directory named after the
+    stream, and streams with meta data in a sub-directory named by the hash of the meta data.
+
+    :param path: The root directory of the channel
+    :param stream_id: The stream id
+    :return: The path
+    """
+    if not stream_id.meta_data:
+        return os.path.join(path, stream_id.name)
+    meta_data = json.dumps(sorted(map(list, stream_id.meta_data)))
+    return os.path.join(path, stream_id.name, hashlib.md5(meta_data.encode('utf-8')).hexdigest())
 
 
 class FileDateTimeVersion(Printable):
@@ -48,6 +66,133 @@ class FileDateTimeVersion(Printable):
         return self.extension == '.py'
 
 
+class DirectoryManifest(object):
+    """
+    Listing of the sub-folders of a file channel and the files within them. Each listing is validated against the
+    modification time of its folder, so unchanged folders are not rescanned. The manifest can be persisted to a json
+    file so that it is shared between processes.
+    """
+    def __init__(self, path, filename=None):
+        """
+        Initialise the manifest
+
+        :param path: The root path of the channel
+        :param filename: The file used to persist the manifest (None to keep it in memory only)
+        """
+        self.path = path.rstrip(os.path.sep)
+        self.filename = filename
+        self.mtime = None
+        self.folders = []
+        self.listings = {}
+        self.modified = False
+        self.load()
+
+    def __repr__(self):
+        return "{}(path={}, filename={})".format(self.__class__.__name__, repr(self.path), repr(self.filename))
+
+    def is_valid_name(self, name):
+        """
+        Check that a folder or file name from a persisted manifest names an entry directly inside the root path
+
+        :param name: The name
+        :return: Whether the name is valid
+        """
+        if not name or name in (os.curdir, os.pardir) or os.path.sep in name \
+                or (os.path.altsep and os.path.altsep in name):
+            return False
+        full_path = os.path.normpath(os.path.join(self.path, name))
+        return os.path.dirname(full_path) == os.path.normpath(self.path)
+
+    def load(self):
+        """
+        Load the persisted manifest, if there is one for this path. The manifest is ignored if it is not owned by the
+        current user, or if any of the names in it do not refer to entries directly inside the root path, since the
+        names are later used to import modules.
+
+        :return: None
+        """
+        if not self.filename:
+            return
+        try:
+            with open(self.filename) as f:
+                if hasattr(os, 'getuid') and os.fstat(f.fileno()).st_uid != os.getuid():
+                    raise ValueError("not owned by the current user")
+                data = json.load(f)
+            if data["path"] != self.path:
+                return
+            folders = [str(name) for name in data["folders"]]
+            listings = dict((str(name), (mtime, [str(ff) for ff in file_names]))
+                            for name, (mtime, file_names) in data["listings"].items())
+            for name, (_, file_names) in listings.items():
+                if not all(map(self.is_valid_name, [name] + file_names)):
+                    raise ValueError("invalid name in listing of {}".format(name))
+            if not all(map(self.is_valid_name, folders)):
+                raise ValueError("invalid folder name")
+            self.mtime = data["mtime"]
+            self.folders = folders
+            self.listings = listings
+        except (IOError, OSError, ValueError, KeyError, TypeError) as e:
+            logging.debug("Unable to load manifest {}: {}".format(self.filename, e))
+            self.mtime = None
+            self.folders = []
+            self.listings = {}
+
+    def save(self):
+        """
+        Persist the manifest if it has changed. The file is written to a new temporary file in the same directory and
+        then renamed, so concurrent readers always see a complete manifest.
+
+        :return: None
+        """
+        if not self.filename or not self.modified:
+            return
+        data = dict(path=self.path, mtime=self.mtime, folders=self.folders, listings=self.listings)
+        directory, basename = os.path.split(self.filename)
+        temp_filename = None
+        try:
+            fd, temp_filename = tempfile.mkstemp(prefix=basename + ".", dir=directory)
+            with os.fdopen(fd, "w") as f:
+                json.dump(data, f)
+            os.rename(temp_filename, self.filename)
+            self.modified = False
+        except (IOError, OSError) as e:
+            logging.warn("Unable to save manifest {}: {}".format(self.filename, e))
+            if temp_filename is not None and os.path.exists(temp_filename):
+                os.remove(temp_filename)
+
+    def folder_names(self):
+        """
+        The names of the sub-folders of the root path
+
+        :return: The folder names
+        """
+        if not os.path.isdir(self.path):
+            raise ValueError("Invalid path: {}".format(self.path))
+        mtime = os.stat(self.path).st_mtime
+        if mtime != self.mtime:
+            self.folders = sorted(name for name in os.listdir(self.path)
+                                  if os.path.isdir(os.path.join(self.path, name)))
+            self.mtime = mtime
+            self.modified = True
+        return self.folders
+
+    def file_names(self, name):
+        """
+        The names of the files in the given sub-folder, in sorted order
+
+        :param name: The folder name
+        :return: The file names
+        """
+        folder = os.path.join(self.path, name)
+        mtime = os.stat(folder).st_mtime
+        listing = self.listings.get(name)
+        if listing is None or listing[0] != mtime:
+            listing = (mtime, sorted(ff for ff in os.listdir(folder) if os.path.isfile(os.path.join(folder, ff))))
+            self.listings[name] = listing
+            self.modified = True
+        return listing[1]
+
+
 class FileChannel(ReadOnlyMemoryChannel):
     """
     An abstract stream channel where the streams are recursive sub-folders under a given path and documents correspond to
@@ -62,8 +207,20 @@ class FileChannel(ReadOnlyMemoryChannel):
     
     def __init__(self, channel_id, path, up_to_timestamp=MIN_DATE):
         self.path = path
+        self.manifest = DirectoryManifest(path, self.get_manifest_filename(path))
         super(FileChannel, self).__init__(channel_id=channel_id, up_to_timestamp=up_to_timestamp)
 
+    @staticmethod
+    def get_manifest_filename(path):
+        """
+        Get the file used to persist the directory manifest of this channel. By default the manifest is only held in
+        memory.
+
+        :param path: The root path of the channel
+        :return: The filename, or None
+        """
+        return None
+
     def file_filter(self, sorted_file_names):
         for file_long_name in sorted_file_names:
             if not file_long_name.startswith('__') and file_long_name[-3:] == '.py':
@@ -87,20 +244,15 @@ class FileChannel(ReadOnlyMemoryChannel):
                 del dirs[:]
 
     def update_streams(self, up_to_timestamp):
-        path = self.path
-        for long_path, dir_names, file_names in self.walk(path, level=1):
-            file_names = list(filter(lambda ff: not ff.startswith('__'), file_names))
+        for name in self.manifest.folder_names():
+            file_names = [ff for ff in self.manifest.file_names(name) if not ff.startswith('__')]
             if len(file_names) == 0:
                 continue
 
-            name = long_path[len(path) + 1:]
-            if not name:
-                # Empty folder
-                continue
-
             stream_id = StreamId(name=name)
             stream = Stream(channel=self, stream_id=stream_id, calculated_intervals=None, sandbox=None)
             self.streams[stream_id] = stream
+        self.manifest.save()
 
     def data_loader(self, short_path, file_info):
         raise NotImplementedError
@@ -112,9 +264,10 @@ class FileChannel(ReadOnlyMemoryChannel):
         #         'The stream is not available after ' + str(self.up_to_timestamp) + ' and cannot be calculated')
         
         result = []
-        module_path = os.path.join(self.path, stream.stream_id.name)
-        
-        for file_info in self.file_filter(sorted(os.listdir(module_path))):
+        file_names = self.manifest.file_names(stream.stream_id.name)
+        self.manifest.save()
+
+        for file_info in self.file_filter(file_names):
             if file_info.timestamp in time_interval and file_info.timestamp <= self.up_to_timestamp:
                 result.append(StreamInstance(
                     timestamp=file_info.timestamp,
@@ -0,0 +1,500 @@
+# The MIT License (MIT) # Copyright (c) 2014-2017 University of Bristol
+#
+#  Permission is hereby granted, free of charge, to any person obtaining a copy
+#  of this software and associated documentation files (the "Software"), to deal
+#  in the Software without restriction, including without limitation the rights
+#  to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+#  copies of the Software, and to permit persons to whom the Software is
+#  furnished to do so, subject to the following conditions:
+#
+#  The above copyright notice and this permission notice shall be included in all
+#  copies or substantial portions of the Software.
+#
+#  THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+#  EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+#  MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT.
+#  IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM,
+#  DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR
+#  OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE
+#  OR OTHER DEALINGS IN THE SOFTWARE.
+"""
+Log file channel module. Stores each stream as append-only binary log files on the local file system, which are memory
+mapped for reading.
+"""
+
+from bisect import bisect_right
+import json
+import logging
+import mmap
+import os
+import struct
+import threading
+
+from .base_channel import BaseChannel
+from .file_channel import get_stream_path
+from ..stream import StreamId, StreamInstance, StreamInstanceBatch, LogStream, merge_streams
+from ..time_interval import TimeInterval, TimeIntervals
+from ..utils import MAX_DATE, StreamNotFoundError, StreamAlreadyExistsError, datetime2ms, ms2datetime, metrics, \
+    value_to_json, value_from_json
+
+
+# Each record is the timestamp (milliseconds since the epoch) and the length of the value, followed by the value
+RECORD_HEADER = struct.Struct('<qI')
+
+# Each index entry is the timestamp and file offset of a record
+INDEX_ENTRY = struct.Struct('<qQ')
+
+STREAM_FILENAME = 'stream.json'
+
+
+class LogSegment(object):
+    """
+    A single log file, holding records in strictly increasing timestamp order, together with a sparse index of the
+    timestamps and offsets of every n-th record.
+    """
+    def __init__(self, data_filename, index_filename, index_interval):
+        self.data_filename = data_filename
+        self.index_filename = index_filename
+        self.index_interval = index_interval
+        self.index_timestamps = []
+        self.index_offsets = []
+        self.size = 0
+        self.last_timestamp = None
+        self.unindexed = 0
+        self.recover()
+
+    def recover(self):
+        """
+        Load the index, and scan the records after the last index entry to find the end of the log. Any partially
+        written record at the end of the file (e.g. after a crash) is truncated.
+
+        :return: None
+        """
+        size = os.path.getsize(self.data_filename) if os.path.exists(self.data_filename) else 0
+
+        if os.path.exists(self.index_filename):
+            with open(self.index_filename, 'rb') as f:
+                data = f.read()
+            for i in range(len(data) // INDEX_ENTRY.size):
+                timestamp, offset = INDEX_ENTRY.unpack_from(data, i * INDEX_ENTRY.size)
+                if offset >= size:
+                    break
+                self.index_timestamps.append(timestamp)
+                self.index_offsets.append(offset)
+            if len(data) != len(self.index_offsets) * INDEX_ENTRY.size:
+                with open(self.index_filename, 'r+b') as f:
+                    f.truncate(len(self.index_offsets) * INDEX_ENTRY.size)
+
+        pos = self.index_offsets[-1] if self.index_offsets else 0
+        self.unindexed = 0
+        if size > pos:
+            with open(self.data_filename, 'rb') as f:
+                f.seek(pos)
+                data = f.read()
+            i = 0
+            while i + RECORD_HEADER.size <= len(data):
+                timestamp, length = RECORD_HEADER.unpack_from(data, i)
+                if i + RECORD_HEADER.size + length > len(data):
+                    break
+                self.last_timestamp = timestamp
+                self.unindexed += 1
+                i += RECORD_HEADER.size + length
+            if pos + i != size:
+                logging.warn("Truncating partial record at the end of {}".format(self.data_filename))
+                with open(self.data_filename, 'r+b') as f:
+                    f.truncate(pos + i)
+            size = pos + i
+        self.size = size
+
+    def append(self, records):
+        """
+        Append records to the log. The timestamps must be strictly increasing and greater than the last timestamp.
+
+        :param records: List of (timestamp, encoded value) tuples
+        :return: None
+        """
+        index = []
+        chunks = []
+        offset = self.size
+        for timestamp, value in records:
+            if not self.index_offsets or self.unindexed >= self.index_interval:
+                index.append((timestamp, offset))
+                self.index_timestamps.append(timestamp)
+                self.index_offsets.append(offset)
+                self.unindexed = 0
+            chunks.append(RECORD_HEADER.pack(timestamp, len(value)))
+            chunks.append(value)
+            offset += RECORD_HEADER.size + len(value)
+            self.unindexed += 1
+
+        # The data are written before the index, so that the index never refers to missing records
+        with open(self.data_filename, 'ab') as f:
+            f.write(b''.join(chunks))
+        if index:
+            with open(self.index_filename, 'ab') as f:
+                f.write(b''.join(INDEX_ENTRY.pack(t, o) for t, o in index))
+
+        self.size = offset
+        self.last_timestamp = records[-1][0]
+
+    def read(self, start, end, decode):
+        """
+        Generator over the records with timestamps in (start, end]. The file is memory mapped, the sparse index is
+        binary searched for the first record that may be in range, and values are only copied out of the map when they
+        are decoded.
+
+        :param start: The start timestamp (exclusive)
+        :param end: The end timestamp (inclusive)
+        :param decode: Function to decode the value bytes
+        :return: Generator of (timestamp, value) tuples
+        """
+        size = self.size
+        if size == 0:
+            return
+
+        i = bisect_right(self.index_timestamps, start) - 1
+        pos = self.index_offsets[i] if i >= 0 else 0
+
+        with open(self.data_filename, 'rb') as f:
+            mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            while pos < size:
+                timestamp, length = RECORD_HEADER.unpack_from(mm, pos)
+                if timestamp > end:
+                    break
+                pos += RECORD_HEADER.size
+                if timestamp > start:
+                    yield timestamp, decode(mm[pos:pos + length])
+                pos += length
+        finally:
+            mm.close()
+
+
+class RecordInstance(object):
+    """
+    Minimal (timestamp, value) record for merging segments
+    """
+    __slots__ = ('timestamp', 'value')
+
+    def __init__(self, timestamp, value):
+        self.timestamp = timestamp
+        self.value = value
+
+
+class StreamLog(object):
+    """
+    The log of a single stream. Records are appended to the current segment while they arrive in time order. A write
+    that goes back in time starts a new segment, and reads merge the segments, with later segments taking precedence
+    for duplicate timestamps. Once there are more than max_segments segments they are merged into one.
+    """
+    def __init__(self, path, index_interval, max_segments=16):
+        self.path = path
+        self.index_interval = index_interval
+        self.max_segments = max_segments
+        self.lock = threading.RLock()
+        self.segments = []
+        self.next_number = 1
+        if os.path.isdir(path):
+            numbers = sorted(int(f[len('data-'):-len('.log')]) for f in os.listdir(path)
+                             if f.startswith('data-') and f.endswith('.log'))
+            for number in numbers:
+                self.segments.append(self._segment(number))
+            if numbers:
+                self.next_number = numbers[-1] + 1
+
+    def _segment(self, number):
+        return LogSegment(
+            data_filename=os.path.join(self.path, 'data-{:06d}.log'.format(number)),
+            index_filename=os.path.join(self.path, 'index-{:06d}.idx'.format(number)),
+            index_interval=self.index_interval)
+
+    def append(self, records):
+        """
+        Append records to the log
+
+        :param records: List of (timestamp, encoded value) tuples
+        :return: None
+        """
+        if not records:
+            return
+        records = sorted(records, key=lambda x: x[0])
+        with self.lock:
+            i = 0
+            while i < len(records):
+                segment = self.segments[-1] if self.segments else None
+                if segment is None or (segment.last_timestamp is not None and records[i][0] <= segment.last_timestamp):
+                    segment = self._new_segment()
+                    self.segments.append(segment)
+
+                # Take the run of strictly increasing timestamps
+                j = i + 1
+                while j < len(records) and records[j][0] > records[j - 1][0]:
+                    j += 1
+                segment.append(records[i:j])
+                i = j
+
+            if self.max_segments and len(self.segments) > self.max_segments:
+                self.compact()
+
+    def _new_segment(self):
+        if not os.path.isdir(self.path):
+            os.makedirs(self.path)
+        segment = self._segment(self.next_number)
+        self.next_number += 1
+        return segment
+
+    def compact(self, batch_size=10000):
+        """
+        Merge the segments into a single new segment. The new segment is complete before the old ones are removed, and
+        takes precedence over them, so a crash part way through leaves the log readable.
+
+        :param batch_size: The number of records appended to the new segment in a single write
+        :return: None
+        """
+        with self.lock:
+            if len(self.segments) < 2:
+                return
+            segment = self._new_segment()
+            records = []
+            for record in self.read(-1 << 62, 1 << 62, bytes):
+                records.append(record)
+                if len(records) >= batch_size:
+                    segment.append(records)
+                    records = []
+            if records:
+                segment.append(records)
+
+            old_segments, self.segments = self.segments, [segment]
+            for old_segment in old_segments:
+                for filename in (old_segment.data_filename, old_segment.index_filename):
+                    if os.path.exists(filename):
+                        os.remove(filename)
+
+    def read(self, start, end, decode):
+        """
+        Generator over the records with timestamps in (start, end], in time order
+
+        :param start: The start timestamp (exclusive)
+        :param end: The end timestamp (inclusive)
+        :param decode: Function to decode the value bytes
+        :return: Generator of (timestamp, value) tuples
+        """
+        segments = list(self.segments)
+        if len(segments) == 1:
+            for record in segments[0].read(start, end, decode):
+                yield record
+            return
+
+        readers = [(RecordInstance(t, v) for t, v in s.read(start, end, decode)) for s in segments]
+        last = None
+        for timestamp, _, value in merge_streams(readers):
+            if last is not None and last[0] != timestamp:
+                yield last
+            last = timestamp, value
+        if last is not None:
+            yield last
+
+    def purge(self):
+        """
+        Remove all of the records
+
+        :return: None
+        """
+        with self.lock:
+            for segment in self.segments:
+                for filename in (segment.data_filename, segment.index_filename):
+                    if os.path.exists(filename):
+                        os.remove(filename)
+            self.segments = []
+
+
+class LogFileChannel(BaseChannel):
+    """
+    Log file channel. Each stream is stored in its own directory below the given path, as append-only binary log files
+    with a sparse timestamp index, together with a small json file holding the stream id and calculated intervals. This
+    persists across restarts without a database, and reads memory map the logs and binary search the index to find the
+    start of a window. Values are stored as json, extended to datetimes and tuples (see value_to_json), and values of
+    other types raise a TypeError when written.
+    """
+    def __init__(self, channel_id, path, index_interval=256, write_batch_size=10000, max_segments=16):
+        """
+        Initialise this channel
+
+        :param channel_id: The channel identifier
+        :param path: The root directory for the logs
+        :param index_interval: The number of records between consecutive index entries
+        :param write_batch_size: The number of instances appended to the log in a single write
+        :param max_segments: The number of segments of a stream log above which they are merged (None to disable)
+        """
+        super(LogFileChannel, self).__init__(channel_id=channel_id, can_calc=False, can_create=True)
+        self.write_batch_size = write_batch_size
+        self.path = os.path.abspath(path)
+        self.index_interval = index_interval
+        self.max_segments = max_segments
+        self.logs = {}
+        self._lock = threading.RLock()
+        if not os.path.exists(self.path):
+            os.makedirs(self.path)
+        self.update_streams(MAX_DATE)
+
+    def update_streams(self, up_to_timestamp):
+        """
+        Load the streams that are saved below the channel path
+
+        :param up_to_timestamp: Not used
+        :return: None
+        """
+        for directory, _, filenames in os.walk(self.path):
+            if STREAM_FILENAME not in filenames:
+                continue
+            with open(os.path.join(directory, STREAM_FILENAME)) as f:
+                definition = json.load(f)
+            stream_id = StreamId(**definition['stream_id'])
+            if stream_id in self.streams:
+                continue
+            calculated_intervals = TimeIntervals([
+                TimeInterval(ms2datetime(s), ms2datetime(e)) for s, e in definition['calculated_intervals']])
+            self.streams[stream_id] = LogStream(
+                channel=self, stream_id=stream_id, calculated_intervals=calculated_intervals, sandbox=None)
+
+    def get_log(self, stream_id):
+        """
+        Get the log of the given stream
+
+        :param stream_id: The stream id
+        :return: The stream log
+        :rtype: StreamLog
+        """
+        with self._lock:
+            if stream_id not in self.logs:
+                self.logs[stream_id] = StreamLog(
+                    get_stream_path(self.path, stream_id), self.index_interval, self.max_segments)
+            return self.logs[stream_id]
+
+    def save_stream(self, stream):
+        """
+        Save the stream id and calculated intervals of the stream
+
+        :param stream: The stream
+        :return: None
+        """
+        path = get_stream_path(self.path, stream.stream_id)
+        if not os.path.isdir(path):
+            os.makedirs(path)
+        definition = dict(
+            stream_id=stream.stream_id.as_dict(),
+            calculated_intervals=[(datetime2ms(i.start), datetime2ms(i.end)) for i in stream.calculated_intervals])
+
+        # Write to a temporary file and rename, so that the definition is never partially written
+        filename = os.path.join(path, STREAM_FILENAME)
+        with open(filename + '.tmp', 'w') as f:
+            json.dump(definition, f)
+        os.rename(filename + '.tmp', filename)
+
+    def create_stream(self, stream_id, sandbox=None):
+        """
+        Create the stream
+
+        :param stream_id: The stream identifier
+        :param sandbox: The sandbox for this stream
+        :return: None
+        :raises: NotImplementedError
+        """
+        if sandbox is not None:
+            raise NotImplementedError
+
+        if stream_id in self.streams:
+            raise StreamAlreadyExistsError("Stream with id '{}' already exists".format(stream_id))
+
+        stream = LogStream(channel=self, stream_id=stream_id, calculated_intervals=None, sandbox=sandbox)
+        self.save_stream(stream)
+        self.streams[stream_id] = stream
+        return stream
+
+    @staticmethod
+    def encode(value):
+        return value_to_json(value).encode('utf-8')
+
+    @staticmethod
+    def decode(data):
+        return value_from_json(data.decode('utf-8'))
+
+    def get_results(self, stream, time_interval):
+        """
+        Get the results for a given stream
+
+        :param stream: The stream object
+        :param time_interval: The time interval
+        :return: A generator over stream instances, in time order
+        """
+        make = StreamInstance.trusted
+        for timestamp, value in self._read(stream, time_interval):
+            yield make(ms2datetime(timestamp), value)
+
+    def get_results_batch(self, stream, time_interval):
+        timestamps = []
+        values = []
+        for timestamp, value in self._read(stream, time_interval):
+            timestamps.append(ms2datetime(timestamp))
+            values.append(value)
+        return StreamInstanceBatch(timestamps, values)
+
+    def _read(self, stream, time_interval):
+        log = self.get_log(stream.stream_id)
+        return log.read(datetime2ms(time_interval.start), datetime2ms(time_interval.end), self.decode)
+
+    def get_stream_writer(self, stream):
+        """
+        Gets the log file writer, which appends the instances to the stream's log
+
+        :param stream: The stream
+        :return: The stream writer function
+        """
+        log = self.get_log(stream.stream_id)
+
+        def writer(document_collection):
+            if isinstance(document_collection, StreamInstance):
+                document_collection = [document_collection]
+            records = [(datetime2ms(t), self.encode(doc)) for t, doc in document_collection]
+            log.append(records)
+            metrics.record_bytes_written(sum(RECORD_HEADER.size + len(value) for _, value in records))
+        return writer
+
+    def compact_stream(self, stream_id):
+        """
+        Merge the segments of the stream's log into one. This is worthwhile after re-running earlier intervals, since
+        each write that goes back in time starts a new segment, and reads merge all of the segments.
+
+        :param stream_id: The stream id
+        :return: None
+        """
+        self.get_log(stream_id).compact()
+        logging.info("Compacted stream {}".format(stream_id))
+
+    def purge_stream(self, stream_id, remove_definition=False, sandbox=None):
+        """
+        Purge the stream
+
+        :param stream_id: The stream identifier
+        :param remove_definition: Whether to remove the stream definition as well
+        :param sandbox: The sandbox for this stream
+        :return: None
+        :raises: NotImplementedError
+        """
+        if sandbox is not None:
+            raise NotImplementedError
+
+        if stream_id not in self.streams:
+            raise StreamNotFoundError("Stream with id '{}' not found".format(stream_id))
+
+        self.get_log(stream_id).purge()
+        self.invalidate_cache(stream_id)
+        self.streams[stream_id].calculated_intervals = TimeIntervals()
+
+        if remove_definition:
+            os.remove(os.path.join(get_stream_path(self.path, stream_id), STREAM_FILENAME))
+            del self.streams[stream_id]
+            with self._lock:
+                self.logs.pop(stream_id, None)
+
+        logging.info("Purged stream {}".format(stream_id))
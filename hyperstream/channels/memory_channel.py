@@ -91,6 +91,7 @@ class MemoryChannel(BaseChannel):
 
         self.data[stream_id] = StreamInstanceCollection()
         self.streams[stream_id].calculated_intervals = TimeIntervals()
+        self.invalidate_cache(stream_id)
 
         if remove_definition:
             del self.data[stream_id]
@@ -103,8 +104,10 @@ class MemoryChannel(BaseChannel):
         :param time_interval: The time interval
         :return: The sorted data items
         """
-        return [StreamInstance(t, self.data[stream.stream_id][t])
-                for t in sorted(self.data[stream.stream_id]) if t in time_interval]
+        return self.data[stream.stream_id].window(time_interval)
+
+    def get_results_batch(self, stream, time_interval):
+        return self.data[stream.stream_id].batch(time_interval)
 
     def get_stream_writer(self, stream):
         def writer(document_collection):
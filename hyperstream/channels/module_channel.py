@@ -20,13 +20,34 @@
 
 from .file_channel import FileChannel
 
-from os.path import join
+from os.path import join, abspath, expanduser
 from re import sub
+from hashlib import md5
 import logging
 import imp
+import os
 import sys
 
 
+MANIFEST_FILENAME = 'manifest_{}.json'
+
+
+def get_cache_dir():
+    """
+    Get the per-user cache directory of HyperStream, creating it (readable only by the user) if necessary
+
+    :return: The directory, or None if it cannot be created
+    """
+    cache_dir = join(os.environ.get('XDG_CACHE_HOME') or join(expanduser('~'), '.cache'), 'hyperstream')
+    try:
+        if not os.path.isdir(cache_dir):
+            os.makedirs(cache_dir, 0o700)
+    except OSError as e:
+        logging.debug("Unable to create cache directory {}: {}".format(cache_dir, e))
+        return None
+    return cache_dir
+
+
 class ModuleChannel(FileChannel):
     """
     A channel of module streams, the documents in the streams contain functions that can be called to import the
@@ -34,6 +55,20 @@ class ModuleChannel(FileChannel):
     """
     versions = None
     
+    @staticmethod
+    def get_manifest_filename(path):
+        """
+        The manifest of module folders is persisted to the per-user cache directory, so that short-lived processes do
+        not need to rescan the folders on startup. The file name is derived from the path of the channel.
+
+        :param path: The root path of the channel
+        :return: The filename, or None if there is no usable cache directory
+        """
+        cache_dir = get_cache_dir()
+        if cache_dir is None:
+            return None
+        return join(cache_dir, MANIFEST_FILENAME.format(md5(abspath(path).encode('utf-8')).hexdigest()))
+
     def update_state(self, up_to_timestamp):
         super(ModuleChannel, self).update_state(up_to_timestamp)
     
@@ -0,0 +1,176 @@
+# The MIT License (MIT) # Copyright (c) 2014-2017 University of Bristol
+#
+#  Permission is hereby granted, free of charge, to any person obtaining a copy
+#  of this software and associated documentation files (the "Software"), to deal
+#  in the Software without restriction, including without limitation the rights
+#  to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+#  copies of the Software, and to permit persons to whom the Software is
+#  furnished to do so, subject to the following conditions:
+#
+#  The above copyright notice and this permission notice shall be included in all
+#  copies or substantial portions of the Software.
+#
+#  THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+#  EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+#  MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT.
+#  IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM,
+#  DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR
+#  OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE
+#  OR OTHER DEALINGS IN THE SOFTWARE.
+"""
+Read cache module. Holds the results of recent stream reads, so that repeated reads of the same window do not go back
+to the underlying store.
+"""
+
+from bisect import bisect_right
+from collections import OrderedDict
+import logging
+import threading
+
+
+class ReadCache(object):
+    """
+    Least recently used cache of stream reads, keyed by (channel id, stream id) and time interval. A read of a time
+    interval is served from any cached interval that covers it. The cache is bounded by the total number of stream
+    instances that it holds, and entries are invalidated when data is written to or purged from the range that they
+    cover. Note that the cached instances are shared between readers, so tools should not modify the values that they
+    read, and data written to the underlying store by other processes is not seen until the entry is evicted.
+    """
+    def __init__(self, max_size):
+        """
+        Initialise the cache
+
+        :param max_size: The maximum number of stream instances to hold
+        """
+        self.max_size = max_size
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._intervals = {}
+        self._generations = {}
+        self._epoch = 0
+        self._lock = threading.RLock()
+
+    def __repr__(self):
+        return "{}(max_size={}, size={}, hits={}, misses={})".format(
+            self.__class__.__name__, self.max_size, self.size, self.hits, self.misses)
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, key, time_interval):
+        """
+        Get the cached instances for the time interval, if it is covered by a cached interval
+
+        :param key: The (channel id, stream id) key
+        :param time_interval: The time interval
+        :return: The stream instances, or None if the interval is not cached
+        :rtype: list[StreamInstance] | None
+        """
+        with self._lock:
+            for start, end in self._intervals.get(key, ()):
+                if start <= time_interval.start and time_interval.end <= end:
+                    entry_key = (key, start, end)
+                    timestamps, instances = self._entries.pop(entry_key)
+                    self._entries[entry_key] = timestamps, instances
+                    lo = bisect_right(timestamps, time_interval.start)
+                    hi = bisect_right(timestamps, time_interval.end)
+                    return instances[lo:hi]
+        return None
+
+    def put(self, key, time_interval, instances, generation=None):
+        """
+        Add the instances read for the time interval. Any cached intervals of the stream that are covered by this one
+        are replaced.
+
+        :param key: The (channel id, stream id) key
+        :param time_interval: The time interval
+        :param instances: The time ordered stream instances
+        :param generation: The generation of the stream when the read started. If data has since been written to or
+        purged from the stream, the instances are discarded
+        :return: None
+        """
+        if len(instances) > self.max_size:
+            return
+        with self._lock:
+            if generation is not None and generation != self._generation(key):
+                return
+            start, end = time_interval.start, time_interval.end
+            for s, e in list(self._intervals.get(key, ())):
+                if start <= s and e <= end:
+                    self._remove((key, s, e))
+            self._entries[(key, start, end)] = [x.timestamp for x in instances], instances
+            self._intervals.setdefault(key, []).append((start, end))
+            self.size += len(instances)
+            while self.size > self.max_size:
+                self._remove(next(iter(self._entries)))
+
+    def read(self, key, time_interval, results):
+        """
+        Generator over the instances in the time interval. These are taken from the cache if possible, otherwise they
+        are taken from the results and added to the cache once all of them have been read.
+
+        :param key: The (channel id, stream id) key
+        :param time_interval: The time interval
+        :param results: The (lazy) results of reading the underlying store
+        :return: Generator over the stream instances
+        """
+        cached = self.get(key, time_interval)
+        if cached is not None:
+            self.hits += 1
+            for instance in cached:
+                yield instance
+            return
+
+        self.misses += 1
+        generation = self._generation(key)
+        instances = []
+        for instance in results:
+            if instances is not None:
+                instances.append(instance)
+                if len(instances) > self.max_size:
+                    instances = None
+            yield instance
+        if instances is not None:
+            self.put(key, time_interval, instances, generation)
+
+    def invalidate(self, key, start=None, end=None):
+        """
+        Remove the cached intervals of the stream that contain timestamps in [start, end]
+
+        :param key: The (channel id, stream id) key
+        :param start: The first timestamp touched (None for no lower bound)
+        :param end: The last timestamp touched (None for no upper bound)
+        :return: None
+        """
+        with self._lock:
+            self._generations[key] = self._generations.get(key, 0) + 1
+            for s, e in list(self._intervals.get(key, ())):
+                if (end is None or s < end) and (start is None or start <= e):
+                    self._remove((key, s, e))
+
+    def clear(self):
+        """
+        Remove all entries
+
+        :return: None
+        """
+        with self._lock:
+            self._epoch += 1
+            self._entries.clear()
+            self._intervals.clear()
+            self.size = 0
+
+    def _generation(self, key):
+        return self._epoch, self._generations.get(key, 0)
+
+    def _remove(self, entry_key):
+        key, start, end = entry_key
+        timestamps, instances = self._entries.pop(entry_key)
+        self.size -= len(instances)
+        intervals = self._intervals[key]
+        intervals.remove((start, end))
+        if not intervals:
+            del self._intervals[key]
+        logging.debug("Removed {} instances of {} from the read cache".format(len(instances), key))
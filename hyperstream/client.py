@@ -28,6 +28,7 @@ import sys
 import logging
 import pymongo
 from mongoengine import connect, connection
+from mongoengine.base.common import _document_registry
 try:
     from pymongo.errors import ServerSelectionTimeoutError
 except ImportError:
@@ -67,6 +68,10 @@ class Client(Printable):
 
         :param server_config: The server configuration
         """
+        if self.is_mock(server_config):
+            self.connect_mock(server_config)
+            return
+
         if 'connection_string' in server_config:
             self.client = pymongo.MongoClient(
                     server_config['connection_string'])
@@ -106,6 +111,44 @@ class Client(Printable):
             connection._connections["default"] = connection._connections["hyperstream"]
             connection._connection_settings["default"] = connection._connection_settings["hyperstream"]
 
+    def reconnect(self):
+        """Open new connections with the same configuration, e.g. in a forked child process, since pymongo clients are
+        not fork-safe. The inherited connections are dropped without being closed, as they belong to the parent.
+        """
+        for alias in ("hyperstream", "default"):
+            connection._connections.pop(alias, None)
+            connection._dbs.pop(alias, None)
+        # Documents cache their collection, which refers to the old client
+        for document_class in _document_registry.values():
+            document_class._collection = None
+        self.connect(self.server_config)
+
+    @staticmethod
+    def is_mock(server_config):
+        """Whether the configuration uses an in-memory mongomock server (host mongomock://...), e.g. for testing and
+        benchmarking without a running database
+
+        :param server_config: The server configuration
+        :return: True if mongomock is used
+        """
+        return str(server_config.get('host', '')).startswith('mongomock://')
+
+    def connect_mock(self, server_config):
+        """Connect to an in-memory mongomock server. The mongoengine connection is shared, so that the documents
+        written through mongoengine and through the client are in the same database. Requires the mongomock package.
+
+        :param server_config: The server configuration
+        """
+        self.session = connect(
+            alias="hyperstream", db=server_config['db'], host=server_config['host'],
+            tz_aware=self.get_config_value('tz_aware', True))
+        self.client = self.session
+        self.db = self.client[server_config['db']]
+
+        if "default" not in connection._connections:
+            connection._connections["default"] = connection._connections["hyperstream"]
+            connection._connection_settings["default"] = connection._connection_settings["hyperstream"]
+
     def get_config_value(self, key, default=None):
         """Get a specific value from the configuration
 
@@ -30,12 +30,57 @@ from .plugin_manager import Plugin
 from .time_interval import RelativeTimeInterval
 
 
+HISTORY_MODES = ('all', 'sample', 'aggregate')
+
+
 class OnlineEngineConfig(Printable):
-    def __init__(self, interval, sleep=5, iterations=100, alarm=None):
+    def __init__(self, interval, sleep=5, iterations=100, alarm=None, processes=None, cadence=None):
+        """
+        Configuration of the online engine
+
+        :param interval: The relative time interval to execute over
+        :param sleep: The time to sleep between iterations (seconds)
+        :param iterations: The number of iterations (per workflow when using worker processes)
+        :param alarm: The timeout after which the engine kills itself (seconds)
+        :param processes: The number of worker processes that the online workflows are sharded over. If not given all
+        workflows are executed serially in the current process
+        :param cadence: Dictionary of workflow ids to the time to sleep between their executions (seconds), for
+        workflows that should not use the default sleep. Only used with worker processes
+        """
         self.interval = RelativeTimeInterval(**interval)
         self.sleep = sleep
         self.iterations = iterations
         self.alarm = sleep * iterations if not alarm else alarm
+        self.processes = processes
+        self.cadence = cadence if cadence else {}
+
+    def get_cadence(self, workflow_id):
+        """
+        Get the time to sleep between executions of the given workflow
+
+        :param workflow_id: The workflow id
+        :return: The cadence (seconds)
+        """
+        return self.cadence.get(workflow_id, self.sleep)
+
+
+class HistoryConfig(Printable):
+    def __init__(self, flush_size=100, flush_interval=10.0, mode='all', sample_every=10):
+        """
+        Configuration of the recording of the session history
+
+        :param flush_size: The number of buffered entries at which the history is written to the history channel
+        :param flush_interval: The maximum time that entries are buffered for (seconds)
+        :param mode: One of 'all' (record every tool execution), 'sample' (record one in every sample_every
+        executions) or 'aggregate' (record the totals for each tool at each flush)
+        :param sample_every: The sampling rate for the 'sample' mode
+        """
+        if mode not in HISTORY_MODES:
+            raise ConfigurationError("Unknown history mode {}, expected one of {}".format(mode, HISTORY_MODES))
+        self.flush_size = flush_size
+        self.flush_interval = flush_interval
+        self.mode = mode
+        self.sample_every = sample_every
 
 
 class HyperStreamConfig(Printable):
@@ -55,7 +100,17 @@ class HyperStreamConfig(Printable):
                 config = json.load(f)
                 self.mongo = config['mongo']
                 self.history_channel = config.get('history_channel', 'memory')
+                self.history = HistoryConfig(**config.get('history', {}))
                 self.output_path = config.get('output_path', 'output')
+                self.stream_cache_size = config.get('stream_cache_size', None)
+                self.workflow_cache_size = config.get('workflow_cache_size', None)
+                self.read_cache_size = config.get('read_cache_size', None)
+                self.local_channel_path = config.get('local_channel_path', None)
+                self.bucket_size = config.get('bucket_size', None)
+                self.stream_keys = config.get('stream_keys', 'auto')
+                if self.stream_keys not in ('auto', True, False):
+                    raise ConfigurationError("stream_keys must be 'auto', true or false, got {}"
+                                             .format(self.stream_keys))
                 self.plugins = [Plugin(**p) for p in config.get('plugins', [])]
                 self.online_engine = OnlineEngineConfig(**config["online_engine"])
         except (OSError, IOError, TypeError) as e:
@@ -21,22 +21,72 @@
 
 import logging
 import itertools
+import threading
+from multiprocessing.pool import ThreadPool
 
 from ..node import Node
-from ..plate import Plate
+from ..plate import Plate, PlateValueIndex
 from ..time_interval import TimeIntervals
 from ..tool import BaseTool, MultiOutputTool, AggregateTool, SelectorTool, PlateCreationTool
-from ..utils import Printable, IncompatibleToolError, IncompatiblePlatesError
+from ..utils import Printable, IncompatibleToolError, IncompatiblePlatesError, synchronized, measured, metrics
 
 
 class FactorBase(Printable):
     def __init__(self, tool):
         self.tool = tool
 
+        # Number of threads used to execute the tool over the plate values (None for serial execution)
+        self.max_workers = None
+
+        # Prevents the same factor being executed concurrently, e.g. when several threads request upstream computation
+        self._lock = threading.RLock()
+
     @property
     def factor_id(self):
         return "{}(tool={})".format(self.__class__.__name__, self.tool)
 
+    def flush_calculated_intervals(self):
+        """
+        Flushes any deferred calculated interval updates for the channels of the sink streams of this factor
+
+        :return: None
+        """
+        sink = getattr(self, 'sink', None)
+        if sink is None:
+            return
+        channels = dict((stream.channel.channel_id, stream.channel) for stream in sink.streams.values())
+        for channel in channels.values():
+            channel.flush_calculated_intervals()
+
+    def execute_tool(self, calls):
+        """
+        Executes the tool once for each of the given sets of keyword arguments (typically one per plate value). These
+        executions are independent, so if max_workers is set they are run concurrently on a thread pool. Note that the
+        same tool object is shared between the threads, so this should only be enabled for tools that do not modify
+        their own state during execution.
+
+        :param calls: The keyword arguments for each call to the tool's execute method
+        :type calls: list[dict]
+        :return: None
+        """
+        if not self.max_workers or len(calls) < 2:
+            for kwargs in calls:
+                self.tool.execute(**kwargs)
+            return
+
+        # Attribute the executions on the pool threads to this factor's execution
+        parent = metrics.current
+
+        def execute(kwargs):
+            with metrics.adopt(parent):
+                self.tool.execute(**kwargs)
+
+        pool = ThreadPool(min(self.max_workers, len(calls)))
+        try:
+            pool.map(execute, calls)
+        finally:
+            pool.close()
+
 
 class Factor(FactorBase):
     """
@@ -90,6 +140,8 @@ class Factor(FactorBase):
         
         self.alignment_node = alignment_node
     
+    @synchronized
+    @measured("factor", "factor_id")
     def execute(self, time_interval):
         """
         Execute the factor over the given time interval
@@ -112,10 +164,12 @@ class Factor(FactorBase):
                 # Here we should loop through the plate values of the sink, and get the sources that are appropriate for
                 # that given plate value, and pass only those sources to the tool. This is cleaner than making the tool
                 # deal with all of the sources
+                calls = []
                 for pv in self.sink.plate_values:
-                    sources = [all_sources.streams[s] for s in all_sources.streams if all([v in s for v in pv])]
+                    sources = all_sources.find_streams(pv)
                     sink = self.sink.streams[pv]
-                    self.tool.execute(sources=sources, sink=sink, interval=time_interval, alignment_stream=None)
+                    calls.append(dict(sources=sources, sink=sink, interval=time_interval, alignment_stream=None))
+                self.execute_tool(calls)
             elif isinstance(self.tool, SelectorTool):
                 if len(self.sources) == 1:
                     sources = self.sources[0].streams.values()
@@ -148,11 +202,13 @@ class Factor(FactorBase):
                 # What we probably want is to take the cartesian product of plate values
                 if len(self.plates) == 1:
                     plate = self.plates[0]
+                    calls = []
                     for pv in plate.values:
                         sources = self.get_sources(plate, pv)
                         sink = self.sink.streams[pv]
-                        self.tool.execute(sources=sources, sink=sink, interval=time_interval,
-                                          alignment_stream=self.get_alignment_stream(None, None))
+                        calls.append(dict(sources=sources, sink=sink, interval=time_interval,
+                                          alignment_stream=self.get_alignment_stream(None, None)))
+                    self.execute_tool(calls)
                 else:
                     if len(self.sources) != 1 and not all(s.plates == self.plates for s in self.sources):
                         source_plates = sorted(p.plate_id for s in self.sources for p in s.plates)
@@ -162,24 +218,37 @@ class Factor(FactorBase):
                             # combination
                             search = [[x[0] for x in p.values] for p in self.plates]
                             _pv = sorted(itertools.product(*search))
+                            # Group the streams of each source by the first item of their plate values
+                            by_first = []
+                            for source in self.sources:
+                                groups = {}
+                                for i, s in enumerate(source.streams):
+                                    groups.setdefault(s[0], []).append((i, source.streams[s]))
+                                by_first.append(groups)
+                            calls = []
                             for pv in _pv:
                                 # Here we're selecting the streams that have the partial match of the plate value
-                                sources = [source.streams[s] for source in self.sources
-                                           for s in source.streams if (s[0] in pv)]
+                                sources = [stream for groups in by_first
+                                           for _, stream in sorted(itertools.chain(*(groups.get(item, [])
+                                                                                     for item in set(pv))),
+                                                                   key=lambda x: x[0])]
                                 try:
                                     sink = self.sink.streams[pv]
-                                    self.tool.execute(sources=sources, sink=sink, interval=time_interval,
-                                                  alignment_stream=self.get_alignment_stream(None, None))
+                                    calls.append(dict(sources=sources, sink=sink, interval=time_interval,
+                                                      alignment_stream=self.get_alignment_stream(None, None)))
                                 except KeyError as e:
                                     continue
+                            self.execute_tool(calls)
 
                         else:
                             raise NotImplementedError
+                    calls = []
                     for pv in Plate.get_overlapping_values(self.plates):
-                        sources = [source.streams[s] for source in self.sources for s in source.streams if pv == s]
+                        sources = [source.streams[pv] for source in self.sources if pv in source.streams]
                         sink = self.sink.streams[pv]
-                        self.tool.execute(sources=sources, sink=sink, interval=time_interval,
-                                          alignment_stream=self.get_alignment_stream(None, None))
+                        calls.append(dict(sources=sources, sink=sink, interval=time_interval,
+                                          alignment_stream=self.get_alignment_stream(None, None)))
+                    self.execute_tool(calls)
         else:
             if isinstance(self.tool, AggregateTool):
                 # raise ValueError("Cannot execute an AggregateTool if no plates are defined for the factor")
@@ -199,6 +268,7 @@ class Factor(FactorBase):
                 sink = self.sink.streams[None]
                 self.tool.execute(sources=sources, sink=sink, interval=time_interval,
                                   alignment_stream=self.get_alignment_stream(None, None))
+        self.flush_calculated_intervals()
         return self
     
     def get_sources(self, plate, plate_value, sources=None):
@@ -321,6 +391,8 @@ class MultiOutputFactor(FactorBase):
         
         self.output_plates = output_plates
 
+    @synchronized
+    @measured("factor", "factor_id")
     def execute(self, time_interval):
         """
         Execute the factor over the given time interval. Note that this is normally done by the workflow,
@@ -334,25 +406,27 @@ class MultiOutputFactor(FactorBase):
 
         input_plate_values = self.input_plate.values if self.input_plate else [None]
         output_plate_values = self.sink.plate_values
-        meta_data_ids = [p.meta_data_id for p in self.sink.plates]
+        meta_data_ids = set(p.meta_data_id for p in self.sink.plates)
 
-        def belongs(plate_value):
-            return all(ii in plate_value for ii in input_plate_value)
+        # Index the output plate values so that the values below each input plate value are found directly
+        if len(self.sink.plates) == 1:
+            output_index = self.sink.plates[0].index
+        else:
+            output_index = PlateValueIndex(output_plate_values)
 
         def meta_data_matches(plate_value):
-            return filter(lambda x: x[0] in meta_data_ids, plate_value)
+            return [x for x in plate_value if x[0] in meta_data_ids]
 
         for input_plate_value in input_plate_values:
             if input_plate_value:
                 # Select only the valid output plate values based on the input plate value
-                # filtered = filter(belongs, output_plate_values)
-                filtered = filter(belongs, output_plate_values)
+                filtered = output_index.find(input_plate_value)
             else:
                 filtered = output_plate_values
 
             sinks = [self.sink.streams[s] for s in filtered]
 
-            sub_plate_values_only = map(meta_data_matches, filtered)
+            sub_plate_values_only = [meta_data_matches(pv) for pv in filtered]
 
             if not self.source:
                 source = None
@@ -385,6 +459,7 @@ class MultiOutputFactor(FactorBase):
                 output_plate_values=sub_plate_values_only)
             self.update_computed_intervals(sinks, time_interval)
 
+        self.flush_calculated_intervals()
         return self
 
     def get_splitting_stream(self, input_plate_value):
@@ -416,10 +491,10 @@ class MultiOutputFactor(FactorBase):
         else:
             # First check if it's a direct child
             if splitting_plate.is_child(self.input_plate):
-                ppv = filter(lambda x: all(p in input_plate_value for p in x), self.input_plate.parent.values)
-                if len(ppv) != 1:
+                ppv = self.input_plate.get_parent_value(input_plate_value)
+                if ppv is None:
                     raise ValueError("Parent plate value not found")
-                splitting_stream = self.splitting_node.streams[ppv[0]]
+                splitting_stream = self.splitting_node.streams[ppv]
             # Then more generally if it's a descendant
             elif splitting_plate.is_descendant(self.input_plate):
                 # Here we need to find the splitting plate value that is valid for the
@@ -499,6 +574,8 @@ class NodeCreationFactor(FactorBase):
         self._plate_manager = plate_manager
         self._meta_data_manager = plate_manager.meta_data_manager
 
+    @synchronized
+    @measured("factor", "factor_id")
     def execute(self, time_interval):
         """
         Execute the factor over the given time interval. Note that this is normally done by the workflow,
@@ -24,12 +24,14 @@ Main HyperStream class
 
 from . import ChannelManager, HyperStreamConfig, PlateManager, WorkflowManager, Client, Workflow
 from .version import __version__
-from .utils import HyperStreamLogger, ToolContainer, PluginContainer, PluginWrapper, FactorContainer, Singleton
+from .utils import HyperStreamLogger, ToolContainer, PluginContainer, PluginWrapper, FactorContainer, Singleton, \
+    BootstrapProfile
 from .session import Session
 from .tool import Tool, MultiOutputTool, SelectorTool, AggregateTool, PlateCreationTool
 
 import logging
 from contextlib import contextmanager
+from functools import partial
 from six import add_metaclass
 
 
@@ -74,15 +76,46 @@ class HyperStream(object):
             mqtt_logger=mqtt_logger
         )
 
-        self.logger = HyperStreamLogger(
-            default_loglevel=loglevel, file_logger=file_logger, console_logger=console_logger, mqtt_logger=mqtt_logger)
-        self.config = HyperStreamConfig(filename=config_filename)
-        self.client = Client(self.config.mongo)
+        # Timings of each of the phases below, see bootstrap_profile.report()
+        self.bootstrap_profile = BootstrapProfile()
+        profile = self.bootstrap_profile
+
+        with profile.phase("logger"):
+            self.logger = HyperStreamLogger(
+                default_loglevel=loglevel, file_logger=file_logger, console_logger=console_logger,
+                mqtt_logger=mqtt_logger)
+
+        with profile.phase("config") as counts:
+            self.config = HyperStreamConfig(filename=config_filename)
+            counts["plugins"] = len(self.config.plugins)
+
+        with profile.phase("client"):
+            self.client = Client(self.config.mongo)
 
         # Define some managers
-        self.channel_manager = ChannelManager(self.config.plugins)
-        self.plate_manager = PlateManager()
-        self.workflow_manager = WorkflowManager(channel_manager=self.channel_manager, plate_manager=self.plate_manager)
+        with profile.phase("channels") as counts:
+            self.channel_manager = ChannelManager(
+                self.config.plugins,
+                stream_cache_size=self.config.stream_cache_size,
+                read_cache_size=self.config.read_cache_size,
+                local_path=self.config.local_channel_path,
+                bucket_size=self.config.bucket_size,
+                stream_keys=self.config.stream_keys)
+            counts["channels"] = len(self.channel_manager)
+            counts["streams"] = sum(c.streams.num_loaded for c in self.channel_manager.values())
+
+        with profile.phase("plates") as counts:
+            self.plate_manager = PlateManager()
+            counts["plates"] = len(self.plate_manager.plates)
+            counts["meta_data"] = len(self.plate_manager.meta_data_manager.global_plate_definitions.nodes)
+
+        with profile.phase("workflows") as counts:
+            self.workflow_manager = WorkflowManager(
+                channel_manager=self.channel_manager, plate_manager=self.plate_manager,
+                max_workflows=self.config.workflow_cache_size)
+            counts["workflows"] = len(self.workflow_manager.workflows)
+            counts["loaded"] = self.workflow_manager.workflows.num_loaded
+
         self.plugins = PluginContainer()
 
         # The following are to keep pep happy - will be populated below
@@ -90,7 +123,12 @@ class HyperStream(object):
         self.factors = None
 
         self.current_workflow = None  # Used in the new API - the current workflow being defined
-        self.populate_tools_and_factors()
+
+        with profile.phase("tools") as counts:
+            self.populate_tools_and_factors()
+            counts["tools"] = sum(len(c.streams) for c in self.channel_manager.tool_channels)
+
+        logging.debug("HyperStream bootstrap profile:\n{}".format(profile.report()))
 
     def __repr__(self):
         """
@@ -173,7 +211,8 @@ class HyperStream(object):
 
         :return: the created session
         """
-        self.current_session = Session(self, history_channel=self.config.history_channel)
+        self.current_session = Session(self, history_channel=self.config.history_channel,
+                                       history_config=self.config.history)
         return self.current_session
 
     @property
@@ -220,7 +259,8 @@ class HyperStream(object):
         Session.clear_sessions(self, inactive_only, clear_history)
 
     @contextmanager
-    def create_workflow(self, workflow_id, name, owner, description, online=False, monitor=False, safe=True):
+    def create_workflow(self, workflow_id, name, owner, description, online=False, monitor=False, safe=True,
+                        max_workers=None):
         """
         Create a new workflow. Simple wrapper for creating a workflow and adding it to the workflow manager.
 
@@ -231,6 +271,7 @@ class HyperStream(object):
         :param online: Whether this workflow should be executed by the online engine
         :param monitor: Whether the workflow computations should be monitored
         :param safe: If safe=True, will throw an error if the workflow already exists
+        :param max_workers: The number of threads used by each factor to execute over plate values (None for serial)
         :return: The workflow
 
         """
@@ -241,7 +282,8 @@ class HyperStream(object):
                 owner=owner,
                 description=description,
                 online=online,
-                monitor=monitor
+                monitor=monitor,
+                max_workers=max_workers
             )
 
             self.workflow_manager.add_workflow(w)
@@ -268,7 +310,8 @@ class HyperStream(object):
 
     def populate_tools_and_factors(self):
         """
-        Function to populate factory functions for the tools and factors for ease of access.
+        Function to populate factory functions for the tools and factors for ease of access. The tools are loaded
+        lazily: a tool module is only imported when the tool (or its factory function) is first accessed.
 
         :return: None
         """
@@ -288,179 +331,197 @@ class HyperStream(object):
                 factor_container = plugin.factors
 
             for tool_stream in tool_channel.streams:
-                try:
-                    # This is the tool initializer
-                    tool_function = self.channel_manager.get_tool_class(tool_stream.name)
-                    setattr(tool_container, tool_stream.name, tool_function)
-
-                    def create_factory_function(tool_func):
-                        """
-                        This wrapper is needed to capture the tool_function closure
-
-                        :param tool_func: The tool function
-                        :return: The factory function
-
-                        """
-                        base = tool_function.__bases__[0]
-                        if base == Tool:
-                            def tool_factory_function(sources, alignment_node=None, **parameters):
-                                """
-                                Factory function for creating factors inside a workflow
-
-                                :param sources: source nodes
-                                :param alignment_node: alignment node
-                                :return: the created factor
-                                :type sources: list[Node] | tuple[Node] | None
-
-                                """
-                                if not self.current_workflow:
-                                    raise ValueError("No workflow context - use create_workflow first")
-
-                                # find matching tools (possibly different parameters)
-                                matches = [f for f in self.current_workflow.factors if f.tool.__class__ == tool_func]
-                                # make sure parameters are all the same
-                                full_matches = [m for m in matches if m.sources == sources
-                                                and m.alignment_node == alignment_node
-                                                and dict(m.tool.parameters_dict) == parameters]
-
-                                if len(full_matches) == 1:
-                                    tool = full_matches[0].tool
-                                else:
-                                    tool = tool_func(**parameters)
-
-                                return dict(
-                                    workflow=self.current_workflow,
-                                    tool=tool,
-                                    sources=sources,
-                                    alignment_node=alignment_node)
-
-                            return tool_factory_function
-                        elif base == MultiOutputTool:
-                            def tool_factory_function(source, splitting_node=None, **parameters):
-                                """
-                                Factory function for creating factors inside a workflow
-
-                                :param source: source node
-                                :param splitting_node: splitting node
-                                :return: the created factor
-                                :type source: Node
-
-                                """
-                                if not self.current_workflow:
-                                    raise ValueError("No workflow context - use create_workflow first")
-
-                                # find matching tools (possibly different parameters)
-                                matches = [f for f in self.current_workflow.factors if
-                                           f.tool.__class__ == tool_func]
-                                # make sure parameters are all the same
-                                full_matches = [m for m in matches if m.source == source
-                                                and m.splitting_node == splitting_node
-                                                and dict(m.tool.parameters_dict) == parameters]
-
-                                if len(full_matches) == 1:
-                                    tool = full_matches[0].tool
-                                else:
-                                    tool = tool_func(**parameters)
-
-                                return dict(
-                                    workflow=self.current_workflow,
-                                    tool=tool,
-                                    source=source,
-                                    splitting_node=splitting_node)
-
-                            return tool_factory_function
-
-                        elif base == AggregateTool:
-                            def tool_factory_function(sources, alignment_node, aggregation_meta_data, **parameters):
-                                """
-                                Factory function for creating factors inside a workflow
-
-                                :param aggregation_meta_data: the meta data to aggregate over
-                                :param sources: source nodes
-                                :param alignment_node: alignment node
-                                :return: the created factor
-                                :type sources: list[Node] | tuple[Node] | None
-
-                                """
-                                if not self.current_workflow:
-                                    raise ValueError("No workflow context - use create_workflow first")
-
-                                # find matching tools (possibly different parameters)
-                                matches = [f for f in self.current_workflow.factors if
-                                           f.tool.__class__ == tool_func]
-                                # make sure parameters are all the same
-                                full_matches = [m for m in matches if m.sources == sources
-                                                and m.alignment_node == alignment_node
-                                                and dict(m.tool.parameters_dict) == parameters]
-
-                                if len(full_matches) == 1:
-                                    tool = full_matches[0].tool
-                                else:
-                                    tool = tool_func(aggregation_meta_data=aggregation_meta_data, **parameters)
-
-                                return dict(
-                                    workflow=self.current_workflow,
-                                    tool=tool,
-                                    sources=sources,
-                                    alignment_node=alignment_node)
-
-                            return tool_factory_function
-                        elif base == SelectorTool:
-                            def tool_factory_function(sources, selector_meta_data, **parameters):
-                                """
-                                Factory function for creating factors inside a workflow
-
-                                :param selector_meta_data: the meta data to select over
-                                :param sources: source nodes
-                                :return: the created factor
-                                :type sources: list[Node] | tuple[Node] | None
-
-                                """
-                                if not self.current_workflow:
-                                    raise ValueError("No workflow context - use create_workflow first")
-
-                                # find matching tools (possibly different parameters)
-                                matches = [f for f in self.current_workflow.factors if
-                                           f.tool.__class__ == tool_func]
-                                # make sure parameters are all the same
-                                full_matches = [m for m in matches if m.sources == sources
-                                                and m.selector_meta_data == selector_meta_data
-                                                and dict(m.tool.parameters_dict) == parameters]
-
-                                if len(full_matches) == 1:
-                                    tool = full_matches[0].tool
-                                else:
-                                    tool = tool_func(selector_meta_data=selector_meta_data, **parameters)
-
-                                return dict(
-                                    workflow=self.current_workflow,
-                                    tool=tool,
-                                    sources=sources)
-
-                            return tool_factory_function
-                        elif base == PlateCreationTool:
-                            def tool_factory_function(source, **parameters):
-                                """
-                                Factory function for creating factors inside a workflow
-
-                                :param source: source node
-                                :return: the created factor
-                                :type source: Node
-
-                                """
-                                if not self.current_workflow:
-                                    raise ValueError("No workflow context - use create_workflow first")
-
-                                return dict(
-                                    workflow=self.current_workflow,
-                                    tool=tool_func(**parameters),
-                                    source=source)
-
-                            return tool_factory_function
-                        else:
-                            raise NotImplementedError
-
-                    setattr(factor_container, tool_stream.name, create_factory_function(tool_function))
-
-                except (NameError, AttributeError, ImportError) as e:
-                    logging.warn('Unable to load tool {}: {}'.format(tool_stream.name, e))
+                tool_container.register(tool_stream.name, partial(self.load_tool, tool_stream.name))
+                factor_container.register(tool_stream.name, partial(self.load_factory_function, tool_container,
+                                                                    tool_stream.name))
+
+    def load_tool(self, name):
+        """
+        Load the tool class, importing the tool module if necessary
+
+        :param name: The tool name
+        :return: The tool class
+        :raises: AttributeError if the tool cannot be loaded
+        """
+        try:
+            return self.channel_manager.get_tool_class(name)
+        except (NameError, AttributeError, ImportError) as e:
+            logging.warn('Unable to load tool {}: {}'.format(name, e))
+            raise AttributeError("Unable to load tool {}".format(name))
+
+    def load_factory_function(self, tool_container, name):
+        """
+        Load the factory function for the tool
+
+        :param tool_container: The container holding the tool class
+        :param name: The tool name
+        :return: The factory function
+        """
+        return self.create_factory_function(getattr(tool_container, name))
+
+    def create_factory_function(self, tool_func):
+        """
+        Create the factory function used to add factors for the given tool to the current workflow
+
+        :param tool_func: The tool class
+        :return: The factory function
+        """
+        # Subclasses of the tool types (e.g. IncrementalTool) share the factory function of their type. Note that
+        # AggregateTool derives from Tool, so must be checked first
+        if issubclass(tool_func, MultiOutputTool):
+            def tool_factory_function(source, splitting_node=None, **parameters):
+                """
+                Factory function for creating factors inside a workflow
+
+                :param source: source node
+                :param splitting_node: splitting node
+                :return: the created factor
+                :type source: Node
+
+                """
+                if not self.current_workflow:
+                    raise ValueError("No workflow context - use create_workflow first")
+
+                # find matching tools (possibly different parameters)
+                matches = [f for f in self.current_workflow.factors if
+                           f.tool.__class__ == tool_func]
+                # make sure parameters are all the same
+                full_matches = [m for m in matches if m.source == source
+                                and m.splitting_node == splitting_node
+                                and dict(m.tool.parameters_dict) == parameters]
+
+                if len(full_matches) == 1:
+                    tool = full_matches[0].tool
+                else:
+                    tool = tool_func(**parameters)
+
+                return dict(
+                    workflow=self.current_workflow,
+                    tool=tool,
+                    source=source,
+                    splitting_node=splitting_node)
+
+            return tool_factory_function
+
+        elif issubclass(tool_func, AggregateTool):
+            def tool_factory_function(sources, alignment_node, aggregation_meta_data, **parameters):
+                """
+                Factory function for creating factors inside a workflow
+
+                :param aggregation_meta_data: the meta data to aggregate over
+                :param sources: source nodes
+                :param alignment_node: alignment node
+                :return: the created factor
+                :type sources: list[Node] | tuple[Node] | None
+
+                """
+                if not self.current_workflow:
+                    raise ValueError("No workflow context - use create_workflow first")
+
+                # find matching tools (possibly different parameters)
+                matches = [f for f in self.current_workflow.factors if
+                           f.tool.__class__ == tool_func]
+                # make sure parameters are all the same
+                full_matches = [m for m in matches if m.sources == sources
+                                and m.alignment_node == alignment_node
+                                and dict(m.tool.parameters_dict) == parameters]
+
+                if len(full_matches) == 1:
+                    tool = full_matches[0].tool
+                else:
+                    tool = tool_func(aggregation_meta_data=aggregation_meta_data, **parameters)
+
+                return dict(
+                    workflow=self.current_workflow,
+                    tool=tool,
+                    sources=sources,
+                    alignment_node=alignment_node)
+
+            return tool_factory_function
+        elif issubclass(tool_func, SelectorTool):
+            def tool_factory_function(sources, selector_meta_data, **parameters):
+                """
+                Factory function for creating factors inside a workflow
+
+                :param selector_meta_data: the meta data to select over
+                :param sources: source nodes
+                :return: the created factor
+                :type sources: list[Node] | tuple[Node] | None
+
+                """
+                if not self.current_workflow:
+                    raise ValueError("No workflow context - use create_workflow first")
+
+                # find matching tools (possibly different parameters)
+                matches = [f for f in self.current_workflow.factors if
+                           f.tool.__class__ == tool_func]
+                # make sure parameters are all the same
+                full_matches = [m for m in matches if m.sources == sources
+                                and m.selector_meta_data == selector_meta_data
+                                and dict(m.tool.parameters_dict) == parameters]
+
+                if len(full_matches) == 1:
+                    tool = full_matches[0].tool
+                else:
+                    tool = tool_func(selector_meta_data=selector_meta_data, **parameters)
+
+                return dict(
+                    workflow=self.current_workflow,
+                    tool=tool,
+                    sources=sources)
+
+            return tool_factory_function
+        elif issubclass(tool_func, PlateCreationTool):
+            def tool_factory_function(source, **parameters):
+                """
+                Factory function for creating factors inside a workflow
+
+                :param source: source node
+                :return: the created factor
+                :type source: Node
+
+                """
+                if not self.current_workflow:
+                    raise ValueError("No workflow context - use create_workflow first")
+
+                return dict(
+                    workflow=self.current_workflow,
+                    tool=tool_func(**parameters),
+                    source=source)
+
+            return tool_factory_function
+        elif issubclass(tool_func, Tool):
+            def tool_factory_function(sources, alignment_node=None, **parameters):
+                """
+                Factory function for creating factors inside a workflow
+
+                :param sources: source nodes
+                :param alignment_node: alignment node
+                :return: the created factor
+                :type sources: list[Node] | tuple[Node] | None
+
+                """
+                if not self.current_workflow:
+                    raise ValueError("No workflow context - use create_workflow first")
+
+                # find matching tools (possibly different parameters)
+                matches = [f for f in self.current_workflow.factors if f.tool.__class__ == tool_func]
+                # make sure parameters are all the same
+                full_matches = [m for m in matches if m.sources == sources
+                                and m.alignment_node == alignment_node
+                                and dict(m.tool.parameters_dict) == parameters]
+
+                if len(full_matches) == 1:
+                    tool = full_matches[0].tool
+                else:
+                    tool = tool_func(**parameters)
+
+                return dict(
+                    workflow=self.current_workflow,
+                    tool=tool,
+                    sources=sources,
+                    alignment_node=alignment_node)
+
+            return tool_factory_function
+        else:
+            raise NotImplementedError
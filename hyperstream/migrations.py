@@ -0,0 +1,98 @@
+# The MIT License (MIT) # Copyright (c) 2014-2017 University of Bristol
+#
+#  Permission is hereby granted, free of charge, to any person obtaining a copy
+#  of this software and associated documentation files (the "Software"), to deal
+#  in the Software without restriction, including without limitation the rights
+#  to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+#  copies of the Software, and to permit persons to whom the Software is
+#  furnished to do so, subject to the following conditions:
+#
+#  The above copyright notice and this permission notice shall be included in all
+#  copies or substantial portions of the Software.
+#
+#  THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+#  EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+#  MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT.
+#  IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM,
+#  DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR
+#  OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE
+#  OR OTHER DEALINGS IN THE SOFTWARE.
+"""
+Migrations of the HyperStream database.
+
+Usage: python -m hyperstream.migrations [--config hyperstream_config.json] [--drop-legacy-indexes]
+"""
+
+import argparse
+import logging
+
+from mongoengine.context_managers import switch_db
+
+from .channels.database_channel import DatabaseChannel
+from .client import Client
+from .config import HyperStreamConfig
+from .models import StreamInstanceModel
+from .stream import get_stream_key
+
+
+# Indexes on the full stream id, which were used before the instances were indexed on their stream key
+LEGACY_STREAM_INDEXES = ('stream_id_1', 'stream_id_1_datetime_1')
+
+
+def migrate_stream_keys(drop_legacy_indexes=False):
+    """
+    Adds the stream key (see StreamId.key) to the stream instances that were written without one, and creates the
+    (stream_key, datetime) index. This can be run repeatedly, and while the database is in use, as instances that
+    already have a key are not touched. The migration is then recorded in the database, so that channel managers with
+    stream_keys set to "auto" use the keys without checking the instances. Requires the "hyperstream" mongoengine
+    connection (i.e. a connected Client).
+
+    :param drop_legacy_indexes: Whether to drop the indexes on the full stream id, which are only needed by channels
+    that are not keyed
+    :return: The number of instances that were updated
+    """
+    with switch_db(StreamInstanceModel, 'hyperstream'):
+        collection = StreamInstanceModel._get_collection()
+        missing = {'stream_key': {'$exists': False}}
+
+        count = 0
+        stream_ids = collection.distinct('stream_id', missing)
+        for i, stream_id in enumerate(stream_ids):
+            name = stream_id['name']
+            meta_data = stream_id.get('meta_data', [])
+            query = {'stream_id.name': name, 'stream_id.meta_data': meta_data}
+            query.update(missing)
+            result = collection.update_many(query, {'$set': {'stream_key': get_stream_key(name, meta_data)}})
+            count += result.modified_count
+            if (i + 1) % 1000 == 0:
+                logging.info("Added stream keys to {} of {} streams".format(i + 1, len(stream_ids)))
+
+        logging.info("Added stream keys to {} instances in {} streams".format(count, len(stream_ids)))
+        StreamInstanceModel.ensure_indexes()
+        DatabaseChannel.mark_stream_keys_migrated()
+
+        if drop_legacy_indexes:
+            existing = collection.index_information()
+            for index_name in LEGACY_STREAM_INDEXES:
+                if index_name in existing:
+                    collection.drop_index(index_name)
+                    logging.info("Dropped index {}".format(index_name))
+
+    return count
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Add stream keys to the stream instances in the HyperStream database")
+    parser.add_argument("--config", default="hyperstream_config.json", help="The configuration file")
+    parser.add_argument("--drop-legacy-indexes", action="store_true",
+                        help="Drop the indexes on the full stream id (only needed by channels that are not keyed)")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    config = HyperStreamConfig(args.config)
+    Client(config.mongo)
+    migrate_stream_keys(drop_legacy_indexes=args.drop_legacy_indexes)
+
+
+if __name__ == '__main__':
+    main()
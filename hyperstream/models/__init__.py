@@ -18,7 +18,7 @@
 #  OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE
 #  OR OTHER DEALINGS IN THE SOFTWARE.
 
-from .stream import StreamDefinitionModel, StreamInstanceModel, StreamIdField
+from .stream import StreamDefinitionModel, StreamInstanceModel, StreamBucketModel, StreamIdField
 from .workflow import WorkflowDefinitionModel, WorkflowStatusModel
 from .plate import PlateDefinitionModel
 from .node import NodeDefinitionModel
@@ -27,3 +27,4 @@ from .tool import ToolModel, ToolParameterModel
 from .time_interval import TimeIntervalModel
 from .meta_data import MetaDataModel
 from .session import SessionModel, UnameField
+from .migration import MigrationModel
@@ -19,7 +19,7 @@
 #  OR OTHER DEALINGS IN THE SOFTWARE.
 
 from mongoengine import Document, DateTimeField, StringField, DynamicField, EmbeddedDocumentListField, \
-    EmbeddedDocument, EmbeddedDocumentField, ListField
+    EmbeddedDocument, EmbeddedDocumentField, ListField, LongField, IntField
 
 from .time_interval import TimeIntervalModel
 from ..time_interval import TimeInterval, TimeIntervals
@@ -32,21 +32,44 @@ class StreamIdField(EmbeddedDocument):
 
 class StreamInstanceModel(Document):
     stream_id = EmbeddedDocumentField(document_type=StreamIdField, required=True)
+    # Compact hash of the stream id (see StreamId.key), which is what the instances are indexed on. Documents written
+    # before this was introduced do not have it until migrate_stream_keys has been run
+    stream_key = LongField(required=False)
     stream_type = StringField(required=False, min_length=1, max_length=512)
     datetime = DateTimeField(required=True)
     # tool_version = StringField(required=True, min_length=1, max_length=512)
     value = DynamicField(required=True)
-    
+
     meta = {
         'collection': 'streams',
         'indexes': [
-            {'fields': ['stream_id']},
-            {'fields': ['stream_id', 'datetime'], 'unique': True}
+            {'fields': ['stream_key', 'datetime'], 'unique': True,
+             'partialFilterExpression': {'stream_key': {'$exists': True}}}
         ],
         'ordering': ['datetime']
     }
 
 
+class StreamBucketModel(Document):
+    """
+    A fixed time bucket of the instances of a stream (see BucketedDatabaseChannel). The timestamps and values are held
+    in parallel arrays in the order that they were written, which is not necessarily time order.
+    """
+    stream_id = EmbeddedDocumentField(document_type=StreamIdField, required=True)
+    stream_key = LongField(required=True)
+    start = DateTimeField(required=True)  # The start of the bucket (inclusive)
+    min_datetime = DateTimeField(required=True)
+    max_datetime = DateTimeField(required=True)
+    count = IntField(required=True)
+    timestamps = ListField(DateTimeField(), required=True)
+    values = ListField(required=True)
+
+    meta = {
+        'collection': 'stream_buckets',
+        'indexes': [{'fields': ['stream_key', 'start'], 'unique': True}],
+    }
+
+
 class StreamDefinitionModel(Document):
     stream_id = EmbeddedDocumentField(document_type=StreamIdField, required=True)
     stream_type = StringField(required=False, min_length=1, max_length=512)
@@ -18,7 +18,7 @@
 #  OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE
 #  OR OTHER DEALINGS IN THE SOFTWARE.
 
-from mongoengine import Document, StringField, EmbeddedDocumentListField, DateTimeField, BooleanField
+from mongoengine import Document, StringField, EmbeddedDocumentListField, DateTimeField, BooleanField, IntField
 
 from .time_interval import TimeIntervalModel
 from .node import NodeDefinitionModel
@@ -34,6 +34,7 @@ class WorkflowDefinitionModel(Document):
     owner = StringField(required=False, min_length=1, max_length=512)
     online = BooleanField(required=True)
     monitor = BooleanField(required=True)
+    max_workers = IntField(required=False, min_value=1)
 
     meta = {
         'collection': 'workflow_definitions',
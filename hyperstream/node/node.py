@@ -27,7 +27,7 @@ computational graph by factors.
 import logging
 import itertools
 
-from ..plate import Plate, PlateValue
+from ..plate import Plate, PlateValue, PlateValueIndex
 from ..stream import StreamId
 from ..utils import Printable, IncompatiblePlatesError
 
@@ -62,11 +62,33 @@ class Node(Printable):
         self.plates = plates if plates else []
         self._is_leaf = True  # All nodes are leaf nodes until they are declared as a source node in a factor
         self._plate_cache = set()  # used in the new API when doing repeated get/set operations for nested plates
+        self._stream_index = None
 
     @property
     def streams(self):
         return self._streams
 
+    @property
+    def stream_index(self):
+        """
+        Index over the plate values of the streams in this node. This is rebuilt if streams have been added.
+
+        :rtype: PlateValueIndex
+        """
+        if self._stream_index is None or len(self._stream_index) != len(self._streams) - (None in self._streams):
+            self._stream_index = PlateValueIndex(self._streams.keys())
+        return self._stream_index
+
+    def find_streams(self, items):
+        """
+        Find the streams whose plate values contain all of the given (meta data id, value) items
+
+        :param items: The items, e.g. a plate value of the sink of an aggregation
+        :return: The streams
+        :rtype: list[Stream]
+        """
+        return [self._streams[pv] for pv in self.stream_index.find(items)]
+
     @property
     def plate_ids(self):
         return [p.plate_id for p in self.plates]
@@ -118,8 +140,9 @@ class Node(Printable):
         :return: A tuple containing the diff, the counts of the diff, and whether this plate is a sub-plate of the other
         :type other: Node
         """
-        diff = (tuple(set(self.plates) - set(other.plates)), tuple(set(other.plates) - set(self.plates)))
-        counts = map(len, diff)
+        plates, other_plates = set(self.plates), set(other.plates)
+        diff = (tuple(plates - other_plates), tuple(other_plates - plates))
+        counts = [len(d) for d in diff]
         # is_sub_plate = counts == [1, 1] and diff[1][0].is_sub_plate(diff[0][0])
         is_sub_plate = counts == [1, 1] and diff[0][0].is_sub_plate(diff[1][0])  # MK fixed
         if len(other.plates) == 1 and counts == [1, 0] and diff[0][0].parent == other.plates[0].parent:
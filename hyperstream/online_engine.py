@@ -21,8 +21,10 @@
 Online Engine module. This will be used in the online execution mode.
 """
 import logging
-from time import sleep
+from time import sleep, time
 import signal
+import heapq
+import multiprocessing
 from datetime import datetime, timedelta
 import fasteners
 
@@ -31,6 +33,49 @@ from .time_interval import TimeInterval, TimeIntervals, RelativeTimeInterval
 from .utils import UTC, utcnow
 
 
+ENGINE_LOCK_PATH = '/tmp/hyperstream.lock'
+WORKFLOW_LOCK_PATH = '/tmp/hyperstream_{}.lock'
+
+# The outcomes of executing a workflow (see OnlineEngine.execute_workflow)
+EXECUTED = 'executed'
+SKIPPED = 'skipped'
+FAILED = 'failed'
+
+
+def run_workflows(parameters, config_filename, workflow_ids):
+    """
+    Entry point of the online engine worker processes. Creates a HyperStream instance for this process and runs the
+    given workflows, each at its own cadence.
+
+    :param parameters: The parameters of the parent HyperStream object (logging configuration)
+    :param config_filename: The HyperStream configuration file
+    :param workflow_ids: The ids of the workflows to run in this process
+    :return: None
+    """
+    # Late import to avoid a circular reference
+    from .hyperstream import HyperStream
+    forked = HyperStream._instance is not None
+    hyperstream = HyperStream(config_filename=config_filename, **parameters)
+    if forked:
+        # The HyperStream object was inherited from the parent process, whose database connections are not fork-safe
+        hyperstream.client.reconnect()
+    OnlineEngine(hyperstream).run_workflows(workflow_ids)
+
+
+def get_multiprocessing_context():
+    """
+    Get the multiprocessing context used to start worker processes. New interpreters are spawned where possible, since
+    mongo connections are not fork-safe. Python 2 only supports forking, in which case the worker inherits the
+    HyperStream singleton from the parent process, and opens new database connections for it (see run_workflows).
+
+    :return: The context (or the multiprocessing module itself)
+    """
+    try:
+        return multiprocessing.get_context("spawn")
+    except AttributeError:
+        return multiprocessing
+
+
 class OnlineEngine(object):
     """
     OnlineEngine class.
@@ -43,10 +88,20 @@ class OnlineEngine(object):
         """
         self.hyperstream = hyperstream
 
-    @fasteners.interprocess_locked('/tmp/hyperstream.lock')
     def execute(self, debug=False):
         """
-        Execute the engine - currently simple executes all workflows.
+        Execute the engine. If the online engine is configured with a number of processes, the online workflows are
+        sharded over that many worker processes (see execute_parallel). Otherwise all workflows are executed serially.
+        """
+        if self.hyperstream.config.online_engine.processes and not debug:
+            self.execute_parallel()
+        else:
+            self.execute_serial(debug=debug)
+
+    @fasteners.interprocess_locked(ENGINE_LOCK_PATH)
+    def execute_serial(self, debug=False):
+        """
+        Execute all online workflows in this process, one after the other, sleeping between iterations.
         """
 
         if debug:
@@ -84,3 +139,120 @@ class OnlineEngine(object):
             else:
                 time_interval = TimeInterval(time_interval.end, utcnow() + timedelta(seconds=relative_interval.end))
 
+
+    @property
+    def online_workflow_ids(self):
+        """
+        The ids of the online workflows, in sorted order
+        """
+        workflows = self.hyperstream.workflow_manager.workflows
+        return sorted(workflow_id for workflow_id in workflows if workflows.is_online(workflow_id))
+
+    @staticmethod
+    def shard(workflow_ids, n_shards):
+        """
+        Split the workflows into (at most) the given number of shards, round robin
+
+        :param workflow_ids: The workflow ids
+        :param n_shards: The number of shards
+        :return: The non-empty shards
+        :rtype: list[list[str]]
+        """
+        return [s for s in (workflow_ids[i::n_shards] for i in range(n_shards)) if s]
+
+    @fasteners.interprocess_locked(ENGINE_LOCK_PATH)
+    def execute_parallel(self):
+        """
+        Execute the online workflows in worker processes. The workflows are sharded over the configured number of
+        processes, and within each process each workflow is executed at its own cadence (see run_workflows). Note that
+        the worker processes load the workflows from the database, so only committed workflows are executed. As for
+        serial execution, the engine lock is held throughout, so only one online engine runs at a time.
+
+        :return: None
+        """
+        config = self.hyperstream.config.online_engine
+        shards = self.shard(self.online_workflow_ids, config.processes)
+
+        context = get_multiprocessing_context()
+        processes = []
+        for i, workflow_ids in enumerate(shards):
+            process = context.Process(
+                target=run_workflows,
+                args=(self.hyperstream.parameters, self.hyperstream.config_filename, workflow_ids),
+                name="hyperstream_online_{}".format(i))
+            process.start()
+            logging.info("Started online engine worker {} (pid {}) for workflows {}".format(
+                process.name, process.pid, ", ".join(workflow_ids)))
+            processes.append(process)
+
+        for process in processes:
+            process.join()
+            if process.exitcode != 0:
+                logging.warn("Online engine worker {} exited with code {}".format(process.name, process.exitcode))
+
+    def run_workflows(self, workflow_ids):
+        """
+        Run the given workflows in this process, each for the configured number of iterations. Rather than sleeping for
+        a fixed time after running all of the workflows, each workflow is scheduled to run again once its own cadence
+        has elapsed, so a slow workflow does not delay the others more than necessary. If an execution fails, the next
+        execution of the workflow starts from the start of the failed interval, so that it is retried.
+
+        :param workflow_ids: The workflow ids
+        :return: None
+        """
+        config = self.hyperstream.config.online_engine
+        relative_interval = config.interval
+
+        intervals = {}
+        remaining = {}
+        schedule = []
+        for workflow_id in workflow_ids:
+            intervals[workflow_id] = relative_interval.absolute(utcnow())
+            remaining[workflow_id] = config.iterations
+            heapq.heappush(schedule, (time(), workflow_id))
+
+        while schedule:
+            due, workflow_id = heapq.heappop(schedule)
+            delay = due - time()
+            if delay > 0:
+                sleep(delay)
+
+            # if this takes more than x minutes, kill myself
+            signal.alarm(config.alarm)
+
+            outcome = self.execute_workflow(workflow_id, intervals[workflow_id])
+            if outcome != SKIPPED:
+                remaining[workflow_id] -= 1
+                start = intervals[workflow_id].start if outcome == FAILED else intervals[workflow_id].end
+                intervals[workflow_id] = TimeInterval(start, utcnow() + timedelta(seconds=relative_interval.end))
+
+            if remaining[workflow_id] > 0:
+                heapq.heappush(schedule, (time() + config.get_cadence(workflow_id), workflow_id))
+
+    def execute_workflow(self, workflow_id, time_interval):
+        """
+        Execute a single workflow over the given time interval, holding an interprocess lock for that workflow. If
+        another process holds the lock the execution is skipped.
+
+        :param workflow_id: The workflow id
+        :param time_interval: The time interval
+        :return: EXECUTED, SKIPPED (if the workflow is locked) or FAILED
+        """
+        lock = fasteners.InterProcessLock(WORKFLOW_LOCK_PATH.format(workflow_id))
+        if not lock.acquire(blocking=False):
+            logging.info("Workflow {} is locked by another process, skipping".format(workflow_id))
+            return SKIPPED
+
+        try:
+            self.hyperstream.workflow_manager.set_requested_intervals(workflow_id, TimeIntervals([time_interval]))
+            workflow = self.hyperstream.workflow_manager.workflows[workflow_id]
+            for interval in workflow.requested_intervals:
+                logging.info("Executing workflow {} over interval {}".format(workflow_id, interval))
+                workflow.execute(interval)
+        except Exception as e:
+            # Don't let one failing workflow stop the others in this process
+            logging.exception("Workflow {} failed: {}".format(workflow_id, e))
+            return FAILED
+        finally:
+            lock.release()
+        return EXECUTED
@@ -19,5 +19,5 @@
 # OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE
 # OR OTHER DEALINGS IN THE SOFTWARE.
 
-from .plate import Plate, PlateValue
+from .plate import Plate, PlateValue, PlateValueIndex
 from .plate_manager import PlateManager, PlateDefinitionError, PlateDefinitionModel
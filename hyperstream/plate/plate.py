@@ -30,6 +30,98 @@ from six import string_types
 PlateValue = namedtuple("PlateValue", "plate value")
 
 
+class PlateValueIndex(object):
+    """
+    Index over a list of plate values, so that the values containing a given set of meta data items (e.g. all of the
+    values below a parent plate value) can be found without scanning the whole list. The positions of the values
+    containing each (meta data id, value) item are stored, and a lookup intersects the positions for the given items.
+    """
+    def __init__(self, values):
+        """
+        Initialise the index
+
+        :param values: The plate values (tuples of (meta data id, value) pairs). None values are ignored.
+        """
+        self.values = [v for v in values if v is not None]
+        self._positions = {}
+        self._position_sets = {}
+        self._meta_data = {}
+        self._value_set = set(self.values)
+        self._exact = {}
+        for i, value in enumerate(self.values):
+            for item in value:
+                positions = self._positions.setdefault(item, [])
+                if not positions or positions[-1] != i:
+                    positions.append(i)
+                    meta_data_values = self._meta_data.setdefault(item[0], [])
+                    if len(positions) == 1:
+                        meta_data_values.append(item[1])
+            self._exact.setdefault(frozenset(value), value)
+        for item, positions in self._positions.items():
+            self._position_sets[item] = set(positions)
+
+    def __len__(self):
+        return len(self.values)
+
+    def __contains__(self, value):
+        return value in self._value_set
+
+    def find(self, items):
+        """
+        Find the values that contain all of the given items, in their original order
+
+        :param items: The (meta data id, value) items, e.g. a parent plate value
+        :return: The matching plate values
+        :type items: tuple | list | None
+        :rtype: list[tuple]
+        """
+        if not items:
+            return list(self.values)
+        try:
+            candidates = min((self._positions[item] for item in items), key=len)
+            others = [self._position_sets[item] for item in items]
+        except KeyError:
+            return []
+        return [self.values[i] for i in candidates if all(i in s for s in others)]
+
+    def contains_subset(self, items):
+        """
+        Determine whether any value contains all of the given items
+
+        :param items: The (meta data id, value) items
+        :return: True if there is such a value
+        """
+        if not items:
+            return bool(self.values)
+        try:
+            candidates = min((self._positions[item] for item in items), key=len)
+            others = [self._position_sets[item] for item in items]
+        except KeyError:
+            return False
+        return any(all(i in s for s in others) for i in candidates)
+
+    def get(self, value):
+        """
+        Get the indexed value with the same items as the given value, regardless of their order
+
+        :param value: The plate value
+        :return: The indexed plate value, or None if not found
+        """
+        if value is None:
+            return None
+        return self._exact.get(frozenset(value))
+
+    def meta_data_values(self, meta_data_id):
+        """
+        Get the distinct values of the given meta data id, in order of first appearance
+
+        :param meta_data_id: The meta data id
+        :return: The values
+        :rtype: list
+        """
+        return list(self._meta_data.get(meta_data_id, []))
+
+
 class Plate(Printable):
     """
     A plate in the execution graph. This can be thought of as a "for loop" over the streams in a node
@@ -60,6 +152,8 @@ class Plate(Printable):
 
         # self._values = [tuple(sorted(pv.items())) for pv in values]
         self._parent = parent_plate
+        self._index = None
+        self._children = None
 
     @property
     def parent(self):
@@ -69,6 +163,46 @@ class Plate(Printable):
     def values(self):
         return self._values
 
+    @property
+    def index(self):
+        """
+        The index over the values of this plate. This is built on first use, and rebuilt if values have been added.
+
+        :rtype: PlateValueIndex
+        """
+        if self._index is None or len(self._index) != len(self._values):
+            self._index = PlateValueIndex(self._values)
+            self._children = None
+        return self._index
+
+    def get_child_values(self, parent_plate_value):
+        """
+        Get the values of this plate that lie below the given value of the parent plate
+
+        :param parent_plate_value: The parent plate value (or None for a root plate)
+        :return: The plate values
+        :rtype: list[tuple]
+        """
+        index = self.index
+        if self._children is None:
+            children = {}
+            for value in index.values:
+                key = frozenset(v for v in value if v[0] != self.meta_data_id)
+                children.setdefault(key, []).append(value)
+            self._children = children
+        return list(self._children.get(frozenset(parent_plate_value or ()), []))
+
+    def get_parent_value(self, plate_value):
+        """
+        Get the value of the parent plate that the given value of this plate lies below
+
+        :param plate_value: The plate value
+        :return: The parent plate value, or None if not found
+        """
+        if self.is_root:
+            return None
+        return self.parent.index.get(v for v in plate_value if v[0] != self.meta_data_id)
+
     @property
     def value_tuples(self):
         return [PlateValue(self, v) for v in self.values]
@@ -135,9 +269,10 @@ class Plate(Printable):
         :param other: The other plate
         :return: True if this plate is a sub-plate of the other plate
         """
-        if all(v in set(other.values) for v in self.values):
+        other_index = other.index
+        if all(v in other_index for v in self.values):
             return True
-        if all(any(all(spv in m for spv in v) for m in map(set, other.values)) for v in self.values):
+        if all(other_index.contains_subset(v) for v in self.values):
             return True
         if other in self.ancestor_plates:  # added by MK, but still not sure whether all cases are covered
             return True
@@ -332,4 +467,4 @@ class Plate(Printable):
         """
         if item.plate not in self.ancestor_plates:
             raise ValueError("Plate {} not in ancestor plates of {}".format(item.plate, self))
-        return iter(PlateValue(self, v[1:]) for v in self.values if v[0] == item.value[0])
+        return iter(PlateValue(self, v[1:]) for v in self.index.find(item.value[:1]) if v[0] == item.value[0])
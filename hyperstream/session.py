@@ -19,25 +19,125 @@
 # OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE
 # OR OTHER DEALINGS IN THE SOFTWARE.
 
-from .utils import Printable, utcnow, StreamNotFoundError
+from .config import HistoryConfig
+from .utils import Printable, utcnow, StreamNotFoundError, MIN_DATE, metrics
 from .models import SessionModel, UnameField
 from .stream import StreamId, StreamInstance
 from .time_interval import TimeInterval
 
 import os
+import time
 import uuid
+import threading
+from collections import OrderedDict
+from datetime import timedelta
 from mongoengine.context_managers import switch_db
 
 
+class HistoryRecorder(object):
+    """
+    Buffers the entries of the session history in memory and writes them to the history stream in batches. The buffer
+    is flushed when it reaches flush_size entries, when an entry is recorded more than flush_interval seconds after the
+    last flush, and when the session is closed.
+    """
+    def __init__(self, stream, config=None):
+        """
+        Initialise the recorder
+
+        :param stream: The history stream
+        :param config: The history configuration (defaults are used if not given)
+        :type stream: Stream
+        :type config: HistoryConfig | None
+        """
+        self.stream = stream
+        self.config = config if config is not None else HistoryConfig()
+        self.buffer = []
+        self.totals = OrderedDict()  # For the 'aggregate' mode, the totals for each tool since the last flush
+        self.count = 0
+        self.last_timestamp = None
+        self.last_flush = time.time()
+        self._lock = threading.Lock()  # Tools may write to the history from multiple threads
+
+    def __len__(self):
+        return len(self.buffer) + len(self.totals)
+
+    def record(self, **kwargs):
+        """
+        Record an entry, e.g. the execution of a tool
+
+        :param kwargs: The entry
+        :return: None
+        """
+        flush = False
+        with self._lock:
+            self.count += 1
+            mode = self.config.mode
+            if mode == 'aggregate':
+                self._aggregate(kwargs)
+            elif mode == 'sample':
+                if (self.count - 1) % self.config.sample_every == 0:
+                    kwargs['sample_every'] = self.config.sample_every
+                    self._append(kwargs)
+            else:
+                self._append(kwargs)
+
+            if len(self) >= self.config.flush_size or time.time() - self.last_flush >= self.config.flush_interval:
+                flush = True
+        if flush:
+            self.flush()
+
+    def _append(self, entry, timestamp=None):
+        """
+        Add an entry to the buffer. Entries that share a millisecond are spread over the following milliseconds, so that
+        none of them are overwritten in the history stream.
+        """
+        timestamp = utcnow() if timestamp is None else timestamp
+        if self.last_timestamp is not None and timestamp <= self.last_timestamp:
+            timestamp = self.last_timestamp + timedelta(milliseconds=1)
+        self.last_timestamp = timestamp
+        self.buffer.append(StreamInstance.trusted(timestamp, entry))
+
+    def _aggregate(self, entry):
+        tool = entry.get('tool')
+        interval = entry.get('interval')
+        if tool not in self.totals:
+            self.totals[tool] = dict(tool=tool, interval=interval, executions=0, document_count=0)
+        totals = self.totals[tool]
+        totals['executions'] += 1
+        totals['document_count'] += entry.get('document_count', 0)
+        if interval is not None and totals['interval'] is not None:
+            totals['interval'] = TimeInterval(
+                min(totals['interval'].start, interval.start), max(totals['interval'].end, interval.end))
+
+    def flush(self):
+        """
+        Write the buffered entries to the history stream
+
+        :return: None
+        """
+        with self._lock:
+            for entry in self.totals.values():
+                self._append(entry)
+            self.totals = OrderedDict()
+            buffer, self.buffer = self.buffer, []
+            self.last_flush = time.time()
+            if buffer:
+                with metrics.detached():
+                    self.stream.writer(buffer)
+
+
 class Session(object):
-    def __init__(self, hyperstream, model=None, history_channel='mongo'):
+    def __init__(self, hyperstream, model=None, history_channel='mongo', history_config=None):
         """
         Initialise the session object. A hyperstream session is used to store execution history
         :param hyperstream: The hyperstream object.
         :param model: The mongo model.
-        
+        :param history_channel: The channel that the history is written to
+        :param history_config: The configuration of the history recorder
+
         :type hyperstream: HyperStream
         :type model: SessionModel
+        :type history_config: HistoryConfig | None
         """
 
         if model:
@@ -61,6 +161,7 @@ class Session(object):
 
         stream_id = StreamId("session", meta_data=(('uuid', str(self.session_id)), ))
         self._history_stream = self._history_channel.get_or_create_stream(stream_id)
+        self._history = HistoryRecorder(self._history_stream, history_config)
 
     def __str__(self):
         return repr(self)
@@ -151,16 +252,26 @@ class Session(object):
 
     @property
     def history(self):
-        return self._history_stream.window(TimeInterval.up_to_now()).items()
+        self._history.flush()
+        # Entries recorded in a burst may have been spread slightly into the future
+        end = max(utcnow(), self._history.last_timestamp or MIN_DATE)
+        return self._history_stream.window(TimeInterval(MIN_DATE, end)).items()
 
     def write_to_history(self, **kwargs):
-        instance = StreamInstance(utcnow(), kwargs)
-        self._history_stream.writer(instance)
+        self._history.record(**kwargs)
+
+    def flush_history(self):
+        """
+        Write any buffered history entries to the history channel
+        """
+        self._history.flush()
 
     def close(self):
         """
-        Close the current session
+        Close the current session. This also flushes the buffered history and any deferred calculated interval updates
         """
+        self._history.flush()
+        self._hyperstream.channel_manager.flush_calculated_intervals()
         self.active = False
         self.end = utcnow()
         self._model.save()
@@ -149,16 +149,23 @@ class Stream(Hashable):
 
     @property
     def writer(self):
-        return self.channel.get_stream_writer(self)
+        return self.channel.get_cached_stream_writer(self)
 
-    def window(self, time_interval=None, force_calculation=False):
+    def window(self, time_interval=None, force_calculation=False, prefetch=0, columns=None):
         """
         Gets a view on this stream for the time interval given
 
         :param time_interval: either a TimeInterval object or (start, end) tuple of type str or datetime
         :param force_calculation: Whether we should force calculation for this stream view if data does not exist
+        :param prefetch: The number of stream instances to read ahead on a background thread while iterating over the
+            view (0 to read them synchronously). This is useful when reading several windows at once, or when the
+            processing of each instance is expensive.
+        :param columns: For streams of dictionaries, the keys to keep (None for all). Channels that store the keys in
+            separate columns (e.g. the columnar file channel) only read the columns that are needed.
         :type time_interval: None | Iterable | TimeInterval
         :type force_calculation: bool
+        :type prefetch: int
+        :type columns: list[str] | None
         :return: a stream view object
         """
         if not time_interval:
@@ -177,7 +184,8 @@ class Stream(Hashable):
         else:
             raise TypeError("Expected TimeInterval or (start, end) tuple of type str or datetime, got {}"
                             .format(type(time_interval)))
-        return StreamView(stream=self, time_interval=time_interval, force_calculation=force_calculation)
+        return StreamView(stream=self, time_interval=time_interval, force_calculation=force_calculation,
+                          prefetch=prefetch, columns=columns)
 
 
 class DatabaseStream(Stream):
@@ -217,7 +225,9 @@ class DatabaseStream(Stream):
         """
         with switch_db(StreamDefinitionModel, 'hyperstream'):
             self.mongo_model = StreamDefinitionModel.objects.get(__raw__=self.stream_id.as_raw())
-            self._calculated_intervals = self.mongo_model.get_calculated_intervals()
+            if self.stream_id not in getattr(self.channel, 'pending_streams', ()):
+                # Don't overwrite calculated intervals that have not yet been written to the database
+                self._calculated_intervals = self.mongo_model.get_calculated_intervals()
 
     def save(self):
         """
@@ -245,12 +255,17 @@ class DatabaseStream(Stream):
     @calculated_intervals.setter
     def calculated_intervals(self, intervals):
         """
-        Updates the calculated intervals in the database. Performs an upsert
+        Updates the calculated intervals in the database. Performs an upsert.
+        If the channel is in write-behind mode the database update is deferred until the channel is flushed.
 
         :param intervals: The calculated intervals
         :return: None
         """
         logging.debug("set calculated intervals")
+        if getattr(self.channel, 'write_behind', False):
+            self._calculated_intervals = TimeIntervals(intervals)
+            self.channel.defer_calculated_intervals(self)
+            return
         self.mongo_model.set_calculated_intervals(intervals)
         self.save()
         self._calculated_intervals = TimeIntervals(intervals)
@@ -315,3 +330,23 @@ class AssetStream(DatabaseStream):
         if len(intervals) > 1:
             raise ValueError("Only single calculated interval valid for AssetStream")
         super(AssetStream, self.__class__).calculated_intervals.fset(self, intervals)
+
+
+class LogStream(Stream):
+    """
+    Stream whose calculated intervals are saved alongside its data by the channel (see LogFileChannel)
+    """
+    @property
+    def calculated_intervals(self):
+        return super(LogStream, self).calculated_intervals
+
+    @calculated_intervals.setter
+    def calculated_intervals(self, intervals):
+        """
+        Updates the calculated intervals, and saves the stream definition
+
+        :param intervals: The calculated intervals
+        :return: None
+        """
+        super(LogStream, self.__class__).calculated_intervals.fset(self, intervals)
+        self.channel.save_stream(self)
@@ -19,8 +19,13 @@
 # OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE
 # OR OTHER DEALINGS IN THE SOFTWARE.
 
-from . import Stream, StreamId, StreamInstance
-from ..utils import TypedBiDict, FrozenKeyDict
+from . import Stream, StreamId, StreamInstance, StreamInstanceBatch
+from ..utils import TypedBiDict, FrozenKeyDict, StreamNotFoundError
+
+from bisect import bisect_right, insort
+from collections import OrderedDict
+import threading
+import weakref
 
 
 class StreamDict(TypedBiDict):
@@ -31,11 +36,282 @@ class StreamDict(TypedBiDict):
     def __init__(self, *args, **kwargs):
         super(StreamDict, self).__init__(StreamId, Stream, *args, **kwargs)
 
+    @property
+    def num_loaded(self):
+        """
+        The number of streams held in memory
+        """
+        return len(self._store)
+
+
+class LazyStreamDict(StreamDict):
+    """
+    Stream dictionary that resolves streams on demand. The first time a stream id is requested that is not held in
+    memory, the stream is fetched using the loader (e.g. from the stream definitions in the database). Stream ids that
+    are not found are remembered, so they are not fetched again. The ids of all of the streams (but not the streams
+    themselves) are fetched the first time the keys are iterated over (or the length taken), and are then kept up to
+    date with the streams added and removed through the dictionary. Call refresh to pick up streams that were created
+    elsewhere.
+
+    If max_size is given, only the most recently used streams are held, and evicted streams are fetched again when they
+    are next requested. Streams for which can_evict returns False (e.g. those with unsaved changes) are never evicted.
+    An evicted stream that is still referenced elsewhere (e.g. by a node) is handed out again rather than being fetched
+    as a second copy, so that there is only ever one stream object for each stream id.
+    """
+    # The maximum number of stream ids that are remembered as not found
+    max_missing = 10000
+
+    def __init__(self, loader, load_all, load_ids, max_size=None, can_evict=None):
+        """
+        Initialise the dictionary
+
+        :param loader: Function that takes a stream id and returns the stream, or None if there is no such stream
+        :param load_all: Function that returns all of the streams
+        :param load_ids: Function that returns the ids of all of the streams
+        :param max_size: The maximum number of streams to hold in memory (None for no limit)
+        :param can_evict: Function that takes a stream and returns whether it can be evicted
+        """
+        super(LazyStreamDict, self).__init__()
+        self.loader = loader
+        self.load_all = load_all
+        self.load_ids = load_ids
+        self.max_size = max_size
+        self.can_evict = can_evict
+        self._recent = OrderedDict()
+        self._evicted = weakref.WeakValueDictionary()
+        self._missing = set()
+        self._all_keys = None
+        self._lock = threading.RLock()
+
+    def _touch(self, key):
+        if self.max_size is not None:
+            self._recent.pop(key, None)
+            self._recent[key] = None
+
+    def _evict(self):
+        if self.max_size is None:
+            return
+        excess = len(self._store) - self.max_size
+        if excess <= 0:
+            return
+        # The most recently used stream is never evicted, since it has just been requested
+        for key in list(self._recent)[:-1]:
+            if excess <= 0:
+                break
+            stream = self._store[key]
+            if self.can_evict is None or self.can_evict(stream):
+                del self._store[key]
+                del self._recent[key]
+                self._evicted[key] = stream
+                excess -= 1
+
+    def _hold(self, key, stream):
+        """
+        Hold the given stream, unless a stream object for the same id is already live, in which case that is kept
+
+        :param key: The stream id
+        :param stream: The stream
+        :return: The stream that is held
+        """
+        if key in self._store:
+            self._touch(key)
+            return self._store[key]
+        live = self._evicted.get(key)
+        if live is not None:
+            stream = live
+        self[key] = stream
+        return stream
+
+    def resolve(self, key):
+        """
+        Make sure that the stream is held in memory, fetching it if necessary
+
+        :param key: The stream id
+        :return: Whether the stream exists
+        """
+        with self._lock:
+            if key in self._store:
+                self._touch(key)
+                return True
+            if key in self._missing:
+                return False
+            stream = self._evicted.get(key)
+            if stream is None:
+                stream = self.loader(key)
+            if stream is None:
+                if len(self._missing) >= self.max_missing:
+                    self._missing.clear()
+                self._missing.add(key)
+                return False
+            self[key] = stream
+            return True
+
+    def load(self):
+        """
+        Fetch the ids of all of the streams, if they have not been fetched already. The streams themselves are only
+        fetched when they are requested (or the items are iterated over).
+
+        :return: None
+        """
+        with self._lock:
+            if self._all_keys is not None:
+                return
+            keys = set(self._store.keys())
+            keys.update(self.load_ids())
+            self._all_keys = keys
+
+    def refresh(self):
+        """
+        Forget the fetched stream ids and the ids that were not found, so that streams created elsewhere (e.g. by
+        another process) are picked up
+
+        :return: None
+        """
+        with self._lock:
+            self._all_keys = None
+            self._missing.clear()
+
+    def __getitem__(self, key):
+        if not isinstance(key, self.key_type):
+            raise TypeError("expected {}, got {}".format(self.key_type, type(key)))
+        if not self.resolve(key):
+            raise StreamNotFoundError(repr(key))
+        return self._store[key]
+
+    def __setitem__(self, key, value):
+        with self._lock:
+            super(LazyStreamDict, self).__setitem__(key, value)
+            self._missing.discard(key)
+            self._evicted.pop(key, None)
+            if self._all_keys is not None:
+                self._all_keys.add(key)
+            self._touch(key)
+            self._evict()
+
+    def __delitem__(self, key):
+        with self._lock:
+            if key in self._store:
+                super(LazyStreamDict, self).__delitem__(key)
+            elif self._evicted.pop(key, None) is None:
+                raise KeyError(key)
+            self._recent.pop(key, None)
+            if self._all_keys is not None:
+                self._all_keys.discard(key)
+
+    def __contains__(self, item):
+        if not isinstance(item, self.key_type):
+            return item in self._store
+        return self.resolve(item)
+
+    def __iter__(self):
+        return iter(self.keys())
+
+    def __len__(self):
+        self.load()
+        return len(self._all_keys)
+
+    def keys(self):
+        self.load()
+        with self._lock:
+            return list(self._all_keys)
+
+    def values(self):
+        return [stream for _, stream in self.iteritems()]
+
+    def items(self):
+        return list(self.iteritems())
+
+    def iterkeys(self):
+        return iter(self.keys())
+
+    def itervalues(self):
+        for _, stream in self.iteritems():
+            yield stream
+
+    def iteritems(self):
+        """
+        Iterate over all of the streams. If they are not all held in memory they are fetched again (in a single query),
+        and held in turn subject to max_size.
+        """
+        self.load()
+        with self._lock:
+            if all(key in self._store for key in self._all_keys):
+                items = [(key, self._store[key]) for key in self._all_keys]
+            else:
+                items = None
+        if items is not None:
+            for item in items:
+                yield item
+            return
+
+        seen = set()
+        for stream in self.load_all():
+            key = stream.stream_id
+            seen.add(key)
+            with self._lock:
+                stream = self._hold(key, stream)
+            yield key, stream
+        for key in self.keys():
+            if key not in seen and self.resolve(key):
+                yield key, self._store[key]
+
 
 class StreamInstanceCollection(FrozenKeyDict):
     """
-    A custom frozen dictionary for stream instances. Will raise an exception if a repeated instance is added
+    A custom frozen dictionary for stream instances. Will raise an exception if a repeated instance is added.
+    The timestamps are also kept in a sorted list, so that windows can be found using binary search rather than sorting
+    the whole collection. Appends in time order (the common case) are O(1).
     """
+    def __init__(self, *args, **kwargs):
+        super(StreamInstanceCollection, self).__init__()
+        self._timestamps = []
+        self.update(*args, **kwargs)
+
+    def __setitem__(self, key, value):
+        is_new = key not in self
+        super(StreamInstanceCollection, self).__setitem__(key, value)
+        if is_new:
+            if not self._timestamps or key > self._timestamps[-1]:
+                self._timestamps.append(key)
+            else:
+                insort(self._timestamps, key)
+
+    def __delitem__(self, key):
+        super(StreamInstanceCollection, self).__delitem__(key)
+        self._timestamps.remove(key)
+
+    def clear(self):
+        super(StreamInstanceCollection, self).clear()
+        self._timestamps = []
+
+    def pop(self, key, *args):
+        if key not in self:
+            return super(StreamInstanceCollection, self).pop(key, *args)
+        value = super(StreamInstanceCollection, self).pop(key)
+        self._timestamps.remove(key)
+        return value
+
+    def popitem(self):
+        key, value = super(StreamInstanceCollection, self).popitem()
+        self._timestamps.remove(key)
+        return key, value
+
+    def setdefault(self, key, default=None):
+        if key not in self:
+            self[key] = default
+        return self[key]
+
+    def update(self, *args, **kwargs):
+        for key, value in dict(*args, **kwargs).items():
+            self[key] = value
+
+    @property
+    def timestamps(self):
+        """
+        The timestamps in sorted order
+        """
+        return self._timestamps
+
     def append(self, instance):
         if not (isinstance(instance, StreamInstance)):
             raise ValueError("Expected StreamInstance, got {}".format(type(instance)))
@@ -44,3 +320,32 @@ class StreamInstanceCollection(FrozenKeyDict):
     def extend(self, instances):
         for instance in instances:
             self.append(instance)
+
+    def window(self, time_interval):
+        """
+        Gets the stream instances that lie within the time interval (start exclusive, end inclusive) using binary search
+
+        :param time_interval: The time interval
+        :type time_interval: TimeInterval
+        :return: The stream instances in time order
+        :rtype: list[StreamInstance]
+        """
+        make = StreamInstance.trusted
+        return [make(t, self[t]) for t in self._slice(time_interval)]
+
+    def batch(self, time_interval):
+        """
+        Gets the stream instances that lie within the time interval (start exclusive, end inclusive) as a batch
+
+        :param time_interval: The time interval
+        :type time_interval: TimeInterval
+        :return: The stream instances in time order
+        :rtype: StreamInstanceBatch
+        """
+        timestamps = self._slice(time_interval)
+        return StreamInstanceBatch(timestamps, [self[t] for t in timestamps])
+
+    def _slice(self, time_interval):
+        start = bisect_right(self._timestamps, time_interval.start)
+        end = bisect_right(self._timestamps, time_interval.end, lo=start)
+        return self._timestamps[start:end]
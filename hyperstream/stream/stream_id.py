@@ -21,7 +21,9 @@
 
 from ..utils import Hashable
 
+import hashlib
 import json
+import struct
 from six import string_types
 
 
@@ -35,12 +37,26 @@ def get_stream_id(item):
     return StreamId(**item)
 
 
+def get_stream_key(name, meta_data):
+    """
+    Get the compact key of a stream: a signed 64 bit integer hash of its name and meta data. The order of the meta data
+    is ignored, as for StreamId equality.
+
+    :param name: The stream name
+    :param meta_data: The meta data as (key, value) pairs
+    :return: The stream key
+    """
+    canonical = json.dumps([name, sorted(list(m) for m in meta_data)], separators=(',', ':'))
+    return struct.unpack('>q', hashlib.sha1(canonical.encode('utf-8')).digest()[:8])[0]
+
+
 class StreamId(Hashable):
     """
     Helper class for stream identifiers. A stream identifier contains the stream name and any meta-data
     """
 
     def __init__(self, name, meta_data=None):
+        self._key = None
         self.name = name
         if meta_data:
             # if isinstance(meta_data, dict):
@@ -78,6 +94,15 @@ class StreamId(Hashable):
     def __hash__(self):
         return hash(self.to_json())
 
+    @property
+    def key(self):
+        """
+        The compact key of this stream, used to index the stream instances in the database (see get_stream_key)
+        """
+        if self._key is None:
+            self._key = get_stream_key(self.name, self.meta_data)
+        return self._key
+
     def to_json(self):
         return json.dumps(self.as_dict())
 
@@ -20,6 +20,7 @@
 # OR OTHER DEALINGS IN THE SOFTWARE.
 
 from datetime import datetime
+from bisect import bisect_right
 from collections import namedtuple
 
 from ..utils import utcnow, remove_microseconds
@@ -29,6 +30,7 @@ class StreamInstance(namedtuple("StreamInstance", "timestamp value")):
     """
     Simple helper class for storing data instances that's a bit neater than simple tuples
     """
+    __slots__ = ()
 
     def __new__(cls, timestamp, value):
         if not isinstance(timestamp, datetime):
@@ -42,6 +44,19 @@ class StreamInstance(namedtuple("StreamInstance", "timestamp value")):
 
         return super(StreamInstance, cls).__new__(cls, timestamp, value)
 
+    @classmethod
+    def trusted(cls, timestamp, value):
+        """
+        Create a stream instance without validating the timestamp. Only for use by channels when reading back
+        instances that were validated when they were written, where the timestamp is already a timezone aware datetime
+        at millisecond precision.
+
+        :param timestamp: The timestamp
+        :param value: The value
+        :return: The stream instance
+        """
+        return tuple.__new__(cls, (timestamp, value))
+
     def as_list(self, flat=True):
         if flat:
             l = self.value.items()
@@ -63,6 +78,7 @@ class StreamMetaInstance(namedtuple("StreamMetaInstance", "stream_instance meta_
     """
     StreamInstance that also contains meta data
     """
+    __slots__ = ()
 
     def __new__(cls, stream_instance, meta_data):
         if isinstance(stream_instance, (list, tuple)):
@@ -70,3 +86,83 @@ class StreamMetaInstance(namedtuple("StreamMetaInstance", "stream_instance meta_
         if not isinstance(stream_instance, StreamInstance):
             raise ValueError("Not a stream instance object")
         return super(StreamMetaInstance, cls).__new__(cls, stream_instance, meta_data)
+
+
+class StreamInstanceBatch(object):
+    """
+    Compact representation of a sequence of stream instances as parallel lists of timestamps and values, in time order.
+    Tools that process whole windows can consume the lists directly rather than allocating one StreamInstance per row.
+    """
+    __slots__ = ('timestamps', 'values')
+
+    def __init__(self, timestamps=None, values=None):
+        """
+        Initialise the batch. The timestamps are trusted to be valid and in time order.
+
+        :param timestamps: The timestamps
+        :param values: The values (of the same length as the timestamps)
+        """
+        self.timestamps = timestamps if timestamps is not None else []
+        self.values = values if values is not None else []
+        if len(self.timestamps) != len(self.values):
+            raise ValueError("Expected the same number of timestamps and values, got {} and {}".format(
+                len(self.timestamps), len(self.values)))
+
+    @classmethod
+    def from_instances(cls, instances):
+        """
+        Create a batch from stream instances (or (timestamp, value) pairs), which should be in time order
+
+        :param instances: The stream instances
+        :return: The batch
+        :rtype: StreamInstanceBatch
+        """
+        timestamps = []
+        values = []
+        for timestamp, value in instances:
+            timestamps.append(timestamp)
+            values.append(value)
+        return cls(timestamps, values)
+
+    def __repr__(self):
+        return "{}(len={})".format(self.__class__.__name__, len(self.timestamps))
+
+    def __len__(self):
+        return len(self.timestamps)
+
+    def __iter__(self):
+        make = StreamInstance.trusted
+        for timestamp, value in zip(self.timestamps, self.values):
+            yield make(timestamp, value)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return StreamInstanceBatch(self.timestamps[index], self.values[index])
+        return StreamInstance.trusted(self.timestamps[index], self.values[index])
+
+    def append(self, instance):
+        """
+        Append a stream instance, which must not be earlier than the last instance in the batch
+
+        :param instance: The stream instance
+        :return: None
+        """
+        if not isinstance(instance, StreamInstance):
+            raise ValueError("Expected StreamInstance, got {}".format(type(instance)))
+        if self.timestamps and instance.timestamp < self.timestamps[-1]:
+            raise ValueError("Stream instances must be appended in time order")
+        self.timestamps.append(instance.timestamp)
+        self.values.append(instance.value)
+
+    def window(self, time_interval):
+        """
+        Gets the part of the batch that lies within the time interval (start exclusive, end inclusive)
+
+        :param time_interval: The time interval
+        :type time_interval: TimeInterval
+        :return: The batch over the time interval
+        :rtype: StreamInstanceBatch
+        """
+        start = bisect_right(self.timestamps, time_interval.start)
+        end = bisect_right(self.timestamps, time_interval.end, lo=start)
+        return self[start:end]
@@ -0,0 +1,77 @@
+# The MIT License (MIT)
+# Copyright (c) 2014-2017 University of Bristol
+# 
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+# 
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+# 
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT.
+# IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM,
+# DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR
+# OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE
+# OR OTHER DEALINGS IN THE SOFTWARE.
+"""
+Merging of time ordered streams.
+"""
+
+import heapq
+
+
+def merge_streams(iterables):
+    """
+    Merge time ordered iterables of stream instances (e.g. stream views) into a single time ordered iterator. This is a
+    k-way merge on a heap that holds the next instance of each iterable, so the iterables are consumed lazily and only
+    one instance of each is held in memory. Instances with equal timestamps are returned in the order of the
+    iterables.
+
+    :param iterables: The time ordered iterables of stream instances
+    :return: Generator of (timestamp, index of the iterable, value) tuples
+    """
+    iterators = [iter(it) for it in iterables]
+    heap = []
+    for i, it in enumerate(iterators):
+        for instance in it:
+            heap.append((instance.timestamp, i, instance.value))
+            break
+    heapq.heapify(heap)
+
+    while heap:
+        timestamp, i, value = heap[0]
+        yield timestamp, i, value
+        for instance in iterators[i]:
+            heapq.heapreplace(heap, (instance.timestamp, i, instance.value))
+            break
+        else:
+            heapq.heappop(heap)
+
+
+def merge_timestamps(iterables):
+    """
+    Merge time ordered iterables of stream instances, grouping the values by timestamp. Only the first value of each
+    iterable is taken for a given timestamp.
+
+    :param iterables: The time ordered iterables of stream instances
+    :return: Generator of (timestamp, [(index of the iterable, value), ...]) tuples, with the values in the order of the
+        iterables
+    """
+    current = None
+    group = []
+    seen = set()
+    for timestamp, i, value in merge_streams(iterables):
+        if timestamp != current:
+            if group:
+                yield current, group
+            current, group, seen = timestamp, [], set()
+        if i not in seen:
+            seen.add(i)
+            group.append((i, value))
+    if group:
+        yield current, group
@@ -20,10 +20,11 @@
 # OR OTHER DEALINGS IN THE SOFTWARE.
 
 from ..time_interval import TimeInterval, TimeIntervals
-from ..utils import Printable
-from . import StreamInstance
+from ..utils import Printable, metrics, prefetched
+from . import StreamInstance, StreamInstanceBatch
 
 import logging
+import time
 from collections import deque
 from itertools import islice
 
@@ -34,10 +35,16 @@ class StreamView(Printable):
     :param stream: The stream upon which this is a view
     :param time_interval: The time interval over which this view is defined
     :param force_calculation: Whether we should force calculation for this stream view if data does not exist
+    :param prefetch: The number of stream instances to read ahead on a background thread while iterating (0 to read
+        them synchronously)
+    :param columns: For streams of dictionaries, the keys to keep (None for all). Channels that store the keys in
+        separate columns only read the columns that are needed
     :type stream: Stream
     :type time_interval: TimeInterval
+    :type prefetch: int
+    :type columns: list[str] | None
     """
-    def __init__(self, stream, time_interval, force_calculation=False):
+    def __init__(self, stream, time_interval, force_calculation=False, prefetch=0, columns=None):
         from . import Stream
         if not isinstance(stream, Stream):
             raise ValueError("stream must be Stream object")
@@ -46,8 +53,28 @@ class StreamView(Printable):
         self.stream = stream
         self.time_interval = time_interval
         self.force_calculation = force_calculation
+        self.prefetch = prefetch
+        self.columns = columns
+
+    def _get_results(self):
+        if self.columns is not None:
+            return self.stream.channel.get_projected_results(self.stream, self.time_interval, self.columns)
+        return self.stream.channel.get_cached_results(self.stream, self.time_interval)
 
     def __iter__(self):
+        self._check_calculated()
+        results = self._get_results()
+        if self.prefetch:
+            # Read time is then the time spent waiting on the background thread, i.e. the I/O that was not overlapped
+            results = prefetched(results, self.prefetch)
+        for item in metrics.timed_reads(results):
+            yield item
+
+    def _check_calculated(self):
+        """
+        Requests upstream computation of any parts of the time interval that have not been calculated (if
+        force_calculation is set), and warns if the stream is still not available
+        """
         required_intervals = TimeIntervals([self.time_interval]) - self.stream.calculated_intervals
         from . import AssetStream
         # if not isinstance(self.stream, AssetStream) and not required_intervals.is_empty:
@@ -65,8 +92,20 @@ class StreamView(Printable):
                     "Stream {} not available for time interval {}. Perhaps upstream calculations haven't been performed"
                     .format(self.stream.stream_id, required_intervals))
 
-        for item in self.stream.channel.get_results(self.stream, self.time_interval):
-            yield item
+    def batch(self):
+        """
+        Return all results as parallel lists of timestamps and values, without creating a StreamInstance per row
+        :return: The results
+        :rtype: StreamInstanceBatch
+        """
+        self._check_calculated()
+        start = time.time()
+        if self.columns is not None:
+            batch = StreamInstanceBatch.from_instances(self._get_results())
+        else:
+            batch = self.stream.channel.get_batch(self.stream, self.time_interval)
+        metrics.record_read(len(batch), time.time() - start)
+        return batch
 
     def items(self):
         """
@@ -86,7 +125,11 @@ class StreamView(Printable):
         return list(self.dict_iteritems(flat))
 
     def timestamps(self):
-        return list(self.itertimestamps())
+        self._check_calculated()
+        start = time.time()
+        timestamps = self.stream.channel.get_timestamps(self.stream, self.time_interval)
+        metrics.record_read(len(timestamps), time.time() - start)
+        return timestamps
 
     def itertimestamps(self):
         return map(lambda x: x.timestamp, self.iteritems())
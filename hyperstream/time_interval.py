@@ -45,6 +45,10 @@ class TimeIntervals(Printable):
     """
     Container class for time intervals, that manages splitting and joining
     Example object: (t1,t2] U (t3,t4] U ...
+
+    The intervals are kept sorted and disjoint (overlapping or touching intervals are merged), so that union,
+    difference and intersection can each be computed with a single linear pass over both operands. Neither operand is
+    modified by these operations.
     """
     @profile
     def __init__(self, intervals=None):
@@ -54,7 +58,19 @@ class TimeIntervals(Printable):
 
         :param intervals: The time intervals
         """
-        self.intervals = self.parse(intervals)
+        self.intervals = self.normalise(self.parse(intervals))
+
+    @classmethod
+    def _from_normalised(cls, intervals):
+        """
+        Construct the object from a list of intervals that is already sorted and disjoint, skipping parsing
+
+        :param intervals: The sorted disjoint intervals
+        :return: The time intervals object
+        """
+        obj = cls.__new__(cls)
+        obj.intervals = intervals
+        return obj
 
     # @profile
     def __str__(self):
@@ -77,18 +93,51 @@ class TimeIntervals(Printable):
                     v = TimeInterval(v.start, v.end)
                 else:
                     raise TypeError("Expected tuple/list/TimeInterval ({} given)".format(type(v)))
-                # try:
-                #     v = parse_time_tuple(*v)
-                # except Exception as e:
-                #     import logging
-                #     logging.debug(e)
-                #     if isinstance(v, TimeInterval):
-                #         v = TimeInterval(v.start, v.end)
-                #     else:
-                #         raise TypeError("Expected tuple/list/TimeInterval ({} given)".format(type(v)))
                 parsed.append(v)
         return parsed
 
+    @staticmethod
+    @profile
+    def normalise(intervals):
+        """
+        Sort the intervals and merge any that overlap or touch. Sorting a concatenation of two sorted lists is linear,
+        which is what makes union a linear operation.
+
+        :param intervals: The intervals
+        :type intervals: list[TimeInterval]
+        :return: The sorted disjoint intervals
+        :rtype: list[TimeInterval]
+        """
+        if len(intervals) < 2:
+            return list(intervals)
+        intervals = sorted(intervals, key=lambda x: x.start)
+        merged = [intervals[0]]
+        for interval in intervals[1:]:
+            last = merged[-1]
+            if interval.start <= last.end:
+                if interval.end > last.end:
+                    merged[-1] = TimeInterval(last.start, interval.end)
+            else:
+                merged.append(interval)
+        return merged
+
+    @staticmethod
+    def _as_intervals(other):
+        """
+        Get the list of intervals from the other operand of a set operation
+
+        :param other: The other operand
+        :type other: TimeIntervals | TimeInterval | None
+        :return: The sorted disjoint intervals
+        """
+        if not other:
+            return []
+        if isinstance(other, TimeInterval):
+            return [other]
+        if isinstance(other, TimeIntervals):
+            return other.intervals
+        raise TypeError("Expected TimeIntervals or TimeInterval, got {}".format(type(other)))
+
     @property
     # @profile
     def is_empty(self):
@@ -97,12 +146,12 @@ class TimeIntervals(Printable):
     @property
     # @profile
     def start(self):
-        return min(self.intervals, key=lambda x: x.start).start if self.intervals else None
+        return self.intervals[0].start if self.intervals else None
 
     @property
     # @profile
     def end(self):
-        return max(self.intervals, key=lambda x: x.end).end if self.intervals else None
+        return self.intervals[-1].end if self.intervals else None
 
     @property
     # @profile
@@ -147,58 +196,94 @@ class TimeIntervals(Printable):
         self.intervals = v
 
     @profile
-    def __add__(self, other):
-        if isinstance(other, TimeInterval):
-            if self.is_empty:
-                return TimeIntervals([other])
-            if other.start > self.end:
-                self.intervals.append(other)
-            elif other.end < self.start:
-                self.intervals.insert(0, other)
-            elif other.start == self.end:
-                self.intervals[-1].end = other.end
-            elif other.end == self.start:
-                self.intervals[0].start = other.start
-            else:
-                return self + TimeIntervals([other])
-            return self
-
-        if self.is_empty:
-            return TimeIntervals(other.intervals)
-
-        if other.is_empty:
-            return TimeIntervals(self.intervals)
-
-        self_points = [point for interval in self.intervals for point in (interval.start, interval.end)]
-        other_points = [point for interval in other.intervals for point in (interval.start, interval.end)]
-        self.split(other_points)
-        other.split(self_points)
-        v = list(set(self.intervals).union(set(other.intervals)))
-        v.sort(key=lambda ii: ii.start)
-        new = TimeIntervals(v)
-        self.compress()
-        other.compress()
-        new.compress()
-        return new
+    def union(self, other):
+        """
+        The union of these time intervals with the other time intervals
+
+        :param other: The other time intervals
+        :type other: TimeIntervals | TimeInterval
+        :return: The union
+        :rtype: TimeIntervals
+        """
+        other_intervals = self._as_intervals(other)
+        if not other_intervals:
+            return TimeIntervals._from_normalised(list(self.intervals))
+        if not self.intervals:
+            return TimeIntervals._from_normalised(list(other_intervals))
+        if other_intervals[0].start > self.intervals[-1].end:
+            # Common case of appending a later interval
+            return TimeIntervals._from_normalised(self.intervals + list(other_intervals))
+        return TimeIntervals._from_normalised(self.normalise(self.intervals + list(other_intervals)))
+
+    @profile
+    def difference(self, other):
+        """
+        The intervals in these time intervals that are not in the other time intervals
+
+        :param other: The other time intervals
+        :type other: TimeIntervals | TimeInterval
+        :return: The difference
+        :rtype: TimeIntervals
+        """
+        others = self._as_intervals(other)
+        result = []
+        j = 0
+        for interval in self.intervals:
+            start, end = interval.start, interval.end
+
+            # Skip the other intervals that finish before this one starts
+            while j < len(others) and others[j].end <= start:
+                j += 1
+
+            k = j
+            while k < len(others) and others[k].start < end and start < end:
+                if others[k].start > start:
+                    result.append(TimeInterval(start, others[k].start))
+                start = max(start, others[k].end)
+                k += 1
+
+            if start < end:
+                result.append(interval if start == interval.start else TimeInterval(start, end))
+        return TimeIntervals._from_normalised(result)
 
     @profile
+    def intersection(self, other):
+        """
+        The intervals that are in both these time intervals and the other time intervals
+
+        :param other: The other time intervals
+        :type other: TimeIntervals | TimeInterval
+        :return: The intersection
+        :rtype: TimeIntervals
+        """
+        others = self._as_intervals(other)
+        result = []
+        i = j = 0
+        while i < len(self.intervals) and j < len(others):
+            a, b = self.intervals[i], others[j]
+            start = max(a.start, b.start)
+            end = min(a.end, b.end)
+            if start < end:
+                if start == a.start and end == a.end:
+                    result.append(a)
+                elif start == b.start and end == b.end:
+                    result.append(b)
+                else:
+                    result.append(TimeInterval(start, end))
+            if a.end < b.end:
+                i += 1
+            else:
+                j += 1
+        return TimeIntervals._from_normalised(result)
+
+    def __add__(self, other):
+        return self.union(other)
+
     def __sub__(self, other):
-        if self == other:
-            return TimeIntervals([])
-        if not other:
-            other = TimeIntervals([])
+        return self.difference(other)
 
-        self_points = [point for interval in self.intervals for point in (interval.start, interval.end)]
-        other_points = [point for interval in other.intervals for point in (interval.start, interval.end)]
-        self.split(other_points)
-        other.split(self_points)
-        v = list(set(self.intervals).difference(set(other.intervals)))
-        v.sort(key=lambda ii: ii.start)
-        new = TimeIntervals(v)
-        self.compress()
-        other.compress()
-        new.compress()
-        return new
+    def __and__(self, other):
+        return self.intersection(other)
 
     # @profile
     def __eq__(self, other):
@@ -212,7 +297,7 @@ class TimeIntervals(Printable):
 
     # @profile
     def __iter__(self):
-        return iter(sorted(self.intervals))
+        return iter(self.intervals)
 
     # @profile
     def __getitem__(self, key):
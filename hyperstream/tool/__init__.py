@@ -18,11 +18,12 @@
 #  OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE
 #  OR OTHER DEALINGS IN THE SOFTWARE.
 """
-Tool package. Defines Tool, MultiOutputTool and SelectorTool base classes.
+Tool package. Defines Tool, IncrementalTool, MultiOutputTool and SelectorTool base classes.
 """
 
 from .base_tool import BaseTool
 from .tool import Tool
+from .incremental_tool import IncrementalTool, WindowState
 from .aggregate_tool import AggregateTool
 from .multi_output_tool import MultiOutputTool
 from .selector_tool import SelectorTool
@@ -178,6 +178,7 @@ class BaseTool(Printable, Hashable):
         :return: None
         """
         from hyperstream import HyperStream
-        hs = HyperStream(loglevel=logging.CRITICAL, file_logger=False, console_logger=False, mqtt_logger=None)
-        if hs.current_session:
+        # Only look up the existing instance rather than constructing one
+        hs = HyperStream._instance
+        if hs is not None and hs.current_session:
             hs.current_session.write_to_history(**kwargs)
@@ -0,0 +1,172 @@
+# The MIT License (MIT)
+# Copyright (c) 2014-2017 University of Bristol
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT.
+# IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM,
+# DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR
+# OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE
+# OR OTHER DEALINGS IN THE SOFTWARE.
+
+from collections import deque
+
+from . import Tool
+
+
+class WindowState(object):
+    """
+    The state of a sliding window, carried over between consecutive executions of a tool on the same sink.
+    The window holds the documents with timestamps in (lower, upper] of the current window, and the future holds the
+    documents that have been read from the source but are not yet in the window.
+    """
+    def __init__(self):
+        self.end = None  # The end of the last interval that was executed
+        self.data_end = None  # The time up to which the source data has been read
+        self.window = deque()
+        self.future = deque()
+
+    def data_start(self, start):
+        """
+        Get the time from which the source data should be read, given the start of the first window in this execution.
+        Data that has already been read in a previous execution is not read again.
+
+        :param start: The start of the first window
+        :return: The start time
+        """
+        if self.data_end is not None and self.data_end > start:
+            return self.data_end
+        return start
+
+    def slide(self, lower, upper, data):
+        """
+        Move the window to (lower, upper], pruning old documents and taking new documents from the future and then the
+        data iterator. The windows must be presented in increasing order.
+
+        :param lower: The lower end of the window (exclusive)
+        :param upper: The upper end of the window (inclusive)
+        :param data: Iterator over the new source documents, in time order
+        :return: The documents in the window
+        """
+        window, future = self.window, self.future
+
+        while window and window[0].timestamp <= lower:
+            window.popleft()
+
+        while future and future[0].timestamp <= upper:
+            doc = future.popleft()
+            if doc.timestamp > lower:
+                window.append(doc)
+
+        if not future:
+            for doc in data:
+                if doc.timestamp > upper:
+                    future.append(doc)
+                    break
+                if doc.timestamp > lower:
+                    window.append(doc)
+
+        return window
+
+    def read(self, data, end):
+        """
+        Finish reading the data for this execution. Any documents not yet consumed are kept in the future, so that they
+        are available to the next execution.
+
+        :param data: Iterator over the remaining source documents
+        :param end: The time up to which the data was requested
+        :return: None
+        """
+        self.future.extend(data)
+        self.data_end = end
+
+
+class WindowStateCache(object):
+    """
+    The window state of each sink of a tool, keyed by the sink stream id. A state is only reused if the next execution
+    starts where the last one ended. Note that this deliberately has a constant representation, since it is not a tool
+    parameter and should not affect the tool's hash.
+    """
+    def __init__(self):
+        self._states = {}
+
+    def __repr__(self):
+        return "{}()".format(self.__class__.__name__)
+
+    def pop(self, sink, interval):
+        """
+        Get the window state for the given sink, if the interval follows on from the last execution. Otherwise a new
+        state is returned.
+
+        :param sink: The sink stream
+        :param interval: The time interval about to be executed
+        :return: The window state
+        :rtype: WindowState
+        """
+        state = self._states.pop(sink.stream_id, None)
+        if state is None or state.end != interval.start:
+            return WindowState()
+        return state
+
+    def put(self, sink, state):
+        """
+        Store the window state for the given sink
+
+        :param sink: The sink stream
+        :param state: The window state
+        :return: None
+        """
+        self._states[sink.stream_id] = state
+
+
+class IncrementalTool(Tool):
+    """
+    Base class for window tools that carry their window state over between executions on the same sink. When the online
+    engine executes a workflow over adjacent intervals, such tools only read and fold in the new data rather than
+    rebuilding the windows from scratch. Implementations should override _execute_incremental.
+    """
+    def __init__(self, **kwargs):
+        super(IncrementalTool, self).__init__(**kwargs)
+        self._window_states = WindowStateCache()
+
+    def _execute_incremental(self, sources, alignment_stream, interval, state):
+        """
+        Tool implementations should override this function to actually perform computations
+
+        :param sources: The source streams (possibly None)
+        :param alignment_stream: The alignment stream
+        :param interval: The time interval
+        :param state: The window state from the previous execution (or a new one)
+        :type sources: list[Stream] | tuple[Stream] | None
+        :type alignment_stream: Stream | None
+        :type interval: TimeInterval
+        :type state: WindowState
+        :return: None
+        """
+        raise NotImplementedError
+
+    def _execute(self, sources, alignment_stream, interval):
+        # Without a sink there is nothing to key the state on, so start from scratch
+        return self._execute_incremental(
+            sources=sources, alignment_stream=alignment_stream, interval=interval, state=WindowState())
+
+    def _execute_sink(self, sources, sink, alignment_stream, interval):
+        state = self._window_states.pop(sink, interval)
+        end = interval.end
+        for stream_instance in self._execute_incremental(
+                sources=sources, alignment_stream=alignment_stream, interval=interval, state=state):
+            yield stream_instance
+
+        # Only store the state once the execution has completed
+        state.end = end
+        self._window_states.put(sink, state)
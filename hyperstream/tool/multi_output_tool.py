@@ -22,6 +22,7 @@
 from . import BaseTool
 from ..time_interval import TimeInterval, TimeIntervals
 from ..stream import Stream
+from ..utils import measured
 
 import logging
 
@@ -50,6 +51,7 @@ class MultiOutputTool(BaseTool):
         """
         raise NotImplementedError
 
+    @measured("tool")
     def execute(self, source, splitting_stream, sinks, interval, meta_data_id, output_plate_values):
         """
         Execute the tool over the given time interval.
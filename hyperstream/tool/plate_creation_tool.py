@@ -21,6 +21,7 @@
 
 from . import BaseTool
 from ..time_interval import TimeInterval
+from ..utils import measured
 
 import logging
 
@@ -44,6 +45,7 @@ class PlateCreationTool(BaseTool):
         """
         raise NotImplementedError
 
+    @measured("tool")
     def execute(self, source, interval, input_plate_value):
         """
         Execute the tool over the given time interval.
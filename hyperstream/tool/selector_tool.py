@@ -22,6 +22,7 @@
 from . import BaseTool
 from ..time_interval import TimeInterval, TimeIntervals
 from ..stream import Stream
+from ..utils import measured
 
 import logging
 
@@ -40,6 +41,7 @@ class SelectorTool(BaseTool):
     def _execute(self, sources, interval):
         raise NotImplementedError
 
+    @measured("tool")
     def execute(self, sources, sinks, interval):
         """
         Execute the tool over the given time interval.
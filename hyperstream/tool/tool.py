@@ -22,7 +22,7 @@
 from . import BaseTool
 from ..time_interval import TimeInterval, TimeIntervals
 from ..stream import Stream
-from ..utils import StreamNotAvailableError
+from ..utils import StreamNotAvailableError, measured
 
 import logging
 
@@ -46,6 +46,20 @@ class Tool(BaseTool):
         """
         raise NotImplementedError
 
+    def _execute_sink(self, sources, sink, alignment_stream, interval):
+        """
+        Produce the stream instances for the given sink over a single (uncalculated) time interval. By default this
+        simply calls _execute, but tools that keep state for each sink (see IncrementalTool) override this.
+
+        :param sources: The source streams (possibly None)
+        :param sink: The sink stream
+        :param alignment_stream: The alignment stream
+        :param interval: The time interval
+        :return: The stream instances
+        """
+        return self._execute(sources=sources, alignment_stream=alignment_stream, interval=interval)
+
+    @measured("tool")
     def execute(self, sources, sink, interval, alignment_stream=None):
         """
         Execute the tool over the given time interval.
@@ -74,10 +88,8 @@ class Tool(BaseTool):
             document_count = 0
 
             for interval in required_intervals:
-                for stream_instance in self._execute(
-                        sources=sources, alignment_stream=alignment_stream, interval=interval):
-                    sink.writer(stream_instance)
-                    document_count += 1
+                document_count += sink.channel.write_in_batches(sink, self._execute_sink(
+                    sources=sources, sink=sink, alignment_stream=alignment_stream, interval=interval))
                 sink.calculated_intervals += interval
 
             required_intervals = TimeIntervals([interval]) - sink.calculated_intervals
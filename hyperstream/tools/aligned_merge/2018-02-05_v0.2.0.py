@@ -0,0 +1,53 @@
+"""
+The MIT License (MIT)
+Copyright (c) 2014-2017 University of Bristol
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT.
+IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM,
+DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR
+OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE
+OR OTHER DEALINGS IN THE SOFTWARE.
+"""
+
+from hyperstream.stream import StreamInstance, merge_timestamps
+from hyperstream.tool import Tool
+
+
+class AlignedMerge(Tool):
+    """
+    Merges streams that should have aligned timestamps.
+    This version takes account of missing data in streams: only the timestamps present in all of the streams are
+    output. The time ordered streams are merged on a heap in a single pass, rather than materialising them.
+    """
+    def __init__(self, names=None):
+        super(AlignedMerge, self).__init__(names=names)
+        self.names = names if names else []
+
+    # Note: cannot check stream count because the number depends on the length of self.names
+    def _execute(self, sources, alignment_stream, interval):
+        if self.names and len(self.names) != len(sources):
+            raise TypeError("Tool AlignedMerge expected {} streams as input, got {} instead".format(
+                len(self.names), len(sources)))
+        windows = [source.window(interval, force_calculation=True) for source in sources]
+
+        for timestamp, values in merge_timestamps(windows):
+            # If one of the streams doesn't have this timestamp, it's a misalignment
+            if len(values) != len(windows):
+                continue
+            values = tuple(value for _, value in values)
+            if not self.names:
+                yield StreamInstance(timestamp, values)
+            else:
+                yield StreamInstance(timestamp, dict(zip(self.names, values)))
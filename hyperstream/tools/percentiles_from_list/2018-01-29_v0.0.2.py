@@ -0,0 +1,41 @@
+# The MIT License (MIT) # Copyright (c) 2014-2017 University of Bristol
+#
+#  Permission is hereby granted, free of charge, to any person obtaining a copy
+#  of this software and associated documentation files (the "Software"), to deal
+#  in the Software without restriction, including without limitation the rights
+#  to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+#  copies of the Software, and to permit persons to whom the Software is
+#  furnished to do so, subject to the following conditions:
+#
+#  The above copyright notice and this permission notice shall be included in all
+#  copies or substantial portions of the Software.
+#
+#  THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+#  EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+#  MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT.
+#  IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM,
+#  DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR
+#  OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE
+#  OR OTHER DEALINGS IN THE SOFTWARE.
+
+from hyperstream.stream import StreamInstance
+from hyperstream.tool import Tool, check_input_stream_count
+from hyperstream.utils.statistics import percentiles
+
+
+class PercentilesFromList(Tool):
+    """
+    For each document assumed to be a list of numbers, calculate the quantiles (vectorised with NumPy if it is
+    available)
+    """
+    def __init__(self, n_segments=100, percentiles=None):
+        super(PercentilesFromList, self).__init__(n_segments=n_segments, percentiles=percentiles)
+
+    @check_input_stream_count(1)
+    def _execute(self, sources, alignment_stream, interval):
+        if self.percentiles is not None:
+            q = list(self.percentiles)
+        else:
+            q = [i * 100.0 / self.n_segments for i in range(self.n_segments + 1)]
+        for t, d in sources[0].window(interval, force_calculation=True):
+            yield StreamInstance(t, percentiles(d, q))
@@ -0,0 +1,54 @@
+# The MIT License (MIT) # Copyright (c) 2014-2017 University of Bristol
+#
+#  Permission is hereby granted, free of charge, to any person obtaining a copy
+#  of this software and associated documentation files (the "Software"), to deal
+#  in the Software without restriction, including without limitation the rights
+#  to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+#  copies of the Software, and to permit persons to whom the Software is
+#  furnished to do so, subject to the following conditions:
+#
+#  The above copyright notice and this permission notice shall be included in all
+#  copies or substantial portions of the Software.
+#
+#  THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+#  EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+#  MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT.
+#  IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM,
+#  DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR
+#  OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE
+#  OR OTHER DEALINGS IN THE SOFTWARE.
+
+from hyperstream import TimeInterval, RelativeTimeInterval
+from hyperstream.stream import StreamInstance
+from hyperstream.tool import IncrementalTool, check_input_stream_count
+from datetime import timedelta
+
+
+class RelativeWindow(IncrementalTool):
+    """
+    Gathers the data in a window relative to each timestamp of the alignment stream. The window contents are carried
+    over between consecutive executions on the same sink, so each execution only reads the new data.
+    """
+    def __init__(self, relative_start, relative_end, values_only=True):
+        super(RelativeWindow, self).__init__(
+            relative_start=relative_start, relative_end=relative_end, values_only=values_only)
+        self.values_only = values_only
+        self.relative_interval = RelativeTimeInterval(start=relative_start, end=relative_end)
+
+    @check_input_stream_count(1)
+    def _execute_incremental(self, sources, alignment_stream, interval, state):
+        relative_start = timedelta(seconds=self.relative_interval.start)
+        relative_end = timedelta(seconds=self.relative_interval.end)
+
+        data_interval = TimeInterval(interval.start + relative_start, interval.end + relative_end)
+        data = iter(sources[0].window(TimeInterval(state.data_start(data_interval.start), data_interval.end)))
+
+        for (t, _) in alignment_stream.window(interval, force_calculation=True):
+            window = state.slide(t + relative_start, t + relative_end, data)
+
+            if self.values_only:
+                yield StreamInstance(t, [si.value for si in window])
+            else:
+                yield StreamInstance(t, list(window))
+
+        state.read(data, data_interval.end)
@@ -0,0 +1,56 @@
+"""
+The MIT License (MIT)
+Copyright (c) 2014-2017 University of Bristol
+
+Permission is hereby granted, free of charge, to any person obtaining a copy
+of this software and associated documentation files (the "Software"), to deal
+in the Software without restriction, including without limitation the rights
+to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+copies of the Software, and to permit persons to whom the Software is
+furnished to do so, subject to the following conditions:
+
+The above copyright notice and this permission notice shall be included in all
+copies or substantial portions of the Software.
+
+THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT.
+IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM,
+DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR
+OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE
+OR OTHER DEALINGS IN THE SOFTWARE.
+"""
+
+from hyperstream import TimeInterval
+from hyperstream.stream import StreamInstance
+from hyperstream.tool import IncrementalTool, check_input_stream_count
+
+
+class SlidingListify(IncrementalTool):
+    """
+    Gathers the data in each window of a sliding window stream into a list. The window contents are carried over
+    between consecutive executions on the same sink, so each execution only reads the new data.
+    """
+    def __init__(self, include_time=False):
+        super(SlidingListify, self).__init__(include_time=include_time)
+
+    @check_input_stream_count(2)
+    def _execute_incremental(self, sources, alignment_stream, interval, state):
+        data = None
+
+        for time, rel_window in sources[0].window(interval, force_calculation=True):
+            if data is None:
+                start = state.data_start(rel_window.start)
+                data = iter(sources[1].window(TimeInterval(start, interval.end), force_calculation=True))
+
+            window = state.slide(rel_window.start, rel_window.end, data)
+
+            if self.include_time:
+                value = list(window)
+            else:
+                value = [stream_instance.value for stream_instance in window]
+            if len(value) > 0:
+                yield StreamInstance(time, value)
+
+        if data is not None:
+            state.read(data, interval.end)
@@ -20,15 +20,19 @@
 
 from .misc import camel_to_snake, snake_to_camel, touch
 from .containers import MetaDataTree, Hashable, Printable, TypedBiDict, FrozenKeyDict, TypedFrozenKeyDict, \
-    ToolContainer, PluginContainer, PluginWrapper, FactorContainer, Singleton
+    LazyContainer, ToolContainer, PluginContainer, PluginWrapper, FactorContainer, Singleton
 from .hyperstream_logger import HyperStreamLogger
 from .time_utils import UTC, MIN_DATE, MAX_DATE, utcnow, get_timedelta, unix2datetime, construct_experiment_id, \
-    duration2str, reconstruct_interval, datetime2unix, is_naive, remove_microseconds
-from .decorators import timeit, check_output_format, check_tool_defined, check_input_stream_count
+    duration2str, reconstruct_interval, datetime2unix, datetime2ms, ms2datetime, is_naive, remove_microseconds
+from .decorators import timeit, check_output_format, check_tool_defined, check_input_stream_count, synchronized, \
+    measured
 from .errors import StreamNotAvailableError, StreamAlreadyExistsError, StreamDataNotAvailableError, \
     StreamNotFoundError, IncompatiblePlatesError, ToolNotFoundError, ChannelNotFoundError, ToolExecutionError, \
     PlateEmptyError, PlateDefinitionError, LinkageError, FactorAlreadyExistsError, NodeAlreadyExistsError, \
     FactorDefinitionError, ChannelAlreadyExistsError, NodeDefinitionError, ToolInitialisationError, \
     IncompatibleToolError, MultipleStreamsFoundError, PlateNotFoundError, ConfigurationError, handle_exception
-from .serialization import func_dump, func_load
+from .serialization import func_dump, func_load, value_to_json, value_from_json
+from .profiling import BootstrapProfile, PhaseTiming
+from .metrics import ExecutionMetrics, MetricsRegistry, metrics
+from .prefetch import prefetched
 from .statistics import histogram, percentile
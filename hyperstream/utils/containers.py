@@ -346,16 +346,65 @@ class Singleton(type):
         return cls._instance
 
 
-class ToolContainer(Printable):
+class LazyContainer(Printable):
     """
-    Dummy class for holding tool objects for easy access
+    Container whose attributes are only created when they are first accessed. A loader function is registered for each
+    attribute name, and its result is stored on the container the first time the attribute is requested.
+    """
+    def __init__(self):
+        self._loaders = {}
+
+    def register(self, name, loader):
+        """
+        Register the loader for an attribute
+
+        :param name: The attribute name
+        :param loader: Function without arguments that creates the attribute value. It should raise AttributeError if
+        the value cannot be created.
+        :return: None
+        """
+        self.__dict__.pop(name, None)
+        self._loaders[name] = loader
+
+    @property
+    def names(self):
+        """
+        The names of all of the attributes, whether or not they have been loaded yet
+
+        :return: The sorted names
+        """
+        return sorted(set(k for k in self.__dict__ if k[0] != "_") | set(self._loaders))
+
+    def __getattr__(self, name):
+        # Only called when normal attribute lookup fails, i.e. the attribute has not been loaded yet
+        loaders = self.__dict__.get("_loaders", {})
+        if name not in loaders:
+            raise AttributeError("{} has no attribute {}".format(self.__class__.__name__, name))
+        try:
+            value = loaders[name]()
+        except AttributeError:
+            loaders.pop(name, None)
+            raise
+        setattr(self, name, value)
+        loaders.pop(name, None)
+        return value
+
+    def __dir__(self):
+        return sorted(set(dir(self.__class__)) | set(self.__dict__) | set(self._loaders))
+
+    def __repr__(self):
+        return "{}({})".format(self.__class__.__name__, ", ".join(self.names))
+
+
+class ToolContainer(LazyContainer):
+    """
+    Container for tool classes. The tool modules are imported when the tools are first accessed.
     """
-    pass
 
 
-class FactorContainer(Printable):
+class FactorContainer(LazyContainer):
     """
-    Dummy class for holding factor creation functions
+    Container for factor creation functions. These are created when they are first accessed.
     """
 
 
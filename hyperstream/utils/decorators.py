@@ -20,6 +20,9 @@
 
 import time
 import logging
+from functools import wraps
+
+from .metrics import metrics
 
 
 def timeit(f):
@@ -91,3 +94,34 @@ def check_input_stream_count(expected_number_of_streams):
         return func_wrapper
 
     return stream_count_decorator
+
+
+def synchronized(func):
+    """
+    Decorator for methods that must not run concurrently on the same object. The object should have a _lock attribute
+    (a threading.Lock or threading.RLock)
+
+    :return: the decorator
+    """
+    @wraps(func)
+    def func_wrapper(self, *args, **kwargs):
+        with self._lock:
+            return func(self, *args, **kwargs)
+    return func_wrapper
+
+
+def measured(kind, name_attribute="name"):
+    """
+    Decorator for execute methods that records each execution in the metrics registry
+
+    :param kind: The kind of execution (e.g. "tool" or "factor")
+    :param name_attribute: The attribute of the object that the execution is recorded under
+    :return: the decorator
+    """
+    def measured_decorator(func):
+        @wraps(func)
+        def func_wrapper(self, *args, **kwargs):
+            with metrics.execution(kind, getattr(self, name_attribute)):
+                return func(self, *args, **kwargs)
+        return func_wrapper
+    return measured_decorator
@@ -0,0 +1,331 @@
+# The MIT License (MIT) # Copyright (c) 2014-2017 University of Bristol
+#
+#  Permission is hereby granted, free of charge, to any person obtaining a copy
+#  of this software and associated documentation files (the "Software"), to deal
+#  in the Software without restriction, including without limitation the rights
+#  to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+#  copies of the Software, and to permit persons to whom the Software is
+#  furnished to do so, subject to the following conditions:
+#
+#  The above copyright notice and this permission notice shall be included in all
+#  copies or substantial portions of the Software.
+#
+#  THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+#  EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+#  MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT.
+#  IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM,
+#  DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR
+#  OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE
+#  OR OTHER DEALINGS IN THE SOFTWARE.
+
+"""
+In-process metrics for tool and factor executions.
+
+Each execution of a tool or factor is recorded under its kind ("tool" or "factor") and name. The record holds the wall
+time, the number of documents read and written (and the time spent in the channels doing so), and the number of bytes
+written, for channels that know this. Records are inclusive: the counts of a tool execution are also added to the
+factor that called it, in the same way as the wall time.
+"""
+
+import json
+import threading
+import time
+from contextlib import contextmanager
+
+from .containers import Printable
+
+
+class ExecutionMetrics(object):
+    """
+    The metrics of a single execution, or the totals over all of the executions of a tool or factor
+    """
+    __slots__ = ('executions', 'wall_time', 'documents_read', 'documents_written', 'bytes_written', 'read_time',
+                 'write_time')
+
+    # Descriptions of the fields, as used in the Prometheus export
+    fields = (
+        ('executions', 'Number of executions'),
+        ('wall_time', 'Total elapsed time of the executions (seconds)'),
+        ('documents_read', 'Number of stream instances read from channels'),
+        ('documents_written', 'Number of stream instances written to channels'),
+        ('bytes_written', 'Number of bytes written to channels (where known)'),
+        ('read_time', 'Time spent reading from channels (seconds)'),
+        ('write_time', 'Time spent writing to channels (seconds)'),
+    )
+
+    def __init__(self):
+        self.executions = 0
+        self.wall_time = 0.0
+        self.documents_read = 0
+        self.documents_written = 0
+        self.bytes_written = 0
+        self.read_time = 0.0
+        self.write_time = 0.0
+
+    def add(self, other, wall_time=True):
+        """
+        Add the metrics of another execution to these
+
+        :param other: The other metrics
+        :param wall_time: Whether to add the executions and wall time (not done for nested executions, since the
+        wall time of the outer execution already covers them)
+        :return: None
+        """
+        if wall_time:
+            self.executions += other.executions
+            self.wall_time += other.wall_time
+        self.documents_read += other.documents_read
+        self.documents_written += other.documents_written
+        self.bytes_written += other.bytes_written
+        self.read_time += other.read_time
+        self.write_time += other.write_time
+
+    def to_dict(self):
+        return dict((name, getattr(self, name)) for name, _ in self.fields)
+
+
+class MetricsRegistry(Printable):
+    """
+    Registry of the execution metrics of tools and factors. The executions in progress are held on a stack for each
+    thread, so that the channel reads and writes made during an execution can be attributed to it.
+    """
+    def __init__(self, enabled=True):
+        self.enabled = enabled
+        self._totals = {}
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    def _stack(self):
+        stack = getattr(self._local, 'stack', None)
+        if stack is None:
+            stack = self._local.stack = []
+        return stack
+
+    @property
+    def current(self):
+        """
+        The innermost execution in progress on this thread (or None)
+
+        :rtype: ExecutionMetrics | None
+        """
+        stack = getattr(self._local, 'stack', None)
+        return stack[-1] if stack else None
+
+    @contextmanager
+    def execution(self, kind, name):
+        """
+        Record an execution. The context manager yields the metrics of the execution (or None if the registry is
+        disabled), which are added to the totals for the kind and name on exit.
+
+        :param kind: The kind of execution (e.g. "tool" or "factor")
+        :param name: The name of the tool or factor
+        :return: The metrics of the execution
+        """
+        if not self.enabled:
+            yield None
+            return
+
+        metrics = ExecutionMetrics()
+        metrics.executions = 1
+        stack = self._stack()
+        parent = stack[-1] if stack else None
+        stack.append(metrics)
+        start = time.time()
+        try:
+            yield metrics
+        finally:
+            metrics.wall_time = time.time() - start
+            stack.pop()
+            with self._lock:
+                if parent is not None:
+                    parent.add(metrics, wall_time=False)
+                key = (kind, name)
+                if key not in self._totals:
+                    self._totals[key] = ExecutionMetrics()
+                self._totals[key].add(metrics)
+
+    @contextmanager
+    def adopt(self, parent):
+        """
+        Make the given execution the current one on this thread, e.g. for work done on a thread pool on behalf of it
+
+        :param parent: The metrics of the execution (or None)
+        :return: None
+        """
+        if parent is None:
+            yield
+            return
+        stack = self._stack()
+        stack.append(parent)
+        try:
+            yield
+        finally:
+            stack.pop()
+
+    @contextmanager
+    def detached(self):
+        """
+        Do not attribute anything on this thread to the executions in progress, e.g. for internal bookkeeping writes
+
+        :return: None
+        """
+        stack = self._stack()
+        self._local.stack = []
+        try:
+            yield
+        finally:
+            self._local.stack = stack
+
+    def timed_reads(self, instances):
+        """
+        Attribute the reading of the given stream instances to the current execution
+
+        :param instances: The stream instances, e.g. the generator returned by a channel's get_results
+        :return: An iterable over the same stream instances
+        """
+        metrics = self.current
+        if metrics is None:
+            return instances
+        return self._timed_reads(metrics, iter(instances))
+
+    @staticmethod
+    def _timed_reads(metrics, iterator):
+        clock = time.time
+        while True:
+            start = clock()
+            try:
+                item = next(iterator)
+            except StopIteration:
+                metrics.read_time += clock() - start
+                return
+            metrics.read_time += clock() - start
+            metrics.documents_read += 1
+            yield item
+
+    def record_read(self, document_count, elapsed):
+        """
+        Attribute a read of a number of stream instances to the current execution
+
+        :param document_count: The number of stream instances read
+        :param elapsed: The time taken (seconds)
+        :return: None
+        """
+        metrics = self.current
+        if metrics is not None:
+            metrics.documents_read += document_count
+            metrics.read_time += elapsed
+
+    def timed_writer(self, writer):
+        """
+        Wrap a stream writer so that its writes are attributed to the execution in progress when they are made
+
+        :param writer: The stream writer function
+        :return: The wrapped writer
+        """
+        def timed_writer(document_collection):
+            metrics = self.current
+            if metrics is None:
+                return writer(document_collection)
+            start = time.time()
+            try:
+                writer(document_collection)
+            finally:
+                metrics.write_time += time.time() - start
+            metrics.documents_written += len(document_collection) if isinstance(document_collection, list) else 1
+        return timed_writer
+
+    def record_bytes_written(self, byte_count):
+        """
+        Attribute a number of bytes written to the current execution. Called by channels that know the size of the
+        data that they write.
+
+        :param byte_count: The number of bytes
+        :return: None
+        """
+        metrics = self.current
+        if metrics is not None:
+            metrics.bytes_written += byte_count
+
+    def reset(self):
+        """
+        Clear the totals
+
+        :return: None
+        """
+        with self._lock:
+            self._totals = {}
+
+    def get(self, kind, name):
+        """
+        Get the totals for a tool or factor
+
+        :param kind: The kind of execution
+        :param name: The name of the tool or factor
+        :return: The totals (or None if there have been no executions)
+        :rtype: ExecutionMetrics | None
+        """
+        return self._totals.get((kind, name))
+
+    def to_dict(self):
+        """
+        Get the totals as a list of dictionaries (e.g. for serialising to json), in decreasing order of wall time
+
+        :return: The totals
+        """
+        with self._lock:
+            items = [(kind, name, m.to_dict()) for (kind, name), m in self._totals.items()]
+        result = []
+        for kind, name, d in sorted(items, key=lambda x: -x[2]['wall_time']):
+            d.update(kind=kind, name=name)
+            result.append(d)
+        return result
+
+    def to_json(self, **kwargs):
+        """
+        Get the totals as json
+
+        :param kwargs: Keyword arguments passed to json.dumps
+        :return: The json string
+        """
+        return json.dumps(self.to_dict(), **kwargs)
+
+    def to_prometheus(self, prefix="hyperstream"):
+        """
+        Get the totals in the Prometheus text exposition format, with one counter per field labelled by kind and name
+
+        :param prefix: The prefix of the metric names
+        :return: The text
+        """
+        totals = self.to_dict()
+        lines = []
+        for field, description in ExecutionMetrics.fields:
+            metric = "{}_{}_total".format(prefix, field)
+            lines.append("# HELP {} {}".format(metric, description))
+            lines.append("# TYPE {} counter".format(metric))
+            for d in totals:
+                lines.append('{}{{kind="{}",name="{}"}} {}'.format(
+                    metric, _escape_label(d['kind']), _escape_label(d['name']), d[field]))
+        return "\n".join(lines) + "\n"
+
+    def report(self, n=None):
+        """
+        Get a printable report of the tools and factors with the largest wall time
+
+        :param n: The number of rows (None for all)
+        :return: The report
+        """
+        lines = ["{:<8} {:>6} {:>10} {:>10} {:>10} {:>10} {:>10}  {}".format(
+            "kind", "execs", "time (ms)", "read (ms)", "write (ms)", "docs in", "docs out", "name")]
+        for d in self.to_dict()[:n]:
+            lines.append("{:<8} {:>6} {:>10.1f} {:>10.1f} {:>10.1f} {:>10} {:>10}  {}".format(
+                d['kind'], d['executions'], d['wall_time'] * 1000, d['read_time'] * 1000, d['write_time'] * 1000,
+                d['documents_read'], d['documents_written'], d['name']))
+        return "\n".join(lines)
+
+
+def _escape_label(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+# The registry used by tools, factors and channels
+metrics = MetricsRegistry()
@@ -0,0 +1,100 @@
+# The MIT License (MIT) # Copyright (c) 2014-2017 University of Bristol
+#
+#  Permission is hereby granted, free of charge, to any person obtaining a copy
+#  of this software and associated documentation files (the "Software"), to deal
+#  in the Software without restriction, including without limitation the rights
+#  to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+#  copies of the Software, and to permit persons to whom the Software is
+#  furnished to do so, subject to the following conditions:
+#
+#  The above copyright notice and this permission notice shall be included in all
+#  copies or substantial portions of the Software.
+#
+#  THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+#  EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+#  MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT.
+#  IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM,
+#  DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR
+#  OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE
+#  OR OTHER DEALINGS IN THE SOFTWARE.
+
+"""
+Reading ahead of a consumer on a background thread, so that I/O overlaps with computation.
+"""
+
+import sys
+import threading
+
+from six import reraise
+from six.moves import queue
+
+# How often a blocked producer checks whether the consumer has gone away (seconds)
+_POLL_INTERVAL = 0.1
+
+
+def prefetched(iterable, buffer_size, chunk_size=None):
+    """
+    Generator over the items of the iterable, which are read on a background thread while the consumer processes the
+    current ones. Items are handed over in chunks through a bounded queue, so the producer never runs more than
+    buffer_size items ahead of the consumer. Exceptions raised while reading are re-raised in the consumer, and closing
+    the generator early (e.g. breaking out of a loop) stops the producer.
+
+    :param iterable: The iterable, e.g. the generator returned by a channel's get_results
+    :param buffer_size: The maximum number of items read ahead
+    :param chunk_size: The number of items handed over at a time (defaults to a quarter of the buffer)
+    :type buffer_size: int
+    :type chunk_size: int | None
+    :return: Generator over the same items, in the same order
+    """
+    if buffer_size < 1:
+        raise ValueError("buffer_size must be positive, got {}".format(buffer_size))
+    if chunk_size is None:
+        chunk_size = max(1, buffer_size // 4)
+    chunks = queue.Queue(maxsize=max(1, buffer_size // chunk_size))
+    stopped = threading.Event()
+
+    def put(item):
+        while not stopped.is_set():
+            try:
+                chunks.put(item, timeout=_POLL_INTERVAL)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def produce():
+        iterator = iter(iterable)
+        try:
+            chunk = []
+            for item in iterator:
+                chunk.append(item)
+                if len(chunk) >= chunk_size:
+                    if not put((chunk, None)):
+                        return
+                    chunk = []
+            if chunk and not put((chunk, None)):
+                return
+            put((None, None))
+        except Exception:
+            put((None, sys.exc_info()))
+        finally:
+            # The iterator is closed on the thread that was running it
+            close = getattr(iterator, 'close', None)
+            if close is not None:
+                close()
+
+    thread = threading.Thread(target=produce, name="hyperstream-prefetch")
+    thread.daemon = True
+    thread.start()
+
+    try:
+        while True:
+            chunk, exc_info = chunks.get()
+            if exc_info is not None:
+                reraise(*exc_info)
+            if chunk is None:
+                return
+            for item in chunk:
+                yield item
+    finally:
+        stopped.set()
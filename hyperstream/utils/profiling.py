@@ -0,0 +1,94 @@
+# The MIT License (MIT) # Copyright (c) 2014-2017 University of Bristol
+#
+#  Permission is hereby granted, free of charge, to any person obtaining a copy
+#  of this software and associated documentation files (the "Software"), to deal
+#  in the Software without restriction, including without limitation the rights
+#  to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+#  copies of the Software, and to permit persons to whom the Software is
+#  furnished to do so, subject to the following conditions:
+#
+#  The above copyright notice and this permission notice shall be included in all
+#  copies or substantial portions of the Software.
+#
+#  THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+#  EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+#  MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT.
+#  IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM,
+#  DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR
+#  OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE
+#  OR OTHER DEALINGS IN THE SOFTWARE.
+
+"""
+Profiling of the HyperStream bootstrap (i.e. the construction of the HyperStream object).
+"""
+
+import time
+from collections import namedtuple
+from contextlib import contextmanager
+
+from .containers import Printable
+
+
+class PhaseTiming(namedtuple("PhaseTiming", "name wall_time counts")):
+    """
+    Timing information for a single phase of the bootstrap.
+
+    name: The phase name
+    wall_time: The elapsed time (seconds)
+    counts: Dictionary of the number of objects of each type that were created in the phase
+    """
+    __slots__ = ()
+
+
+class BootstrapProfile(Printable):
+    """
+    Records the wall time and object counts of each of the phases of the HyperStream bootstrap
+    """
+    def __init__(self):
+        self.phases = []
+
+    @contextmanager
+    def phase(self, name):
+        """
+        Time a phase. The context manager yields a dictionary that the object counts can be added to.
+
+        :param name: The phase name
+        :return: The counts dictionary
+        """
+        counts = {}
+        start = time.time()
+        yield counts
+        self.phases.append(PhaseTiming(name=name, wall_time=time.time() - start, counts=counts))
+
+    @property
+    def wall_time(self):
+        """
+        The total elapsed time over all phases (seconds)
+        """
+        return sum(p.wall_time for p in self.phases)
+
+    def to_dict(self):
+        """
+        Get the profile as a dictionary (e.g. for serialising to json)
+
+        :return: The dictionary
+        """
+        return dict(
+            wall_time=self.wall_time,
+            phases=[dict(name=p.name, wall_time=p.wall_time, counts=p.counts) for p in self.phases]
+        )
+
+    def report(self):
+        """
+        Get a printable report of the phases
+
+        :return: The report
+        """
+        total = self.wall_time
+        lines = ["{:<12} {:>10} {:>6}  {}".format("phase", "time (ms)", "%", "counts")]
+        for p in self.phases:
+            lines.append("{:<12} {:>10.1f} {:>6.1f}  {}".format(
+                p.name, p.wall_time * 1000, 100.0 * p.wall_time / total if total else 0.0,
+                ", ".join("{}={}".format(k, v) for k, v in sorted(p.counts.items()))))
+        lines.append("{:<12} {:>10.1f}".format("total", total * 1000))
+        return "\n".join(lines)
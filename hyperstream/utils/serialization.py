@@ -19,9 +19,27 @@
 # OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE
 # OR OTHER DEALINGS IN THE SOFTWARE.
 
+from datetime import datetime, timedelta
+import json
 import types
 import marshal
 
+from six import string_types, integer_types
+
+from .time_utils import UTC, is_naive
+
+
+# Values that json encodes natively (tuples are excluded, since they would be decoded as lists)
+JSON_SCALAR_TYPES = (bool, float, type(None)) + integer_types + string_types
+
+# Tags of the single key objects that encode datetimes and tuples
+DATETIME_TAG = '__datetime__'
+TUPLE_TAG = '__tuple__'
+
+EPOCH = datetime(1970, 1, 1)
+
+_json_encoder = json.JSONEncoder(separators=(',', ':'))
+
 
 def func_dump(func):
     """
@@ -73,3 +91,68 @@ def func_reconstruct_closure(values):
     except:
         raise SyntaxError(src)
     return func(values).__closure__
+
+
+def _to_json(value):
+    """
+    Convert a value to one that json encodes without loss, by tagging datetimes and tuples
+
+    :param value: The value
+    :return: The converted value
+    """
+    if isinstance(value, JSON_SCALAR_TYPES):
+        return value
+    if isinstance(value, dict):
+        if len(value) == 1 and (DATETIME_TAG in value or TUPLE_TAG in value):
+            raise ValueError("Dictionaries with the single key {} are reserved".format(list(value)[0]))
+        return dict((k, _to_json(v)) for k, v in value.items())
+    if isinstance(value, list):
+        return [_to_json(v) for v in value]
+    if isinstance(value, tuple):
+        return {TUPLE_TAG: [_to_json(v) for v in value]}
+    if isinstance(value, datetime):
+        if is_naive(value):
+            delta, aware = value - EPOCH, False
+        else:
+            delta, aware = value - EPOCH.replace(tzinfo=UTC), True
+        return {DATETIME_TAG: [(delta.days * 86400 + delta.seconds) * 1000000 + delta.microseconds, aware]}
+    raise TypeError("Values of type {} cannot be encoded as json".format(type(value).__name__))
+
+
+def _from_json(obj):
+    """
+    Object hook for the json decoder, which restores tagged datetimes and tuples
+    """
+    if len(obj) == 1:
+        if DATETIME_TAG in obj:
+            microseconds, aware = obj[DATETIME_TAG]
+            value = EPOCH + timedelta(microseconds=microseconds)
+            return value.replace(tzinfo=UTC) if aware else value
+        if TUPLE_TAG in obj:
+            return tuple(obj[TUPLE_TAG])
+    return obj
+
+
+_json_decoder = json.JSONDecoder(object_hook=_from_json)
+
+
+def value_to_json(value):
+    """
+    Encode a stream instance value as json. Besides the types that json supports, datetimes (which are stored in UTC)
+    and tuples are encoded so that they are restored by value_from_json.
+
+    :param value: The value
+    :return: The json string
+    :raises: TypeError if the value (or a value that it contains) is of another type
+    """
+    return _json_encoder.encode(_to_json(value))
+
+
+def value_from_json(data):
+    """
+    Decode a stream instance value encoded by value_to_json (or plain json)
+
+    :param data: The json string
+    :return: The value
+    """
+    return _json_decoder.decode(data)
@@ -18,5 +18,6 @@
 # DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR
 # OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE
 # OR OTHER DEALINGS IN THE SOFTWARE.
-from .histogram import histogram
+from .histogram import histogram, right_closed_histogram
 from .percentile import percentile
+from .arrays import to_array, list_sum, list_mean, percentiles, histogram_counts
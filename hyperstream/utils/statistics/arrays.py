@@ -0,0 +1,118 @@
+# The MIT License (MIT)
+# Copyright (c) 2014-2017 University of Bristol
+# 
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+# 
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+# 
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT.
+# IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM,
+# DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR
+# OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE
+# OR OTHER DEALINGS IN THE SOFTWARE.
+"""
+Vectorised statistics over windows of numeric values. If NumPy is installed the values are materialised as contiguous
+arrays and processed with NumPy kernels, otherwise (or if the values are not numeric) the pure-Python implementations
+are used. Set USE_NUMPY to False to force the pure-Python implementations.
+"""
+
+from .histogram import right_closed_histogram
+from .percentile import percentile
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+USE_NUMPY = np is not None
+
+# Array kinds (signed and unsigned integer, float) that are treated as numeric
+NUMERIC_KINDS = 'iuf'
+
+
+def to_array(values):
+    """
+    Materialise a window of values as a contiguous one-dimensional NumPy array. Nested lists are flattened.
+
+    :param values: The values
+    :return: The array, or None if NumPy is not available (or disabled) or the values are not numeric
+    """
+    if not USE_NUMPY or np is None:
+        return None
+    try:
+        arr = np.ascontiguousarray(values)
+    except (TypeError, ValueError):
+        return None
+    if arr.dtype.kind not in NUMERIC_KINDS:
+        return None
+    return arr.ravel()
+
+
+def list_sum(values):
+    """
+    The sum of the values
+
+    :param values: The values
+    :return: The sum
+    """
+    arr = to_array(values)
+    if arr is None:
+        return sum(values)
+    return arr.sum().item()
+
+
+def list_mean(values):
+    """
+    The mean of the values
+
+    :param values: The values
+    :return: The mean (None for an empty list)
+    """
+    if len(values) == 0:
+        return None
+    arr = to_array(values)
+    if arr is None:
+        return float(sum(values)) / len(values)
+    return arr.mean().item()
+
+
+def percentiles(values, q):
+    """
+    Compute the q-th percentile(s) of the values using linear interpolation (the same as percentile)
+
+    :param values: The values
+    :param q: Percentile or list of percentiles, in the range [0, 100]
+    :return: The percentile(s)
+    """
+    arr = to_array(values)
+    if arr is None or arr.size == 0:
+        return percentile(values, q)
+    if isinstance(q, (tuple, list)):
+        return np.percentile(arr, q).tolist()
+    return float(np.percentile(arr, q))
+
+
+def histogram_counts(values, bins):
+    """
+    Compute the histogram counts of the values, with the bins closed on the right (the same as right_closed_histogram)
+
+    :param values: The values
+    :param bins: The bin edges, increasing monotonically
+    :return: The counts, one fewer than the number of bin edges
+    """
+    arr = to_array(values)
+    if arr is None:
+        return right_closed_histogram(values, bins)[0]
+    edges = np.asarray(bins, dtype=float)
+    if np.any(np.diff(edges) < 0):
+        raise ValueError('bins must increase monotonically.')
+    n = np.searchsorted(np.sort(arr), edges, side='right')
+    return np.diff(n).tolist()
@@ -113,3 +113,31 @@ def histogram(a, bins):
     n = list(nl) + [nr]
 
     return diff(n), bins
+
+
+def right_closed_histogram(a, bins):
+    """
+    Compute the histogram of a set of data, with the bins closed on the right, i.e. the i-th count is the number of
+    values x with bins[i] < x <= bins[i + 1]. Unlike histogram, which is kept as it is so that the results of existing
+    tools do not change, every bin (including the last) is counted against its own edges.
+
+    :param a: Input data
+    :param bins: The bin edges, increasing monotonically
+    :type a: list | tuple
+    :type bins: list[int] | list[float]
+    :return: The counts and the bins
+    """
+    if any(y < x for x, y in zip(bins[:-1], bins[1:])):
+        raise ValueError(
+            'bins must increase monotonically.')
+
+    try:
+        sa = sorted(a)
+    except TypeError:
+        # Perhaps just a single value? Treat as a list and carry on
+        sa = sorted([a])
+
+    # Number of values less than or equal to each of the breaks
+    n = [bisect_right(sa, b) for b in bins]
+
+    return [y - x for x, y in zip(n[:-1], n[1:])], bins
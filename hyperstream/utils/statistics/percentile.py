@@ -58,7 +58,8 @@ def percentile(a, q):
     if isinstance(q, (float, int)):
         qq = [q]
     elif isinstance(q, (tuple, list)):
-        qq = q
+        # Copy, since the quantiles are rescaled in place below
+        qq = list(q)
     else:
         raise ValueError("Quantile type {} not understood".format(type(q)))
 
@@ -68,6 +68,21 @@ def datetime2unix(dt):
     return (dt - datetime(1970, 1, 1, tzinfo=UTC)).total_seconds()
 
 
+def datetime2ms(dt):
+    """
+    Convert a datetime to integer milliseconds since the epoch (HyperStream operates at millisecond precision)
+    """
+    delta = dt - datetime(1970, 1, 1, tzinfo=UTC)
+    return (delta.days * 86400 + delta.seconds) * 1000 + delta.microseconds // 1000
+
+
+def ms2datetime(ms):
+    """
+    Convert integer milliseconds since the epoch to a datetime
+    """
+    return datetime(1970, 1, 1, tzinfo=UTC) + timedelta(milliseconds=ms)
+
+
 def duration2str(x):
     minutes, seconds = divmod(x.total_seconds(), 60)
     return '{} min {} sec'.format(int(minutes), int(seconds))
@@ -21,3 +21,4 @@
 
 from .workflow import Workflow
 from .workflow_manager import WorkflowManager
+from .scheduler import WorkflowScheduler, ExecutionReport
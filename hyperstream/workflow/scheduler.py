@@ -0,0 +1,296 @@
+# The MIT License (MIT)
+# Copyright (c) 2014-2017 University of Bristol
+#
+# Permission is hereby granted, free of charge, to any person obtaining a copy
+# of this software and associated documentation files (the "Software"), to deal
+# in the Software without restriction, including without limitation the rights
+# to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+# copies of the Software, and to permit persons to whom the Software is
+# furnished to do so, subject to the following conditions:
+#
+# The above copyright notice and this permission notice shall be included in all
+# copies or substantial portions of the Software.
+#
+# THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+# EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+# MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT.
+# IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM,
+# DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR
+# OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE
+# OR OTHER DEALINGS IN THE SOFTWARE.
+"""
+Dependency-aware scheduling of the factors in a workflow.
+"""
+
+import logging
+import sys
+import time
+from collections import namedtuple
+from multiprocessing.pool import ThreadPool
+
+from six import reraise
+from six.moves import queue
+
+from ..factor import Factor, MultiOutputFactor, NodeCreationFactor
+from ..utils import Printable
+
+
+class ExecutionReport(namedtuple("ExecutionReport", "wall_time factor_times critical_path critical_path_time")):
+    """
+    Timing information for a single run of a workflow.
+
+    wall_time: The total elapsed time (seconds)
+    factor_times: The (factor id, elapsed time) of each factor that was executed, in definition order
+    critical_path: The factor ids on the longest chain of dependent factors, from upstream to downstream
+    critical_path_time: The summed elapsed time of the factors on the critical path (seconds)
+    """
+    __slots__ = ()
+
+
+class WorkflowScheduler(Printable):
+    """
+    Executes the factors of a workflow in dependency order. Each factor is executed exactly once per requested time
+    interval, after all of the factors that produce its inputs, so upstream computations are no longer triggered
+    (and re-checked) through the recursion in StreamView. Independent branches of the graph are executed
+    concurrently when max_workers is set.
+    """
+    def __init__(self, factors, max_workers=None):
+        """
+        Initialise the scheduler
+
+        :param factors: The factors of the workflow (in definition order)
+        :param max_workers: The number of threads used to execute independent factors (None for serial execution)
+        :type factors: list[Factor | MultiOutputFactor | NodeCreationFactor]
+        :type max_workers: int | None
+        """
+        self.factors = list(factors)
+        self.max_workers = max_workers
+        self.dependencies = self.build_graph(self.factors)
+
+    @staticmethod
+    def input_nodes(factor):
+        """
+        The nodes that are read by a factor
+
+        :param factor: The factor
+        :return: The input nodes
+        """
+        if isinstance(factor, Factor):
+            nodes = list(factor.sources)
+            if factor.alignment_node:
+                nodes.append(factor.alignment_node)
+            return nodes
+        if isinstance(factor, MultiOutputFactor):
+            return [n for n in (factor.source, factor.splitting_node) if n is not None]
+        if isinstance(factor, NodeCreationFactor):
+            return [factor.source] if factor.source is not None else []
+        raise TypeError("Unknown factor type {}".format(type(factor)))
+
+    @staticmethod
+    def node_plate_ids(node):
+        """
+        The ids of the plates (including ancestor plates) that a node lives on
+
+        :param node: The node
+        :return: The set of plate ids
+        """
+        return set(plate_id for plate in node.plates for plate_id in plate.ancestor_plate_ids)
+
+    @classmethod
+    def build_graph(cls, factors):
+        """
+        Build the dependency graph of the factors. A factor depends on the factors that produce its input nodes, and
+        on any node creation factor that creates a plate that its nodes live on.
+
+        :param factors: The factors
+        :return: For each factor, the set of indices of the factors that it depends on
+        :rtype: list[set[int]]
+        """
+        producers = {}
+        plate_creators = {}
+        for i, factor in enumerate(factors):
+            if factor.sink is not None:
+                producers[factor.sink.node_id] = i
+            if isinstance(factor, NodeCreationFactor):
+                plate_creators[factor.output_plate["plate_id"]] = i
+
+        dependencies = []
+        for i, factor in enumerate(factors):
+            nodes = cls.input_nodes(factor)
+            deps = set(producers[n.node_id] for n in nodes if n.node_id in producers)
+
+            if plate_creators:
+                if factor.sink is not None:
+                    nodes = nodes + [factor.sink]
+                for node in nodes:
+                    deps.update(plate_creators[p] for p in cls.node_plate_ids(node) if p in plate_creators)
+
+            deps.discard(i)
+            dependencies.append(deps)
+        return dependencies
+
+    def ancestors(self, indices):
+        """
+        The given factors together with all of the factors that they (transitively) depend on
+
+        :param indices: The indices of the factors
+        :return: The set of indices
+        """
+        result = set()
+        stack = list(indices)
+        while stack:
+            i = stack.pop()
+            if i not in result:
+                result.add(i)
+                stack.extend(self.dependencies[i])
+        return result
+
+    def topological_order(self, indices=None):
+        """
+        Get a topological ordering of the factors, with ties broken by definition order
+
+        :param indices: The subset of factors to order (defaults to all)
+        :return: The ordered factor indices
+        """
+        if indices is None:
+            indices = range(len(self.factors))
+        indices = set(indices)
+        remaining = dict((i, self.dependencies[i] & indices) for i in indices)
+        order = []
+        while remaining:
+            ready = sorted(i for i, deps in remaining.items() if not deps)
+            if not ready:
+                raise ValueError("Cycle detected between factors {}".format(
+                    [self.factors[i].factor_id for i in sorted(remaining)]))
+            for i in ready:
+                del remaining[i]
+            for deps in remaining.values():
+                deps.difference_update(ready)
+            order.extend(ready)
+        return order
+
+    def execute(self, time_interval):
+        """
+        Execute all of the factors over the given time interval. Asset writers (and the factors upstream of them) are
+        executed first, since other factors may read the assets they write without an explicit link in the graph.
+
+        :param time_interval: The time interval
+        :return: The timing report for this run
+        :rtype: ExecutionReport
+        """
+        start = time.time()
+        factor_times = {}
+
+        asset_writers = [i for i, f in enumerate(self.factors) if f.tool.name == "asset_writer"]
+        first = self.ancestors(asset_writers)
+        rest = set(range(len(self.factors))) - first
+
+        for indices in (first, rest):
+            if not indices:
+                continue
+            if self.max_workers:
+                self._execute_concurrent(indices, time_interval, factor_times)
+            else:
+                for i in self.topological_order(indices):
+                    factor_times[i] = self._execute_factor(i, time_interval)
+
+        critical_path, critical_path_time = self.critical_path(factor_times)
+        report = ExecutionReport(
+            wall_time=time.time() - start,
+            factor_times=[(self.factors[i].factor_id, factor_times[i]) for i in sorted(factor_times)],
+            critical_path=[self.factors[i].factor_id for i in critical_path],
+            critical_path_time=critical_path_time
+        )
+        logging.info("Workflow executed in {:.3f}s, critical path {:.3f}s through {}".format(
+            report.wall_time, report.critical_path_time, report.critical_path))
+        return report
+
+    def _execute_factor(self, i, time_interval):
+        start = time.time()
+        self.factors[i].execute(time_interval)
+        return time.time() - start
+
+    def _execute_concurrent(self, indices, time_interval, factor_times):
+        """
+        Execute the given factors on a thread pool. Each factor is submitted as soon as all of the factors it depends on
+        have completed. If a factor fails, no further factors are submitted, and the exception is re-raised once the
+        factors that are already running have finished, so that none of them are still writing to their streams when
+        this returns.
+
+        :param indices: The indices of the factors to execute
+        :param time_interval: The time interval
+        :param factor_times: Dictionary that is populated with the elapsed time of each factor
+        :return: None
+        """
+        remaining = dict((i, self.dependencies[i] & indices) for i in indices)
+        dependents = dict((i, []) for i in indices)
+        for i, deps in remaining.items():
+            for d in deps:
+                dependents[d].append(i)
+
+        completed = queue.Queue()
+
+        def run(i):
+            try:
+                completed.put((i, self._execute_factor(i, time_interval), None))
+            except Exception:
+                completed.put((i, None, sys.exc_info()))
+
+        pool = ThreadPool(self.max_workers)
+        failure = None
+        try:
+            running = 0
+            for i in sorted(i for i, deps in remaining.items() if not deps):
+                del remaining[i]
+                pool.apply_async(run, (i,))
+                running += 1
+
+            while running:
+                i, elapsed, exc_info = completed.get()
+                running -= 1
+                if exc_info is not None:
+                    if failure is None:
+                        failure = exc_info
+                    continue
+                factor_times[i] = elapsed
+                if failure is not None:
+                    continue
+                for j in dependents[i]:
+                    remaining[j].discard(i)
+                    if not remaining[j]:
+                        del remaining[j]
+                        pool.apply_async(run, (j,))
+                        running += 1
+        finally:
+            # No need to join: all submitted factors have completed (or failed) by now, and joining the pool waits on
+            # its internal polling loop
+            pool.close()
+
+        if failure is not None:
+            reraise(*failure)
+
+    def critical_path(self, factor_times):
+        """
+        Find the chain of dependent factors with the largest total execution time
+
+        :param factor_times: The elapsed time of each factor, keyed by index
+        :return: The factor indices on the critical path and its total time
+        """
+        finish = {}
+        previous = {}
+        for i in self.topological_order(factor_times.keys()):
+            deps = [d for d in self.dependencies[i] if d in finish]
+            before = max(deps, key=lambda d: finish[d]) if deps else None
+            finish[i] = factor_times[i] + (finish[before] if before is not None else 0.0)
+            previous[i] = before
+
+        if not finish:
+            return [], 0.0
+
+        i = max(finish, key=lambda k: finish[k])
+        total = finish[i]
+        path = []
+        while i is not None:
+            path.append(i)
+            i = previous[i]
+        return path[::-1], total
@@ -35,6 +35,7 @@ from ..tool import BaseTool, Tool, MultiOutputTool, AggregateTool, SelectorTool,
 from ..utils import Printable, IncompatiblePlatesError, FactorDefinitionError, NodeDefinitionError, utcnow
 from ..models import TimeIntervalModel, WorkflowStatusModel
 from ..time_interval import TimeIntervals, TimeInterval
+from .scheduler import WorkflowScheduler
 
 
 class Workflow(Printable):
@@ -42,7 +43,7 @@ class Workflow(Printable):
     Workflow.
     This defines the graph of operations through "nodes" and "factors".
     """
-    def __init__(self, workflow_id, name, description, owner, online=False, monitor=False):
+    def __init__(self, workflow_id, name, description, owner, online=False, monitor=False, max_workers=None):
 
         """
         Initialise the workflow
@@ -53,6 +54,9 @@ class Workflow(Printable):
         :param owner: The owner/author of the workflow
         :param online: Whether this workflow should be executed by the online engine
         :param monitor: Whether to log monitoring messages for this workflow
+        :param max_workers: The number of threads used to execute independent factors, and the default number of
+        threads each factor uses to execute over its plate values (None for serial execution). See WorkflowScheduler
+        and Factor.execute_tool
         """
         self.workflow_id = workflow_id
         self.name = name
@@ -62,6 +66,8 @@ class Workflow(Printable):
         self.factors = []
         self.online = online
         self.monitor = monitor
+        self._max_workers = max_workers
+        self.execution_report = None
 
         self._hyperstream = None
 
@@ -87,8 +93,8 @@ class Workflow(Printable):
     def execute(self, time_interval):
         """
         Here we execute the factors over the streams in the workflow
-        Execute the factors in reverse order. We can't just execute the last factor because there may be multiple
-        "leaf" factors that aren't triggered by upstream computations.
+        The factors are executed in dependency order by the WorkflowScheduler, so that each factor is executed once,
+        after all of its upstream factors. Timing information for the run is stored in execution_report.
 
         :param time_interval: The time interval to execute this workflow over
         """
@@ -97,14 +103,27 @@ class Workflow(Printable):
         # if not self._hyperstream:
         #     raise ValueError("")
         with WorkflowMonitor(self):
-            # First look for asset writers
-            for factor in self.factors[::-1]:
-                if factor.tool.name == "asset_writer":
-                    factor.execute(time_interval)
+            scheduler = WorkflowScheduler(self.factors, max_workers=self.max_workers)
+            self.execution_report = scheduler.execute(time_interval)
 
-            for factor in self.factors[::-1]:
-                if factor.sink is None or factor.sink.is_leaf and factor.tool.name != "asset_writer":
-                    factor.execute(time_interval)
+    @property
+    def max_workers(self):
+        """
+        The default number of threads used by the factors of this workflow
+        """
+        return self._max_workers
+
+    @max_workers.setter
+    def max_workers(self, value):
+        """
+        Set the number of threads used by all of the factors of this workflow. Individual factors can be overridden
+        afterwards by setting their own max_workers
+
+        :param value: The number of threads (None for serial execution)
+        """
+        self._max_workers = value
+        for factor in self.factors:
+            factor.max_workers = value
 
     def _add_node(self, node):
         """
@@ -125,6 +144,8 @@ class Workflow(Printable):
         :type factor: Factor | MultiOutputFactor | NodeCreationFactor
         :return: None
         """
+        if factor.max_workers is None:
+            factor.max_workers = self.max_workers
         self.factors.append(factor)
         logging.info("Added factor with tool {} ".format(factor.tool))
 
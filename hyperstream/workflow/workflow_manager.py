@@ -27,7 +27,9 @@ except ImportError:
     import copyreg as copy_reg
 
 import marshal
+import threading
 import types
+from collections import namedtuple, OrderedDict
 from copy import deepcopy
 
 from mongoengine.context_managers import switch_db
@@ -53,30 +55,193 @@ def code_pickler(code):
 copy_reg.pickle(types.CodeType, code_pickler, code_unpickler)
 
 
+class WorkflowSummary(namedtuple("WorkflowSummary", "workflow_id name online monitor")):
+    """
+    The fields of a workflow definition that are needed without building the workflow
+    """
+    __slots__ = ()
+
+
+class WorkflowDict(FrozenKeyDict):
+    """
+    Dictionary of workflows keyed by workflow id. The workflows defined in the database are indexed up front, but each
+    workflow is only built (using the loader) when it is first accessed. Iterating over the keys does not build any
+    workflows, whereas iterating over the values builds all of them.
+    If max_size is given, only the most recently used workflows are kept in memory, and evicted workflows are built
+    again when they are next accessed. Only workflows that have been committed to the database can be evicted.
+    """
+    def __init__(self, loader, max_size=None):
+        """
+        Initialise the dictionary
+
+        :param loader: Function that takes a workflow id and builds the workflow. It should raise KeyError if the
+        workflow cannot be built.
+        :param max_size: The maximum number of workflows to hold in memory (None for no limit)
+        """
+        super(WorkflowDict, self).__init__()
+        self.loader = loader
+        self.max_size = max_size
+        self.definitions = OrderedDict()
+        self._recent = OrderedDict()
+        self._lock = threading.RLock()
+
+    def index(self, summary):
+        """
+        Add a workflow definition to the index
+
+        :param summary: The summary of the workflow definition
+        :type summary: WorkflowSummary
+        :return: None
+        """
+        self.definitions[summary.workflow_id] = summary
+
+    @property
+    def num_loaded(self):
+        """
+        The number of workflows held in memory
+        """
+        return dict.__len__(self)
+
+    def is_loaded(self, workflow_id):
+        """
+        Whether the workflow is held in memory
+
+        :param workflow_id: The workflow id
+        :return: True if the workflow has been built and not evicted
+        """
+        return dict.__contains__(self, workflow_id)
+
+    def is_online(self, workflow_id):
+        """
+        Whether the workflow is online, without building it
+
+        :param workflow_id: The workflow id
+        :return: True if the workflow is online
+        """
+        if self.is_loaded(workflow_id):
+            return dict.__getitem__(self, workflow_id).online
+        return self.definitions[workflow_id].online
+
+    def _touch(self, workflow_id):
+        if self.max_size is not None:
+            self._recent.pop(workflow_id, None)
+            self._recent[workflow_id] = None
+
+    def _evict(self):
+        if self.max_size is None:
+            return
+        excess = dict.__len__(self) - self.max_size
+        # The most recently used workflow is never evicted, since it has just been requested
+        for workflow_id in list(self._recent)[:-1]:
+            if excess <= 0:
+                break
+            if workflow_id in self.definitions:
+                dict.__delitem__(self, workflow_id)
+                del self._recent[workflow_id]
+                excess -= 1
+
+    def __getitem__(self, workflow_id):
+        with self._lock:
+            if self.is_loaded(workflow_id):
+                self._touch(workflow_id)
+                return dict.__getitem__(self, workflow_id)
+            if workflow_id not in self.definitions:
+                raise KeyError(workflow_id)
+            try:
+                workflow = self.loader(workflow_id)
+            except KeyError:
+                # The workflow can't be built, so stop advertising it
+                del self.definitions[workflow_id]
+                raise
+            self[workflow_id] = workflow
+            return workflow
+
+    def __setitem__(self, workflow_id, workflow):
+        with self._lock:
+            if self.is_loaded(workflow_id):
+                super(WorkflowDict, self).__setitem__(workflow_id, workflow)
+            else:
+                dict.__setitem__(self, workflow_id, workflow)
+            self._touch(workflow_id)
+            self._evict()
+
+    def __delitem__(self, workflow_id):
+        with self._lock:
+            if workflow_id not in self:
+                raise KeyError(workflow_id)
+            if self.is_loaded(workflow_id):
+                dict.__delitem__(self, workflow_id)
+            self.definitions.pop(workflow_id, None)
+            self._recent.pop(workflow_id, None)
+
+    def __contains__(self, workflow_id):
+        return self.is_loaded(workflow_id) or workflow_id in self.definitions
+
+    def __iter__(self):
+        return iter(self.keys())
+
+    def __len__(self):
+        return len(self.keys())
+
+    def keys(self):
+        return list(self.definitions) + [k for k in dict.keys(self) if k not in self.definitions]
+
+    def values(self):
+        return [self[k] for k in self.keys()]
+
+    def items(self):
+        return [(k, self[k]) for k in self.keys()]
+
+    def iterkeys(self):
+        return iter(self.keys())
+
+    def itervalues(self):
+        return iter(self.values())
+
+    def iteritems(self):
+        return iter(self.items())
+
+    def get(self, workflow_id, default=None):
+        try:
+            return self[workflow_id]
+        except KeyError:
+            return default
+
+
 class WorkflowManager(Printable):
     """
     Workflow manager. Responsible for reading and writing workflows to the database, and can execute all of the
     workflows
     """
 
-    def __init__(self, channel_manager, plate_manager):
+    def __init__(self, channel_manager, plate_manager, max_workflows=None):
         """
-        Initialise the workflow object
+        Initialise the workflow object. The workflow definitions are indexed, but the workflows are only built when they
+        are first accessed.
         :param channel_manager: The channel manager
         :param plate_manager: The plate manager
+        :param max_workflows: The maximum number of workflows to hold in memory (None for no limit)
         """
         self.channel_manager = channel_manager
         self.plate_manager = plate_manager
 
-        self.workflows = FrozenKeyDict()
+        self.workflows = WorkflowDict(loader=self._build_workflow, max_size=max_workflows)
         self.uncommitted_workflows = set()
 
         with switch_db(WorkflowDefinitionModel, db_alias='hyperstream'):
-            for workflow_definition in WorkflowDefinitionModel.objects():
-                try:
-                    self.load_workflow(workflow_definition.workflow_id)
-                except (StreamNotFoundError, ToolInitialisationError, ToolNotFoundError, IncompatibleToolError) as e:
-                    logging.warn(str(e))
+            for workflow_definition in WorkflowDefinitionModel.objects.only(*WorkflowSummary._fields):
+                self.workflows.index(self.summarise(workflow_definition))
+
+    @staticmethod
+    def summarise(workflow):
+        """
+        Get the summary of a workflow or workflow definition
+
+        :param workflow: The workflow or workflow definition
+        :type workflow: Workflow | WorkflowDefinitionModel
+        :return: The summary
+        """
+        return WorkflowSummary(*(getattr(workflow, field) for field in WorkflowSummary._fields))
 
     def load_workflow(self, workflow_id):
         """
@@ -84,10 +249,34 @@ class WorkflowManager(Printable):
         :param workflow_id: The workflow id
         :return: The workflow
         """
+        if workflow_id not in self.workflows:
+            with switch_db(WorkflowDefinitionModel, db_alias='hyperstream'):
+                workflow_definition = WorkflowDefinitionModel.objects.only(*WorkflowSummary._fields).get(
+                    workflow_id=workflow_id)
+            self.workflows.index(self.summarise(workflow_definition))
+        return self.workflows[workflow_id]
+
+    def _build_workflow(self, workflow_id):
+        """
+        Build the workflow, as the loader of the workflow dictionary. Workflows that can't be built are logged and
+        reported as missing.
+        :param workflow_id: The workflow id
+        :return: The workflow
+        """
+        try:
+            return self.build_workflow(workflow_id)
+        except (StreamNotFoundError, ToolInitialisationError, ToolNotFoundError, IncompatibleToolError) as e:
+            logging.warn(str(e))
+            raise KeyError(workflow_id)
+
+    def build_workflow(self, workflow_id):
+        """
+        Build the workflow from its definition in the database
+        :param workflow_id: The workflow id
+        :return: The workflow
+        """
         with switch_db(WorkflowDefinitionModel, db_alias='hyperstream'):
             workflow_definition = WorkflowDefinitionModel.objects.get(workflow_id=workflow_id)
-            if not workflow_definition:
-                logging.warn("Attempted to load workflow with id {}, but not found".format(workflow_id))
 
             workflow = Workflow(
                 workflow_id=workflow_id,
@@ -95,7 +284,8 @@ class WorkflowManager(Printable):
                 description=workflow_definition.description,
                 owner=workflow_definition.owner,
                 online=workflow_definition.online,
-                monitor=workflow_definition.monitor
+                monitor=workflow_definition.monitor,
+                max_workers=workflow_definition.max_workers
             )
 
             for n in workflow_definition.nodes:
@@ -187,7 +377,7 @@ class WorkflowManager(Printable):
                 else:
                     raise NotImplementedError("Unsupported factor type {}".format(f.factor_type))
 
-            self.add_workflow(workflow, False)
+            logging.info("Built workflow {}".format(workflow_id))
             return workflow
 
     def add_workflow(self, workflow, commit=False):
@@ -321,7 +511,8 @@ class WorkflowManager(Printable):
                 factors=factors,
                 owner=workflow.owner,
                 online=workflow.online,
-                monitor=workflow.monitor
+                monitor=workflow.monitor,
+                max_workers=workflow.max_workers
             )
 
             workflow_definition.save()
@@ -336,6 +527,7 @@ class WorkflowManager(Printable):
 
             workflow_status.save()
 
+        self.workflows.index(self.summarise(workflow))
         self.uncommitted_workflows.remove(workflow_id)
         logging.info("Committed workflow {} to database".format(workflow_id))
 
@@ -344,7 +536,7 @@ class WorkflowManager(Printable):
         Commit all workflows to the database
         :return: None
         """
-        for workflow_id in self.uncommitted_workflows:
+        for workflow_id in list(self.uncommitted_workflows):
             self.commit_workflow(workflow_id)
 
     def execute_all(self):
@@ -352,10 +544,11 @@ class WorkflowManager(Printable):
         Execute all workflows
         """
         for workflow_id in self.workflows:
-            if self.workflows[workflow_id].online:
-                for interval in self.workflows[workflow_id].requested_intervals:
+            if self.workflows.is_online(workflow_id):
+                workflow = self.workflows[workflow_id]
+                for interval in workflow.requested_intervals:
                     logging.info("Executing workflow {} over interval {}".format(workflow_id, interval))
-                    self.workflows[workflow_id].execute(interval)
+                    workflow.execute(interval)
                     # self.workflows[workflow_id].requested_intervals -= interval
 
     def set_requested_intervals(self, workflow_id, requested_intervals):
@@ -379,5 +572,5 @@ class WorkflowManager(Printable):
         :type requested_intervals: TimeIntervals
         """
         for workflow_id in self.workflows:
-            if self.workflows[workflow_id].online:
+            if self.workflows.is_online(workflow_id):
                 self.workflows[workflow_id].requested_intervals = requested_intervals
@@ -42,5 +42,6 @@ setup(
    url="https://irc-sphere.github.io/HyperStream/",
    packages=packages,
    install_requires=required,
+   extras_require={'numpy': ['numpy'], 'parquet': ['pyarrow']},
    scripts=[]
 )
@@ -19,10 +19,24 @@
 #  OR OTHER DEALINGS IN THE SOFTWARE.
 
 import unittest
+import os
+import shutil
 import sys
+import tempfile
+import threading
+from mongoengine import NotUniqueError
+from mongoengine.context_managers import switch_db
 
-from hyperstream import Stream, StreamId, TimeInterval, StreamAlreadyExistsError, StreamNotFoundError
-from hyperstream.utils import MIN_DATE, utcnow
+from hyperstream import Stream, StreamId, StreamInstance, StreamInstanceBatch, TimeInterval, TimeIntervals, \
+    StreamAlreadyExistsError, StreamNotFoundError
+from hyperstream.channels import MemoryChannel, ToolChannel, DatabaseChannel, ColumnarFileChannel, LogFileChannel, \
+    ReadCache, BucketedDatabaseChannel
+from hyperstream.channels.columnar_file_channel import pq
+from hyperstream.channels.file_channel import DirectoryManifest
+from hyperstream.client import Client
+from hyperstream.migrations import migrate_stream_keys
+from hyperstream.models import StreamInstanceModel, StreamBucketModel
+from hyperstream.utils import MIN_DATE, utcnow, datetime2ms, ToolContainer, prefetched
 from .helpers import *
 
 
@@ -95,3 +109,538 @@ class TestChannels(unittest.TestCase):
             dummy_tool.execute(sources=[ticker], sink=ticker_copy, interval=ti)
 
             assert (all(map(lambda pair: pair[0].value == pair[1].value, zip(ticker.window(), ticker_copy.window()))))
+
+    def test_database_channel_bulk_write(self):
+        with HyperStream(file_logger=False, console_logger=False, mqtt_logger=None) as hs:
+            D = hs.channel_manager.mongo
+            sid = StreamId(sys._getframe().f_code.co_name)
+            if sid in D:
+                D.purge_stream(sid, remove_definition=True)
+            stream = D.create_stream(sid)
+
+            # Window starts are exclusive, so the instances start after t1
+            instances = [StreamInstance(t1 + i * second, i) for i in range(1, 11)]
+            D.write_in_batches(stream, iter(instances))
+            self.assertListEqual(stream.window((t1, t1 + hour)).items(), instances)
+
+            # Writing the same values again is fine, but different values should raise
+            D.write_in_batches(stream, iter(instances))
+            self.assertRaises(NotUniqueError, stream.writer, [StreamInstance(t1 + second, -1)])
+
+            D.purge_stream(sid, remove_definition=True)
+
+    def test_database_channel_raw_reads(self):
+        with HyperStream(file_logger=False, console_logger=False, mqtt_logger=None) as hs:
+            D = hs.channel_manager.mongo
+            sid = StreamId(sys._getframe().f_code.co_name)
+            if sid in D:
+                D.purge_stream(sid, remove_definition=True)
+            stream = D.create_stream(sid)
+            stream.writer([StreamInstance(t1 + i * second, {'x': i}) for i in range(10)])
+            ti = TimeInterval(t1, t1 + hour)
+
+            raw_reads, read_batch_size = D.raw_reads, D.read_batch_size
+            try:
+                D.raw_reads = False
+                expected = list(D.get_results(stream, ti))
+                D.raw_reads, D.read_batch_size = True, 3
+                self.assertListEqual(list(D.get_results(stream, ti)), expected)
+            finally:
+                D.raw_reads, D.read_batch_size = raw_reads, read_batch_size
+                D.purge_stream(sid, remove_definition=True)
+
+    def test_database_channel_stream_keys(self):
+        with HyperStream(file_logger=False, console_logger=False, mqtt_logger=None) as hs:
+            D = hs.channel_manager.mongo
+            sid = StreamId(sys._getframe().f_code.co_name, meta_data=(("a", "1"), ("b", "2")))
+            if sid in D:
+                D.purge_stream(sid, remove_definition=True)
+            stream = D.create_stream(sid)
+            ti = TimeInterval(t1, t1 + hour)
+            try:
+                # The key does not depend on the order of the meta data
+                self.assertEqual(sid.key, StreamId(sid.name, meta_data=(("b", "2"), ("a", "1"))).key)
+                self.assertNotEqual(sid.key, StreamId(sid.name).key)
+
+                # Instances written without a key are only found by keyed channels once they have been migrated
+                stream.writer([StreamInstance(t1 + i * second, i) for i in range(1, 6)])
+                with switch_db(StreamInstanceModel, 'hyperstream'):
+                    StreamInstanceModel._get_collection().insert_many(
+                        [dict(stream_id=sid.as_dict(), datetime=t1 + i * second, value=i) for i in (10, 20)])
+                self.assertTrue(DatabaseChannel.has_unkeyed_instances())
+                self.assertListEqual(stream.window(ti).values(), [1, 2, 3, 4, 5])
+                unkeyed = DatabaseChannel("unkeyed", keyed=False)
+                self.assertListEqual([v for _, v in unkeyed.get_results(stream, ti)], [1, 2, 3, 4, 5, 10, 20])
+
+                # Rewrites that clash with an instance without a key are checked against it, and give it its key
+                with switch_db(StreamInstanceModel, 'hyperstream'):
+                    self.assertRaises(NotUniqueError, D._check_duplicates, stream,
+                                      [dict(datetime=t1 + 10 * second, value=-1)])
+                    D._check_duplicates(stream, [dict(datetime=t1 + 10 * second, value=10)])
+
+                self.assertEqual(migrate_stream_keys(), 1)
+                self.assertEqual(migrate_stream_keys(), 0)
+                self.assertFalse(DatabaseChannel.has_unkeyed_instances())
+                self.assertTrue(DatabaseChannel.stream_keys_migrated())
+                # The migrated instance was not written through the channel, so any cached reads are out of date
+                D.invalidate_cache(sid)
+                self.assertListEqual(stream.window(ti).values(), [1, 2, 3, 4, 5, 10, 20])
+                self.assertListEqual(stream.window(ti).timestamps(),
+                                     [t1 + i * second for i in (1, 2, 3, 4, 5, 10, 20)])
+            finally:
+                D.purge_stream(sid, remove_definition=True)
+
+    def test_database_channel_explain(self):
+        with HyperStream(file_logger=False, console_logger=False, mqtt_logger=None) as hs:
+            D = hs.channel_manager.mongo
+            if Client.is_mock(hs.config.mongo):
+                self.skipTest("mongomock does not support explain")
+            sid = StreamId(sys._getframe().f_code.co_name)
+            if sid in D:
+                D.purge_stream(sid, remove_definition=True)
+            stream = D.create_stream(sid)
+            stream.writer([StreamInstance(t1 + i * second, i) for i in range(100)])
+            ti = TimeInterval(t1 + 10 * second, t1 + 20 * second)
+
+            def stages(plan):
+                # The stages of a query plan, from the root down
+                while plan:
+                    yield plan
+                    plan = plan.get('inputStage')
+
+            try:
+                # Window queries are range scans of the (stream_key, datetime) index
+                explain = D.explain(stream, ti)
+                plan = list(stages(explain['queryPlanner']['winningPlan']))
+                self.assertNotIn('COLLSCAN', [s['stage'] for s in plan])
+                scan = plan[-1]
+                self.assertEqual(scan['stage'], 'IXSCAN')
+                self.assertEqual(scan['indexName'], 'stream_key_1_datetime_1')
+                self.assertEqual(len(scan['indexBounds']['stream_key']), 1)
+
+                # Timestamp queries are covered by the index, so no documents are fetched
+                explain = D.explain(stream, ti, fields=('datetime',))
+                self.assertNotIn('FETCH', [s['stage'] for s in stages(explain['queryPlanner']['winningPlan'])])
+            finally:
+                D.purge_stream(sid, remove_definition=True)
+
+    def test_bucketed_database_channel(self):
+        with HyperStream(file_logger=False, console_logger=False, mqtt_logger=None):
+            B = BucketedDatabaseChannel("test_buckets", bucket_size=minute)
+            sid = StreamId(sys._getframe().f_code.co_name)
+            if sid in B:
+                B.purge_stream(sid, remove_definition=True)
+            stream = B.create_stream(sid)
+            instances = [StreamInstance(t1 + i * second, {'x': i}) for i in range(1, 151)]
+            try:
+                # Writes that go back in time and rewrites of the same values are fine
+                stream.writer(instances[100:])
+                stream.writer(instances[:100])
+                stream.writer(instances[90:110])
+                self.assertRaises(NotUniqueError, stream.writer, [StreamInstance(t1 + second, {'x': -1})])
+                with switch_db(StreamBucketModel, 'hyperstream'):
+                    buckets = StreamBucketModel.objects(stream_key=sid.key).order_by('start')
+                    self.assertListEqual([b.count for b in buckets], [59, 60, 31])
+
+                # Windows only unpack the overlapping buckets
+                self.assertListEqual(stream.window((t1, t1 + hour)).items(), instances)
+                ti = TimeInterval(t1 + 58 * second, t1 + 61 * second)
+                self.assertListEqual(stream.window(ti).items(), instances[58:61])
+                self.assertListEqual(stream.window(ti).batch().values, [{'x': 59}, {'x': 60}, {'x': 61}])
+                self.assertListEqual(stream.window(ti).timestamps(), [t1 + i * second for i in (59, 60, 61)])
+                self.assertListEqual(stream.window((t1 + hour, t1 + 2 * hour)).items(), [])
+
+                B.purge_stream(sid)
+                self.assertListEqual(stream.window((t1, t1 + hour)).items(), [])
+            finally:
+                B.purge_stream(sid, remove_definition=True)
+
+    def test_database_channel_lazy_streams(self):
+        with HyperStream(file_logger=False, console_logger=False, mqtt_logger=None) as hs:
+            D = hs.channel_manager.mongo
+            sids = [StreamId(sys._getframe().f_code.co_name, meta_data=(("index", str(i)),)) for i in range(3)]
+            for sid in sids:
+                if sid in D:
+                    D.purge_stream(sid, remove_definition=True)
+                D.create_stream(sid)
+            try:
+                # A new channel only fetches the definitions that are requested
+                L = DatabaseChannel(D.channel_id, max_streams=2)
+                self.assertEqual(L.streams.num_loaded, 0)
+                self.assertIn(sids[0], L.streams)
+                self.assertEqual(L.streams.num_loaded, 1)
+                self.assertEqual(L.streams[sids[0]].stream_id, sids[0])
+                self.assertNotIn(StreamId("not_a_stream"), L.streams)
+
+                # Only the most recently used streams are kept
+                L.streams[sids[1]]
+                L.streams[sids[2]]
+                self.assertEqual(L.streams.num_loaded, 2)
+                self.assertIn(sids[0], L.streams)
+                self.assertNotIn(sids[1], L.streams._store)
+
+                self.assertRaises(StreamAlreadyExistsError, L.create_stream, sids[1])
+                self.assertTrue(set(sids) <= set(L.streams.keys()))
+                self.assertLessEqual(L.streams.num_loaded, 2)
+
+                # Listing the stream ids does not fetch the streams
+                other = DatabaseChannel(D.channel_id)
+                self.assertGreaterEqual(len(other.streams), 3)
+                self.assertTrue(set(sids) <= set(other.streams))
+                self.assertEqual(other.streams.num_loaded, 0)
+
+                # An evicted stream that is still referenced is handed out again, rather than a second copy
+                referenced = L.streams[sids[0]]
+                L.streams[sids[1]]
+                L.streams[sids[2]]
+                self.assertNotIn(sids[0], L.streams._store)
+                self.assertIs(L.streams[sids[0]], referenced)
+                self.assertTrue(all(L.streams[sid] is stream for sid, stream in L.streams.items() if sid in sids))
+                self.assertIs(dict(L.streams.items())[sids[0]], referenced)
+
+                # Streams that are not found are not fetched again
+                loaded = []
+                loader, L.streams.loader = L.streams.loader, lambda sid: loaded.append(sid) or loader(sid)
+                self.assertNotIn(StreamId("not_a_stream"), L.streams)
+                self.assertListEqual(loaded, [])
+            finally:
+                for sid in sids:
+                    D.purge_stream(sid, remove_definition=True)
+
+    @unittest.skipIf(pq is None, "pyarrow is not installed")
+    def test_columnar_file_channel(self):
+        with HyperStream(file_logger=False, console_logger=False, mqtt_logger=None):
+            path = tempfile.mkdtemp()
+            C = ColumnarFileChannel("test_columnar", path, partition_size=hour, row_group_size=100)
+            sid = StreamId(sys._getframe().f_code.co_name, meta_data=(("sensor", "1"),))
+            if sid in C:
+                C.purge_stream(sid, remove_definition=True)
+            stream = C.create_stream(sid)
+            try:
+                # Three hours of readings at one second intervals, written in two batches
+                instances = [StreamInstance(t1 + i * second, {'x': i, 'y': -i}) for i in range(1, 3 * 3600 + 1)]
+                C.write_in_batches(stream, instances[5000:])
+                C.write_in_batches(stream, instances[:5000])
+                self.assertEqual(len(C.get_files(sid)), 5)
+
+                # Only the files of the partitions that overlap the window are read
+                ti = TimeInterval(t1 + hour + 10 * second, t1 + hour + 20 * second)
+                start, end = datetime2ms(ti.start), datetime2ms(ti.end)
+                self.assertEqual(len(C.get_files(sid, start, end)), 1)
+                self.assertListEqual(list(C.get_results(stream, ti)), instances[3610:3620])
+                self.assertListEqual(list(C.get_results_batch(stream, ti)), instances[3610:3620])
+                self.assertListEqual(stream.window(ti).timestamps(), [i.timestamp for i in instances[3610:3620]])
+                self.assertListEqual([v for _, v in C.get_results(stream, ti, columns=['y'])],
+                                     [{'y': -i} for i in range(3611, 3621)])
+                self.assertListEqual(stream.window(ti, columns=['y']).values(), [{'y': -i} for i in range(3611, 3621)])
+                self.assertListEqual(stream.window(ti, columns=['y']).batch().values,
+                                     [{'y': -i} for i in range(3611, 3621)])
+
+                # Rewritten timestamps take the most recent value
+                stream.writer([StreamInstance(t1 + 3611 * second, {'x': 0})])
+                self.assertDictEqual(next(C.get_results(stream, ti)).value, {'x': 0})
+                for x in range(1, 6):
+                    stream.writer([StreamInstance(t1 + 3612 * second, {'x': x})])
+                self.assertDictEqual(list(C.get_results(stream, ti))[1].value, {'x': 5})
+                self.assertEqual(len(list(C.get_results(stream, ti))), 10)
+                C.compact_stream(sid)
+                self.assertEqual(len(C.get_files(sid)), 4)
+                self.assertListEqual(list(C.get_results(stream, TimeInterval(t1, t1 + 10 * hour)))[3610:],
+                                     [StreamInstance(t1 + 3611 * second, {'x': 0}),
+                                      StreamInstance(t1 + 3612 * second, {'x': 5})] + instances[3612:])
+
+                # Other values are stored as JSON
+                other = C.create_stream(StreamId(sys._getframe().f_code.co_name, meta_data=(("sensor", "2"),)))
+                stream.writer([StreamInstance(t1 + second, [1, 2]), StreamInstance(t1 + 2 * second, "a")])
+                self.assertListEqual(
+                    [i.value for i in C.get_results(stream, TimeInterval(t1, t1 + 2 * second))], [[1, 2], "a"])
+                self.assertListEqual(list(C.get_results(other, TimeInterval(t1, t1 + hour))), [])
+
+                # Datetimes and tuples round trip, as do dictionaries with a key named like the timestamp column
+                values = [t1, [t1, (1, 2)], {'a': t1}, {'__timestamp': 1, 'x': 2}]
+                for i, value in enumerate(values, 1):
+                    other.writer([StreamInstance(t1 + i * second, value)])
+                self.assertListEqual(other.window((t1, t1 + hour)).values(), values)
+            finally:
+                for s in list(C.streams.keys()):
+                    C.purge_stream(s, remove_definition=True)
+                self.assertListEqual(C.get_files(sid), [])
+                shutil.rmtree(path)
+
+    def test_memory_channel_window(self):
+        M = MemoryChannel("test_memory_channel_window")
+        stream = M.create_stream(StreamId(sys._getframe().f_code.co_name))
+
+        # Out of order writes should still give sorted windows
+        stream.writer([StreamInstance(t1 + i * second, i) for i in range(5, 10)])
+        stream.writer([StreamInstance(t1 + i * second, i) for i in range(5)])
+
+        self.assertListEqual(stream.window((t1, t1 + 3 * second)).values(), [1, 2, 3])
+        self.assertListEqual(stream.window((t1 + 7 * second, t1 + hour)).values(), [8, 9])
+        self.assertListEqual(stream.window((t1 + hour, t1 + 2 * hour)).values(), [])
+
+        # The sorted timestamps stay in sync with the other dictionary methods
+        data = M.data[stream.stream_id]
+        self.assertEqual(data.pop(t1 + 2 * second), 2)
+        self.assertIsNone(data.pop(t1 + hour, None))
+        self.assertRaises(KeyError, data.pop, t1 + hour)
+        self.assertEqual(data.setdefault(t1 + 2 * second, -2), -2)
+        self.assertEqual(data.setdefault(t1 + 2 * second, 2), -2)
+        timestamp, value = data.popitem()
+        self.assertNotIn(timestamp, data.timestamps)
+        self.assertListEqual(data.timestamps, sorted(data))
+        self.assertListEqual(stream.window((t1, t1 + 3 * second)).values(),
+                             [v for v in [1, -2, 3] if v != value])
+
+        # Projections keep the given keys of dictionary values
+        stream = M.create_stream(StreamId(sys._getframe().f_code.co_name + "_dict"))
+        stream.writer([StreamInstance(t1 + i * second, {'x': i, 'y': -i}) for i in range(1, 4)])
+        self.assertListEqual(stream.window((t1, t1 + hour), columns=['y', 'z']).values(),
+                             [{'y': -1}, {'y': -2}, {'y': -3}])
+
+    def test_stream_instance_batch(self):
+        # Trusted instances are equal to validated ones, and neither carries a per-instance dict
+        instance = StreamInstance.trusted(t1, 1)
+        self.assertEqual(instance, StreamInstance(t1, 1))
+        self.assertIsInstance(instance, StreamInstance)
+        self.assertFalse(hasattr(instance, '__dict__'))
+
+        M = MemoryChannel("test_stream_instance_batch")
+        stream = M.create_stream(StreamId(sys._getframe().f_code.co_name))
+        stream.writer([StreamInstance(t1 + i * second, i) for i in range(10)])
+
+        view = stream.window((t1, t1 + 5 * second))
+        batch = view.batch()
+        self.assertEqual(len(batch), 5)
+        self.assertListEqual(batch.timestamps, view.timestamps())
+        self.assertListEqual(batch.values, [1, 2, 3, 4, 5])
+        self.assertListEqual(list(batch), view.items())
+        self.assertEqual(batch[-1], StreamInstance(t1 + 5 * second, 5))
+        self.assertListEqual(batch.window(TimeInterval(t1 + 2 * second, t1 + 4 * second)).values, [3, 4])
+
+        # Batches read through the cache are the same
+        M.read_cache = ReadCache(max_size=100)
+        self.assertListEqual(stream.window((t1, t1 + 5 * second)).batch().values, [1, 2, 3, 4, 5])
+        self.assertListEqual(stream.window((t1, t1 + 5 * second)).batch().values, [1, 2, 3, 4, 5])
+        self.assertEqual(M.read_cache.hits, 1)
+
+        batch = StreamInstanceBatch()
+        batch.append(StreamInstance(t1, 0))
+        self.assertRaises(ValueError, batch.append, StreamInstance(t1 - second, 0))
+        self.assertRaises(ValueError, StreamInstanceBatch, [t1], [])
+
+    def test_prefetched_window(self):
+        M = MemoryChannel("test_prefetched_window")
+        stream = M.create_stream(StreamId(sys._getframe().f_code.co_name))
+        stream.writer([StreamInstance(t1 + i * second, i) for i in range(100)])
+
+        ti = (t1, t1 + hour)
+        self.assertListEqual(stream.window(ti, prefetch=8).items(), stream.window(ti).items())
+        self.assertEqual(stream.window(ti, prefetch=8).first(), StreamInstance(t1 + second, 1))
+        self.assertListEqual(list(stream.window(ti, prefetch=1).head(3)), stream.window(ti).items()[:3])
+
+        def failing():
+            yield StreamInstance(t1, 0)
+            raise ValueError("read failed")
+
+        self.assertRaises(ValueError, list, prefetched(failing(), 4))
+        self.assertRaises(ValueError, list, prefetched([], 0))
+
+        # Stopping early releases the reading thread, which closes the underlying generator
+        closed = threading.Event()
+
+        def endless():
+            try:
+                i = 0
+                while True:
+                    yield i
+                    i += 1
+            finally:
+                closed.set()
+
+        items = prefetched(endless(), 4)
+        self.assertListEqual([next(items) for _ in range(10)], list(range(10)))
+        items.close()
+        self.assertTrue(closed.wait(5))
+
+    def test_read_cache(self):
+        M = MemoryChannel("test_read_cache")
+        M.read_cache = ReadCache(max_size=15)
+        stream = M.create_stream(StreamId(sys._getframe().f_code.co_name))
+        stream.writer([StreamInstance(t1 + i * second, i) for i in range(10)])
+
+        self.assertListEqual(stream.window((t1, t1 + 10 * second)).values(), list(range(1, 10)))
+        self.assertEqual((M.read_cache.hits, M.read_cache.misses, M.read_cache.size), (0, 1, 9))
+
+        # Sub-intervals are sliced from the cached interval
+        self.assertListEqual(stream.window((t1 + 2 * second, t1 + 5 * second)).values(), [3, 4, 5])
+        self.assertListEqual(stream.window((t1 + 8 * second, t1 + 10 * second)).values(), [9])
+        self.assertEqual((M.read_cache.hits, M.read_cache.misses), (2, 1))
+
+        # Writes outside of the cached interval leave it in place, writes inside invalidate it
+        stream.writer(StreamInstance(t1 + 20 * second, 20))
+        self.assertEqual(len(M.read_cache), 1)
+        stream.writer(StreamInstance(t1 + 10 * second, 10))
+        self.assertEqual(len(M.read_cache), 0)
+        self.assertListEqual(stream.window((t1 + 8 * second, t1 + 10 * second)).values(), [9, 10])
+
+        # Reads of a covering interval replace the intervals they cover
+        self.assertListEqual(stream.window((t1, t1 + 30 * second)).values(), list(range(1, 11)) + [20])
+        self.assertEqual((len(M.read_cache), M.read_cache.size), (1, 11))
+
+        # The cache is bounded by the number of instances, so the least recently used reads are evicted
+        other = M.create_stream(StreamId("test_read_cache_other"))
+        other.writer([StreamInstance(t1 + i * second, i) for i in range(1, 11)])
+        self.assertListEqual(other.window((t1, t1 + 10 * second)).values(), list(range(1, 11)))
+        self.assertEqual((len(M.read_cache), M.read_cache.size), (1, 10))
+        self.assertIsNone(M.read_cache.get((M.channel_id, stream.stream_id), TimeInterval(t1, t1 + second)))
+
+        # Purging the stream invalidates its cached reads
+        M.purge_stream(other.stream_id)
+        self.assertEqual(len(M.read_cache), 0)
+        self.assertListEqual(other.window((t1, t1 + 10 * second)).values(), [])
+
+    def test_log_file_channel(self):
+        path = tempfile.mkdtemp()
+        try:
+            L = LogFileChannel("test_log", path, index_interval=4)
+            sid = StreamId(sys._getframe().f_code.co_name, meta_data=(("sensor", "1"),))
+            stream = L.create_stream(sid)
+            instances = [StreamInstance(t1 + i * second, {'x': i}) for i in range(1, 101)]
+            stream.writer(instances[50:])
+            stream.calculated_intervals = TimeIntervals([TimeInterval(t1 + 50 * second, t1 + 100 * second)])
+
+            # Writes that go back in time start a new segment, and later writes take precedence
+            stream.writer(instances[:50])
+            stream.writer(StreamInstance(t1 + 60 * second, {'x': -1}))
+            self.assertEqual(len(L.get_log(sid).segments), 2)
+            self.assertListEqual(stream.window((t1 + 58 * second, t1 + 61 * second)).values(),
+                                 [{'x': 59}, {'x': -1}, {'x': 61}])
+
+            # The streams, calculated intervals and data persist, and partially written records are dropped
+            with open(L.get_log(sid).segments[0].data_filename, 'ab') as f:
+                f.write(b'\x00' * 5)
+            L = LogFileChannel("test_log", path, index_interval=4)
+            stream = L.streams[sid]
+            self.assertEqual(stream.calculated_intervals,
+                             TimeIntervals([TimeInterval(t1 + 50 * second, t1 + 100 * second)]))
+            values = stream.window((t1, t1 + hour)).values()
+            self.assertListEqual(values[:59] + values[60:], [i.value for i in instances[:59] + instances[60:]])
+            self.assertListEqual(stream.window((t1 + 17 * second, t1 + 19 * second)).values(), [{'x': 18}, {'x': 19}])
+            self.assertListEqual(stream.window((t1 + hour, t1 + 2 * hour)).values(), [])
+            self.assertListEqual(stream.window((t1, t1 + hour)).batch().values, values)
+
+            # Compaction merges the segments without changing the data, and also happens after too many segments
+            L.compact_stream(sid)
+            self.assertEqual(len(L.get_log(sid).segments), 1)
+            self.assertListEqual(stream.window((t1, t1 + hour)).values(), values)
+            L = LogFileChannel("test_log", path, index_interval=4, max_segments=3)
+            stream = L.streams[sid]
+            for i in range(3):
+                stream.writer(StreamInstance(t1 + (10 - i) * second, {'x': -i}))
+            self.assertEqual(len(L.get_log(sid).segments), 1)
+            self.assertListEqual(stream.window((t1 + 6 * second, t1 + 11 * second)).values(),
+                                 [{'x': 7}, {'x': -2}, {'x': -1}, {'x': 0}, {'x': 11}])
+
+            # Datetimes and tuples round trip, and other types are rejected before anything is written
+            values = [t1, {'a': (1, [t1])}]
+            stream.writer([StreamInstance(t1 + hour + i * second, v) for i, v in enumerate(values, 1)])
+            self.assertListEqual(stream.window((t1 + hour, t1 + 2 * hour)).values(), values)
+            self.assertRaises(TypeError, stream.writer, [StreamInstance(t1 + 3 * hour, {1, 2})])
+            self.assertListEqual(stream.window((t1 + hour, t1 + 4 * hour)).values(), values)
+
+            L.purge_stream(sid, remove_definition=True)
+            self.assertNotIn(sid, L.streams)
+            self.assertNotIn(sid, LogFileChannel("test_log", path).streams)
+        finally:
+            shutil.rmtree(path)
+
+    def test_tool_channel_manifest(self):
+        path = tempfile.mkdtemp()
+        try:
+            os.mkdir(os.path.join(path, "dummy_tool"))
+            with open(os.path.join(path, "dummy_tool", "2017-01-01_v0.0.1.py"), "w") as f:
+                f.write("class DummyTool(object):\n    version = 1\n")
+
+            T = ToolChannel("test_tools", path, up_to_timestamp=utcnow())
+            self.assertListEqual([s.name for s in T.streams], ["dummy_tool"])
+            self.assertTrue(os.path.isfile(T.manifest.filename))
+
+            # A new channel picks up the persisted listing
+            T = ToolChannel("test_tools", path, up_to_timestamp=utcnow())
+            self.assertFalse(T.manifest.modified)
+            self.assertListEqual(T.manifest.file_names("dummy_tool"), ["2017-01-01_v0.0.1.py"])
+
+            # Adding a new version changes the folder modification time, so the listing is refreshed
+            with open(os.path.join(path, "dummy_tool", "2017-02-01_v0.0.2.py"), "w") as f:
+                f.write("class DummyTool(object):\n    version = 2\n")
+            os.utime(os.path.join(path, "dummy_tool"), (0, 0))
+            T = ToolChannel("test_tools", path, up_to_timestamp=utcnow())
+            self.assertEqual(T["dummy_tool"].window((MIN_DATE, utcnow())).last().value.version, 2)
+
+            # Tools are only loaded when they are first accessed
+            loaded = []
+
+            def loader():
+                loaded.append("dummy_tool")
+                return T["dummy_tool"].window((MIN_DATE, utcnow())).last().value
+
+            tools = ToolContainer()
+            tools.register("dummy_tool", loader)
+            self.assertListEqual(tools.names, ["dummy_tool"])
+            self.assertListEqual(loaded, [])
+            self.assertEqual(tools.dummy_tool.version, 2)
+            self.assertEqual(tools.dummy_tool.version, 2)
+            self.assertListEqual(loaded, ["dummy_tool"])
+            self.assertRaises(AttributeError, getattr, tools, "missing_tool")
+
+            # Manifests naming entries outside the channel path are ignored
+            manifest = DirectoryManifest(path)
+            manifest.folder_names()
+            manifest.filename = T.manifest.filename
+            manifest.folders.append(os.path.join(os.pardir, "elsewhere"))
+            manifest.save()
+            manifest = DirectoryManifest(path, T.manifest.filename)
+            self.assertListEqual(manifest.folders, [])
+            self.assertIsNone(manifest.mtime)
+            os.remove(T.manifest.filename)
+        finally:
+            shutil.rmtree(path)
+
+    def test_database_channel_write_behind(self):
+        with HyperStream(file_logger=False, console_logger=False, mqtt_logger=None) as hs:
+            D = hs.channel_manager.mongo
+            sid = StreamId(sys._getframe().f_code.co_name)
+            if sid in D:
+                D.purge_stream(sid, remove_definition=True)
+            stream = D.create_stream(sid)
+            ti = TimeInterval(t1, t1 + minute)
+
+            D.write_behind = True
+            try:
+                stream.calculated_intervals += ti
+                stream.load()
+                self.assertEqual(stream.mongo_model.get_calculated_intervals(), TimeIntervals())
+                self.assertEqual(stream.calculated_intervals, TimeIntervals([ti]))
+
+                D.flush_calculated_intervals()
+                stream.load()
+                self.assertEqual(stream.mongo_model.get_calculated_intervals(), TimeIntervals([ti]))
+
+                # Streams deferred on other threads while flushing are kept for the next flush
+                def defer():
+                    for i in range(1, 51):
+                        stream.calculated_intervals += TimeInterval(t1, t1 + i * minute)
+                thread = threading.Thread(target=defer)
+                thread.start()
+                while thread.is_alive():
+                    D.flush_calculated_intervals()
+                thread.join()
+                D.flush_calculated_intervals()
+                self.assertNotIn(sid, D.pending_streams)
+                stream.load()
+                self.assertEqual(stream.mongo_model.get_calculated_intervals(),
+                                 TimeIntervals([TimeInterval(t1, t1 + 50 * minute)]))
+            finally:
+                D.write_behind = False
+                D.purge_stream(sid, remove_definition=True)
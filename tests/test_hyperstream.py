@@ -22,7 +22,8 @@
 import unittest
 import logging
 
-from hyperstream import HyperStream
+from hyperstream import HyperStream, OnlineEngine
+from hyperstream.config import OnlineEngineConfig
 from hyperstream.workflow.workflow import Workflow
 
 from hyperstream import StreamId, TimeInterval
@@ -51,6 +52,16 @@ class HyperStreamTests(unittest.TestCase):
     def test___str__(self):
         self.assertIs(type(self.hs.__str__()), str)
 
+    def test_bootstrap_profile(self):
+        profile = self.hs.bootstrap_profile
+        self.assertListEqual([p.name for p in profile.phases],
+                             ["logger", "config", "client", "channels", "plates", "workflows", "tools"])
+        self.assertEqual(profile.wall_time, sum(p.wall_time for p in profile.phases))
+        counts = dict((p.name, p.counts) for p in profile.phases)
+        self.assertEqual(counts["workflows"]["workflows"], len(self.hs.workflow_manager.workflows))
+        self.assertGreater(counts["tools"]["tools"], 0)
+        self.assertIn("total", profile.report())
+
     def test_create_workflow(self):
         workflow_id = 1
         name = 'test_workflow'
@@ -85,6 +96,14 @@ class HyperStreamTests(unittest.TestCase):
         expected = [before_s + timedelta(seconds=i) for i in range(1, 31)]
         self.assertItemsEqual(values, expected)
 
+    def test_online_engine_shards(self):
+        self.assertEqual(OnlineEngine.shard(['a', 'b', 'c', 'd', 'e'], 2), [['a', 'c', 'e'], ['b', 'd']])
+        self.assertEqual(OnlineEngine.shard(['a'], 4), [['a']])
+
+        config = OnlineEngineConfig(interval=dict(start=-60, end=-10), sleep=5, processes=2, cadence=dict(slow=60))
+        self.assertEqual(config.get_cadence('slow'), 60)
+        self.assertEqual(config.get_cadence('other'), 5)
+
 
 if __name__ == "__main__":
     unittest.main()
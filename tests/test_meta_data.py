@@ -22,6 +22,7 @@
 import unittest
 
 from .helpers import *
+from hyperstream.plate import Plate
 
 
 class TestMetaData(unittest.TestCase):
@@ -44,6 +45,30 @@ class TestMetaData(unittest.TestCase):
             self.assertListEqual(sorted(hs.plate_manager.plates["T1"].values), expected)
             delete_plate(hs, "T1")  # note this now deletes meta data as well
 
+    def test_plate_index(self):
+        houses = Plate("H", "house", [(("house", str(h)),) for h in range(3)])
+        residents = Plate("H.R", "resident", [(("house", str(h)), ("resident", str(r)))
+                                              for h in range(3) for r in range(2 + h)], parent_plate=houses)
+
+        self.assertListEqual(residents.get_child_values((("house", "1"),)),
+                             [(("house", "1"), ("resident", str(r))) for r in range(3)])
+        self.assertListEqual(residents.index.find((("house", "2"),)), residents.get_child_values((("house", "2"),)))
+        self.assertListEqual(residents.index.find((("house", "2"), ("resident", "0"))),
+                             [(("house", "2"), ("resident", "0"))])
+        self.assertListEqual(residents.index.find((("house", "9"),)), [])
+        self.assertListEqual(residents.index.meta_data_values("resident"), list(map(str, range(4))))
+        self.assertEqual(residents.get_parent_value((("resident", "1"), ("house", "2"))), (("house", "2"),))
+        self.assertIsNone(houses.get_parent_value((("house", "2"),)))
+
+        subset = Plate("H.R2", "resident", residents.values[:3], parent_plate=houses)
+        self.assertTrue(subset.is_sub_plate(residents))
+        self.assertTrue(houses.is_sub_plate(residents))
+        self.assertFalse(residents.is_sub_plate(subset))
+
+        # The index is rebuilt if values are added to the plate
+        residents.values.append((("house", "3"), ("resident", "0")))
+        self.assertListEqual(residents.get_child_values((("house", "3"),)), [(("house", "3"), ("resident", "0"))])
+
 
 if __name__ == '__main__':
     unittest.main()
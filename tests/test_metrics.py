@@ -0,0 +1,85 @@
+# The MIT License (MIT) # Copyright (c) 2014-2017 University of Bristol
+#
+#  Permission is hereby granted, free of charge, to any person obtaining a copy
+#  of this software and associated documentation files (the "Software"), to deal
+#  in the Software without restriction, including without limitation the rights
+#  to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+#  copies of the Software, and to permit persons to whom the Software is
+#  furnished to do so, subject to the following conditions:
+#
+#  The above copyright notice and this permission notice shall be included in all
+#  copies or substantial portions of the Software.
+#
+#  THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+#  EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+#  MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT.
+#  IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM,
+#  DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR
+#  OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE
+#  OR OTHER DEALINGS IN THE SOFTWARE.
+
+
+
+import unittest
+import json
+
+from hyperstream import Tool, StreamId, StreamInstance, TimeInterval, TimeIntervals
+from hyperstream.channels import MemoryChannel
+from hyperstream.utils import MetricsRegistry, metrics
+from .helpers import t1, second, minute
+
+
+class Double(Tool):
+    def _execute(self, sources, alignment_stream, interval):
+        for t, v in sources[0].window(interval, force_calculation=True):
+            yield StreamInstance(t, v * 2)
+
+
+class TestMetrics(unittest.TestCase):
+    def setUp(self):
+        metrics.reset()
+
+    def test_tool_metrics(self):
+        M = MemoryChannel("test_tool_metrics")
+        source = M.create_stream(StreamId("metrics_source"))
+        source.writer([StreamInstance(t1 + i * second, i) for i in range(1, 11)])
+        source.calculated_intervals = TimeIntervals([TimeInterval(t1, t1 + minute)])
+        sink = M.create_stream(StreamId("metrics_sink"))
+
+        tool = Double()
+        tool.execute(sources=[source], sink=sink, interval=TimeInterval(t1, t1 + 5 * second))
+        tool.execute(sources=[source], sink=sink, interval=TimeInterval(t1, t1 + minute))
+        self.assertListEqual(sink.window((t1, t1 + minute)).values(), [2 * i for i in range(1, 11)])
+
+        totals = metrics.get("tool", "double")
+        self.assertEqual(totals.executions, 2)
+        self.assertEqual(totals.documents_read, 10)
+        self.assertEqual(totals.documents_written, 10)
+        self.assertGreaterEqual(totals.wall_time, totals.read_time + totals.write_time)
+
+        d = json.loads(metrics.to_json())
+        self.assertEqual(len(d), 1)
+        self.assertEqual((d[0]["kind"], d[0]["name"], d[0]["documents_written"]), ("tool", "double", 10))
+
+        text = metrics.to_prometheus()
+        self.assertIn("# TYPE hyperstream_documents_read_total counter", text)
+        self.assertIn('hyperstream_documents_read_total{kind="tool",name="double"} 10', text)
+
+    def test_nested_executions(self):
+        registry = MetricsRegistry()
+        with registry.execution("factor", 'f("x")') as outer:
+            with registry.execution("tool", "t"):
+                registry.record_read(3, 0.5)
+            registry.record_read(1, 0.25)
+        self.assertIsNone(registry.current)
+
+        # Counts are inclusive of nested executions
+        self.assertEqual(outer.documents_read, 4)
+        self.assertEqual(registry.get("tool", "t").documents_read, 3)
+        self.assertEqual(registry.get("factor", 'f("x")').read_time, 0.75)
+        self.assertIn('name="f(\\"x\\")"', registry.to_prometheus())
+
+        registry.enabled = False
+        with registry.execution("tool", "t") as m:
+            self.assertIsNone(m)
+        self.assertEqual(registry.get("tool", "t").executions, 1)
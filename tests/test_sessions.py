@@ -21,7 +21,11 @@
 
 import unittest
 
-from hyperstream import TimeInterval
+from hyperstream import TimeInterval, StreamId, MIN_DATE
+from hyperstream.utils import utcnow, ConfigurationError
+from hyperstream.channels import MemoryChannel
+from hyperstream.config import HistoryConfig
+from hyperstream.session import HistoryRecorder
 from .helpers import *
 
 
@@ -91,3 +95,41 @@ class SessionTests(unittest.TestCase):
         assert (len(hs.sessions) == 1)
         assert hs.sessions[0].end is not None
         assert not hs.sessions[0].active
+
+    def test_history_recorder(self):
+        M = MemoryChannel("test_history_recorder")
+        ti = TimeInterval(t1, t1 + minute)
+
+        def entries(stream):
+            return [i.value for i in stream.window(TimeInterval(MIN_DATE, utcnow() + minute)).items()]
+
+        # Entries are buffered until the flush size is reached, and none are lost when they share a millisecond
+        stream = M.create_stream(StreamId("history_all"))
+        recorder = HistoryRecorder(stream, HistoryConfig(flush_size=3, flush_interval=60))
+        for i in range(5):
+            recorder.record(interval=ti, tool="clock", document_count=i)
+        self.assertListEqual([e['document_count'] for e in entries(stream)], [0, 1, 2])
+        self.assertEqual(len(recorder), 2)
+        recorder.flush()
+        self.assertListEqual([e['document_count'] for e in entries(stream)], [0, 1, 2, 3, 4])
+
+        stream = M.create_stream(StreamId("history_sample"))
+        recorder = HistoryRecorder(stream, HistoryConfig(mode='sample', sample_every=2))
+        for i in range(5):
+            recorder.record(interval=ti, tool="clock", document_count=i)
+        recorder.flush()
+        self.assertListEqual([(e['document_count'], e['sample_every']) for e in entries(stream)],
+                             [(0, 2), (2, 2), (4, 2)])
+
+        stream = M.create_stream(StreamId("history_aggregate"))
+        recorder = HistoryRecorder(stream, HistoryConfig(mode='aggregate'))
+        for i in range(4):
+            recorder.record(interval=TimeInterval(t1 + i * minute, t1 + (i + 1) * minute), tool="clock",
+                            document_count=60)
+        recorder.record(interval=ti, tool="random", document_count=60)
+        recorder.flush()
+        self.assertListEqual(entries(stream), [
+            dict(tool="clock", interval=TimeInterval(t1, t1 + 4 * minute), executions=4, document_count=240),
+            dict(tool="random", interval=ti, executions=1, document_count=60)])
+
+        self.assertRaises(ConfigurationError, HistoryConfig, mode='none')
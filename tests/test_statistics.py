@@ -0,0 +1,76 @@
+# The MIT License (MIT) # Copyright (c) 2014-2017 University of Bristol
+#
+#  Permission is hereby granted, free of charge, to any person obtaining a copy
+#  of this software and associated documentation files (the "Software"), to deal
+#  in the Software without restriction, including without limitation the rights
+#  to use, copy, modify, merge, publish, distribute, sublicense, and/or sell
+#  copies of the Software, and to permit persons to whom the Software is
+#  furnished to do so, subject to the following conditions:
+#
+#  The above copyright notice and this permission notice shall be included in all
+#  copies or substantial portions of the Software.
+#
+#  THE SOFTWARE IS PROVIDED "AS IS", WITHOUT WARRANTY OF ANY KIND,
+#  EXPRESS OR IMPLIED, INCLUDING BUT NOT LIMITED TO THE WARRANTIES OF
+#  MERCHANTABILITY, FITNESS FOR A PARTICULAR PURPOSE AND NONINFRINGEMENT.
+#  IN NO EVENT SHALL THE AUTHORS OR COPYRIGHT HOLDERS BE LIABLE FOR ANY CLAIM,
+#  DAMAGES OR OTHER LIABILITY, WHETHER IN AN ACTION OF CONTRACT, TORT OR
+#  OTHERWISE, ARISING FROM, OUT OF OR IN CONNECTION WITH THE SOFTWARE OR THE USE
+#  OR OTHER DEALINGS IN THE SOFTWARE.
+
+
+import unittest
+
+from hyperstream.utils.statistics import arrays, histogram, right_closed_histogram, percentile
+
+
+class TestStatistics(unittest.TestCase):
+    def test_histogram(self):
+        inf = float('inf')
+        values = [-1, 0, 0.5, 1, 2, 2, 7]
+        counts, bins = right_closed_histogram(values, [-inf, 0, 1, 2, inf])
+        # Bins are closed on the right
+        self.assertListEqual(counts, [2, 2, 2, 1])
+        # The original histogram (used by the v0.0.1 tools) is unchanged, including its count for the last bin
+        self.assertListEqual(list(histogram(values, [-inf, 0, 1, 2, inf])[0]), [2, 2, 2, 0])
+
+    def test_percentile(self):
+        q = [20, 80]
+        self.assertEqual(percentile([[10, 7, 4], [3, 2, 1]], 50), 3.5)
+        self.assertListEqual(percentile([[10, 7, 4], [3, 2, 1]], q), [2.0, 7.0])
+        # The quantiles should not be modified
+        self.assertListEqual(q, [20, 80])
+
+    def test_numpy_fallback(self):
+        inf = float('inf')
+        values = [0.5, 3, 2.25, 9, 4, 4, 1, 7.5, 6]
+        bins = [-inf, 0, 2, 4, 6, 8, inf]
+        q = [0, 25, 50, 90, 100]
+
+        results = []
+        use_numpy = arrays.USE_NUMPY
+        try:
+            for enabled in (use_numpy, False):
+                arrays.USE_NUMPY = enabled
+                results.append((
+                    arrays.list_sum(values),
+                    arrays.list_mean(values),
+                    arrays.percentiles(values, q),
+                    arrays.histogram_counts(values, bins)
+                ))
+        finally:
+            arrays.USE_NUMPY = use_numpy
+
+        for result in results:
+            self.assertAlmostEqual(result[0], 37.25)
+            self.assertAlmostEqual(result[1], 37.25 / 9)
+            self.assertListEqual(result[2], percentile(values, q))
+            self.assertListEqual(result[3], [0, 2, 4, 1, 1, 1])
+
+        # Non-numeric values always use the pure-Python implementation
+        self.assertIsNone(arrays.to_array(['a', 'b']))
+        self.assertIsNone(arrays.list_mean([]))
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -62,6 +62,36 @@ class HyperStreamTimeIntervalTests(unittest.TestCase):
         # print(d)
         # print()
 
+    def test_set_operations(self):
+        i1 = TimeIntervals([
+            TimeInterval(now + 2 * hour, now + 3 * hour),
+            TimeInterval(now, now + hour),
+            TimeInterval(now + 30 * minute, now + 90 * minute),
+        ])
+        i2 = TimeIntervals([
+            TimeInterval(now + 45 * minute, now + 150 * minute),
+            TimeInterval(now + 4 * hour, now + 5 * hour),
+        ])
+        r1, r2 = repr(i1), repr(i2)
+
+        # Unsorted and overlapping intervals are merged on construction
+        assert (i1 == TimeIntervals([(now, now + 90 * minute), (now + 2 * hour, now + 3 * hour)]))
+
+        assert (i1 + i2 == TimeIntervals([(now, now + 3 * hour), (now + 4 * hour, now + 5 * hour)]))
+        assert (i1 - i2 == TimeIntervals([(now, now + 45 * minute), (now + 150 * minute, now + 3 * hour)]))
+        assert (i2 - i1 == TimeIntervals([(now + 90 * minute, now + 2 * hour), (now + 4 * hour, now + 5 * hour)]))
+        assert (i1 & i2 == TimeIntervals([(now + 45 * minute, now + 90 * minute),
+                                          (now + 2 * hour, now + 150 * minute)]))
+        assert (i1 - TimeIntervals() == i1)
+        assert ((i1 - i1).is_empty)
+
+        # Touching intervals are joined
+        assert (i1 + TimeInterval(now + 3 * hour, now + 4 * hour)
+                == TimeIntervals([(now, now + 90 * minute), (now + 2 * hour, now + 4 * hour)]))
+
+        # Operands are not modified
+        assert (repr(i1) == r1 and repr(i2) == r2)
+
     def test_relative_time_interval(self):
         # TODO ... write some tests here
         r1 = RelativeTimeInterval(-30 * second, zero)
@@ -369,6 +369,82 @@ class TestTools(unittest.TestCase):
                 list(map(sum, zip(gauss.window().values(), custom.window().values())))
             )
 
+    def test_incremental_sliding_window(self):
+        ti = TimeInterval(t1, t1 + minute)
+        memory = self.hs.channel_manager.memory
+
+        ticker = memory.get_or_create_stream("ticker")
+        self.hs.tools.clock().execute(sources=[], sink=ticker, interval=ti)
+
+        windows = memory.get_or_create_stream("windows")
+        self.hs.tools.sliding_window(
+            first=t1, lower=timedelta(seconds=-5), upper=timedelta(0), increment=timedelta(seconds=1)
+        ).execute(sources=[], sink=windows, interval=ti)
+
+        # Execute once over the whole interval, and again over adjacent sub-intervals with the same tool
+        full = memory.get_or_create_stream("listify_full")
+        self.hs.tools.sliding_listify().execute(sources=[windows, ticker], sink=full, interval=ti)
+
+        chunked = memory.get_or_create_stream("listify_chunked")
+        tool = self.hs.tools.sliding_listify()
+        for i in range(0, 60, 7):
+            sub_interval = TimeInterval(t1 + timedelta(seconds=i), min(t1 + timedelta(seconds=i + 7), ti.end))
+            tool.execute(sources=[windows, ticker], sink=chunked, interval=sub_interval)
+
+        self.assertEqual(len(full.window(ti).items()), 56)
+        self.assertListEqual(chunked.window(ti).items(), full.window(ti).items())
+
+        full = memory.get_or_create_stream("apply_full")
+        self.hs.tools.sliding_apply(func=lambda data: len(list(data))).execute(
+            sources=[windows, ticker], sink=full, interval=ti)
+
+        chunked = memory.get_or_create_stream("apply_chunked")
+        tool = self.hs.tools.sliding_apply(func=lambda data: len(list(data)))
+        for i in range(0, 60, 7):
+            sub_interval = TimeInterval(t1 + timedelta(seconds=i), min(t1 + timedelta(seconds=i + 7), ti.end))
+            tool.execute(sources=[windows, ticker], sink=chunked, interval=sub_interval)
+
+        # Windows are (lower, upper], so each full window holds 5 ticks
+        self.assertListEqual(full.window(ti).values(), [5] * 56)
+        self.assertListEqual(chunked.window(ti).items(), full.window(ti).items())
+
+        full = memory.get_or_create_stream("relative_full")
+        self.hs.tools.relative_window(relative_start=-3, relative_end=0).execute(
+            sources=[ticker], alignment_stream=ticker, sink=full, interval=ti)
+
+        chunked = memory.get_or_create_stream("relative_chunked")
+        tool = self.hs.tools.relative_window(relative_start=-3, relative_end=0)
+        for i in range(0, 60, 7):
+            sub_interval = TimeInterval(t1 + timedelta(seconds=i), min(t1 + timedelta(seconds=i + 7), ti.end))
+            tool.execute(sources=[ticker], alignment_stream=ticker, sink=chunked, interval=sub_interval)
+
+        self.assertListEqual(full.window(ti).values()[-1], ticker.window(ti).values()[-3:])
+        self.assertListEqual(chunked.window(ti).items(), full.window(ti).items())
+
+        # The incremental tools can be used to create factors
+        for name in ("sliding_apply", "sliding_listify", "relative_window"):
+            self.assertTrue(callable(getattr(self.hs.factors, name)))
+
+    def test_heap_merge_tools(self):
+        ti = TimeInterval(t1, t1 + minute)
+        memory = self.hs.channel_manager.memory
+
+        seconds = memory.get_or_create_stream("merge_seconds")
+        self.hs.tools.clock(first=t1, stride=1.0).execute(sources=[], sink=seconds, interval=ti)
+        threes = memory.get_or_create_stream("merge_threes")
+        self.hs.tools.clock(first=t1, stride=3.0).execute(sources=[], sink=threes, interval=ti)
+
+        merged = memory.get_or_create_stream("merge_aligned")
+        self.hs.tools.aligned_merge(names=["a", "b"]).execute(sources=[seconds, threes], sink=merged, interval=ti)
+        expected = [t1 + timedelta(seconds=i) for i in range(3, 61, 3)]
+        self.assertListEqual(merged.window(ti).timestamps(), expected)
+        self.assertListEqual(merged.window(ti).values(), [dict(a=t, b=t) for t in expected])
+
+        counts = memory.get_or_create_stream("merge_counts")
+        self.hs.tools.aggregate(func=len, aggregation_meta_data="clock").execute(
+            sources=[seconds, threes], sink=counts, interval=ti)
+        self.assertListEqual(counts.window(ti).values(), [2 if i % 3 == 0 else 1 for i in range(1, 61)])
+
     def test_data_importers(self):
         with HyperStream(file_logger=False, console_logger=False, mqtt_logger=None) as hs:
             reader = hs.plugins.data_importers.tools.csv_reader('plugins/data_importers/data/sea_ice.csv')
@@ -23,10 +23,12 @@ Unit tests for aggregating
 from __future__ import print_function
 
 import sys
+import time
 import unittest
 import simplejson as json
 
-from hyperstream import TimeInterval, IncompatiblePlatesError
+from hyperstream import TimeInterval, TimeIntervals, IncompatiblePlatesError
+from hyperstream.workflow import WorkflowScheduler, WorkflowManager
 from .helpers import *
 
 W_DICT = {
@@ -126,6 +128,58 @@ class HyperStreamWorkflowTests(unittest.TestCase):
         # And then reload it
         hs.workflow_manager.load_workflow(workflow_id)
 
+    def test_save_workflow_max_workers(self):
+        hs = HyperStream(file_logger=False, console_logger=False, mqtt_logger=None)
+        workflow_id = sys._getframe().f_code.co_name
+        hs.workflow_manager.delete_workflow(workflow_id)
+
+        with hs.create_workflow(workflow_id=workflow_id, max_workers=4, **get_workflow_parameters("")) as w:
+            ticker = w.create_node("ticker", hs.channel_manager.memory, None)
+            w.create_factor(hs.tools.clock(), sources=[], sink=ticker)
+        hs.workflow_manager.commit_workflow(workflow_id)
+        del hs.workflow_manager.workflows[workflow_id]
+
+        # The number of workers is restored with the workflow, and passed on to its factors
+        try:
+            w = hs.workflow_manager.build_workflow(workflow_id)
+            self.assertEqual(w.max_workers, 4)
+            self.assertListEqual([f.max_workers for f in w.factors], [4])
+        finally:
+            hs.workflow_manager.delete_workflow(workflow_id)
+
+    def test_lazy_workflows(self):
+        hs = HyperStream(file_logger=False, console_logger=False, mqtt_logger=None)
+        workflow_ids = [sys._getframe().f_code.co_name + "_" + str(i) for i in range(2)]
+
+        for workflow_id in workflow_ids:
+            hs.workflow_manager.delete_workflow(workflow_id)
+            basic_workflow(hs, workflow_id)
+            hs.workflow_manager.commit_workflow(workflow_id)
+
+        try:
+            # The workflows are indexed but not built
+            manager = WorkflowManager(hs.channel_manager, hs.plate_manager, max_workflows=1)
+            workflows = manager.workflows
+            for workflow_id in workflow_ids:
+                self.assertIn(workflow_id, workflows)
+                self.assertFalse(workflows.is_loaded(workflow_id))
+                self.assertFalse(workflows.is_online(workflow_id))
+            self.assertEqual(workflows.num_loaded, 0)
+
+            w = workflows[workflow_ids[0]]
+            self.assertEqual(w.workflow_id, workflow_ids[0])
+            self.assertListEqual(list(w.nodes), ["ticker"])
+            self.assertIs(workflows[workflow_ids[0]], w)
+
+            # Only the most recently used workflow is kept
+            workflows[workflow_ids[1]]
+            self.assertEqual(workflows.num_loaded, 1)
+            self.assertFalse(workflows.is_loaded(workflow_ids[0]))
+            self.assertEqual(workflows[workflow_ids[0]].workflow_id, workflow_ids[0])
+        finally:
+            for workflow_id in workflow_ids:
+                hs.workflow_manager.delete_workflow(workflow_id)
+
     def test_new_api(self):
         hs = HyperStream(file_logger=False, console_logger=False, mqtt_logger=None)
         workflow_id = sys._getframe().f_code.co_name
@@ -144,6 +198,101 @@ class HyperStreamWorkflowTests(unittest.TestCase):
             time_interval = TimeInterval(t1, t1 + minute)
             w.execute(time_interval)
 
+    def test_parallel_plate_values(self):
+        hs = HyperStream(file_logger=False, console_logger=False, mqtt_logger=None)
+        workflow_id = sys._getframe().f_code.co_name
+
+        T = hs.plate_manager.plates['T']
+        M = hs.channel_manager.memory
+
+        with hs.create_workflow(workflow_id=workflow_id, max_workers=4,
+                                **get_workflow_parameters(" parallel plate values")) as w:
+            ticker = w.create_node(stream_name="ticker", channel=M, plates=None)
+            ticker_repeated = w.create_node(stream_name="ticker_repeated", channel=M, plates=[T])
+
+            w.create_factor(hs.tools.clock(), sources=[], sink=ticker)
+            w.create_factor(hs.tools.apply(func=identity), sources=[ticker], sink=ticker_repeated)
+
+            assert all(factor.max_workers == 4 for factor in w.factors)
+
+            time_interval = TimeInterval(t1, t1 + minute)
+            w.execute(time_interval)
+
+            expected = list(ticker.streams[None].window(time_interval).items())
+            assert len(expected) == 60
+            for stream in ticker_repeated.streams.values():
+                assert stream.calculated_intervals == TimeIntervals([time_interval])
+                assert list(stream.window(time_interval).items()) == expected
+
+    def test_scheduler(self):
+        hs = HyperStream(file_logger=False, console_logger=False, mqtt_logger=None)
+        workflow_id = sys._getframe().f_code.co_name
+
+        M = hs.channel_manager.memory
+
+        with hs.create_workflow(workflow_id=workflow_id, max_workers=2,
+                                **get_workflow_parameters(" scheduler")) as w:
+            ticker = w.create_node(stream_name="ticker", channel=M, plates=None)
+            left = w.create_node(stream_name="left", channel=M, plates=None)
+            right = w.create_node(stream_name="right", channel=M, plates=None)
+            both = w.create_node(stream_name="both", channel=M, plates=None)
+
+            # Define the factors out of order to check that the scheduler sorts them
+            w.create_factor(hs.tools.product(), sources=[left, right], sink=both)
+            w.create_factor(hs.tools.apply(func=lambda t: t.second), sources=[ticker], sink=left)
+            w.create_factor(hs.tools.apply(func=lambda t: t.minute), sources=[ticker], sink=right)
+            w.create_factor(hs.tools.clock(), sources=[], sink=ticker)
+
+            scheduler = WorkflowScheduler(w.factors)
+            assert scheduler.dependencies == [{1, 2}, {3}, {3}, set()]
+            assert scheduler.topological_order() == [3, 1, 2, 0]
+
+            time_interval = TimeInterval(t1, t1 + minute)
+            w.execute(time_interval)
+
+            report = w.execution_report
+            assert len(report.factor_times) == 4
+            assert len(report.critical_path) == 3
+            assert report.critical_path[0] == w.factors[3].factor_id
+            assert report.critical_path[-1] == w.factors[0].factor_id
+
+            assert len(both.streams[None].window(time_interval).items()) == 60
+            assert both.streams[None].calculated_intervals == TimeIntervals([time_interval])
+
+    def test_scheduler_failure(self):
+        hs = HyperStream(file_logger=False, console_logger=False, mqtt_logger=None)
+        workflow_id = sys._getframe().f_code.co_name
+
+        M = hs.channel_manager.memory
+        processed = []
+
+        def slow(t):
+            time.sleep(0.005)
+            processed.append(t)
+            return t.second
+
+        def failing(t):
+            raise ValueError("failed at {}".format(t))
+
+        with hs.create_workflow(workflow_id=workflow_id, max_workers=2,
+                                **get_workflow_parameters(" scheduler failure")) as w:
+            ticker = w.create_node(stream_name="ticker", channel=M, plates=None)
+            slow_node = w.create_node(stream_name="slow", channel=M, plates=None)
+            failed_node = w.create_node(stream_name="failed", channel=M, plates=None)
+            after_node = w.create_node(stream_name="after_failed", channel=M, plates=None)
+
+            w.create_factor(hs.tools.clock(), sources=[], sink=ticker)
+            w.create_factor(hs.tools.apply(func=slow), sources=[ticker], sink=slow_node)
+            w.create_factor(hs.tools.apply(func=failing), sources=[ticker], sink=failed_node)
+            w.create_factor(hs.tools.apply(func=lambda t: t), sources=[failed_node], sink=after_node)
+
+            time_interval = TimeInterval(t1, t1 + minute)
+            self.assertRaises(Exception, w.execute, time_interval)
+
+            # The factor that was running when the other failed has finished, and nothing downstream of the failure ran
+            assert len(processed) == 60
+            assert after_node.streams[None].calculated_intervals == TimeIntervals([])
+
     def test_new_api_nested_plates(self):
         hs = HyperStream(file_logger=False, console_logger=False, mqtt_logger=None)
         workflow_id = sys._getframe().f_code.co_name